@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+Compare the generated Customer decoder with the hand-written from_json it
+replaced.
+
+    python benchmarks/bench_decode.py [number of records]
+"""
+import sys
+import timeit
+
+from datetime import datetime
+
+from vismalib.model import (
+    coalesce, Address, Customer, DeliveryMethod, DeliveryTerms, TermsOfPayment)
+
+
+def make_record(i):
+    return {
+        "Id": "2a8e5b1c-0000-0000-0000-{:012d}".format(i),
+        "CustomerNumber": str(i),
+        "CorporateIdentityNumber": "556000-{:04d}".format(i % 10000),
+        "IsPrivatePerson": False,
+        "VatNumber": "",
+        "CurrencyCode": "SEK",
+        "EmailAddress": "customer{}@example.com".format(i),
+        "Phone": "",
+        "Name": "Customer {}".format(i),
+        "InvoiceAddress1": "Storgatan {}".format(i % 100),
+        "InvoicePostalCode": "11122",
+        "InvoiceCity": "Stockholm",
+        "InvoiceCountryCode": "SE",
+        "DeliveryCustomerName": None,
+        "DeliveryMethodId": "b1f0c6a6-0000-0000-0000-000000000001",
+        "DeliveryTermId": "b1f0c6a6-0000-0000-0000-000000000002",
+        "TermsOfPaymentId": "b1f0c6a6-0000-0000-0000-000000000003",
+        "TermsOfPayment": {
+            "Id": "b1f0c6a6-0000-0000-0000-000000000003",
+            "Name": "30 dagar",
+            "NameEnglish": "30 days",
+            "NumberOfDays": 30,
+        },
+        "LastInvoiceDate": "2019-01-{:02d}T00:00:00.0000000".format(i % 28 + 1),
+        "ChangedUtc": "2019-03-12T10:11:12.{:07d}".format(i),
+        "ReverseChargeOnConstructionServices": False,
+    }
+
+
+def legacy_from_json(json):
+    # Customer.from_json as it was before the generated decoder
+    self = Customer()
+
+    delivery_address = Address(
+        name=json.get("DeliveryCustomerName"),
+        address=json.get("DeliveryAddress1"),
+        secondary_address=json.get("DeliveryAddress2"),
+        postal_code=json.get("DeliveryPostalCode"),
+        city=json.get("DeliveryCity"),
+        country=json.get("DeliveryCountryCode"))
+
+    delivery_method = None
+    if json.get("DeliveryMethodId"):
+        delivery_method = DeliveryMethod(id=json.get("DeliveryMethodId"))
+
+    delivery_terms = None
+    if json.get("DeliveryTermId"):
+        delivery_terms = DeliveryTerms(id=json.get("DeliveryTermId"))
+
+    terms_of_payment = None
+    if json.get("TermsOfPaymentId"):
+        terms_of_payment = TermsOfPayment.from_json(json.get("TermsOfPayment"))
+
+    last_invoice_date = None
+    if json.get("LastInvoiceDate") is not None:
+        last_invoice_date = datetime.strptime(
+            json.get("LastInvoiceDate")[:-1], "%Y-%m-%dT%H:%M:%S.%f")
+
+    last_edited = None
+    if json.get("ChangedUtc") is not None:
+        last_edited = datetime.strptime(
+            json.get("ChangedUtc")[:-1], "%Y-%m-%dT%H:%M:%S.%f")
+
+    self.id = json.get("Id")
+    self.number = json.get("CustomerNumber")
+    self.nin = json.get("CorporateIdentityNumber") or None
+    self.is_company = coalesce(json.get("IsPrivatePerson"), True)
+    self.vat_number = json.get("VatNumber") or None
+    self.currency = json.get("CurrencyCode")
+    self.gln = json.get("GLN") or None
+    self.email = json.get("EmailAddress") or None
+    self.phone = json.get("Phone") or None
+    self.mobile_phone = json.get("MobilePhone") or None
+    self.url = json.get("WwwAddress") or None
+    self.note = json.get("Note") or None
+    self.contact_name = json.get("ContactPersonName") or None
+    self.contact_email = json.get("ContactPersonEmail") or None
+    self.contact_mobile_phone = json.get("ContactPersonMobile") or None
+    self.contact_phone = json.get("ContactPersonPhone") or None
+    self.address.name = json.get("Name")
+    self.address.address = json.get("InvoiceAddress1")
+    self.address.secondary_address = json.get("InvoiceAddress2")
+    self.address.postal_code = json.get("InvoicePostalCode")
+    self.address.city = json.get("InvoiceCity")
+    self.address.country = json.get("InvoiceCountryCode")
+    self.delivery_address = delivery_address or None
+    self.delivery_method = delivery_method
+    self.delivery_terms = delivery_terms
+    self.terms_of_payment = terms_of_payment
+    self.webshop_customer_number = json.get("WebshopCustomerNumber") or None
+    self.last_invoice_date = last_invoice_date
+    self.last_edited = last_edited
+    self.reverse_charge_on_construction_services = json.get(
+        "ReverseChargeOnConstructionServices")
+
+    return self
+
+
+def bench(name, func, records, repeat=5):
+    best = min(timeit.repeat(lambda: func(records), number=1, repeat=repeat))
+    print("{:<12} {:8.3f} ms  {:6.2f} us/record".format(
+        name, best * 1000, best * 1e6 / len(records)))
+    return best
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 10000
+    records = [make_record(i) for i in range(count)]
+
+    legacy = bench(
+        "legacy", lambda rs: [legacy_from_json(r) for r in rs], records)
+    decode = Customer.from_json
+    generated = bench(
+        "generated", lambda rs: [decode(r) for r in rs], records)
+    print("speedup      {:8.2f}x".format(legacy / generated))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
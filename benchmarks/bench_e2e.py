@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+End-to-end benchmarks of Store and VismaSession against an in-process fake
+API server, at different levels of concurrency.
+
+    python benchmarks/bench_e2e.py [number of records]
+"""
+import os
+import sys
+import time
+
+from bench_decode import make_record
+from fakeserver import FakeVisma
+from vismalib import Customer, RateLimiter, RetryPolicy, Store
+
+# The fake server is plain HTTP
+os.environ.setdefault("OAUTHLIB_INSECURE_TRANSPORT", "1")
+
+
+def throughput(name, func, count, **params):
+    """
+    Call ``func``, which processes ``count`` objects, and return a result
+    with the number of objects processed per second.
+    """
+
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    return dict(params, **{
+        "name": name,
+        "value": count / elapsed,
+        "unit": "objects/s",
+        "better": "higher",
+    })
+
+
+def consume(results):
+    for result in results:
+        if not result.ok:
+            raise result.error
+
+
+def run(
+        count=2000, latency=0.002, padding=0, concurrency=(1, 4, 16),
+        requests=200):
+    results = []
+    ids = [make_record(i)["Id"] for i in range(requests)]
+    customers = [Customer.from_json(make_record(i)) for i in range(requests)]
+
+    with FakeVisma(records=count, latency=latency, padding=padding) as fake:
+        store = Store(fake.session(pool_maxsize=max(concurrency)))
+        params = {"latency": latency, "padding": padding}
+
+        results.append(throughput(
+            "e2e.find", lambda: store.find(Customer), count, **params))
+        results.append(throughput(
+            "e2e.stream_find", lambda: list(store.stream_find(Customer)),
+            count, **params))
+
+        for workers in concurrency:
+            results.append(throughput(
+                "e2e.iter_find.prefetch{}".format(workers),
+                lambda: list(store.iter_find(
+                    Customer, page_size=100, prefetch=workers)),
+                count, **params))
+            results.append(throughput(
+                "e2e.get_many.workers{}".format(workers),
+                lambda: consume(store.get_many(
+                    Customer, ids, max_workers=workers)),
+                len(ids), **params))
+            # Unchanged objects are skipped, so each run changes them all
+            for customer in customers:
+                customer.note = "Run {}".format(workers)
+            results.append(throughput(
+                "e2e.update_many.workers{}".format(workers),
+                lambda: consume(store.update_many(
+                    customers, max_workers=workers)),
+                len(customers), **params))
+
+    # Every tenth request is throttled, which the rate limiter and retry
+    # policy must recover from
+    with FakeVisma(
+            records=count, latency=latency, padding=padding,
+            throttle_every=10) as fake:
+        store = Store(
+            fake.session(
+                pool_maxsize=max(concurrency),
+                rate_limiter=RateLimiter(
+                    concurrency=max(concurrency), backoff=0.01)),
+            retry=RetryPolicy(total=5, backoff=0.01))
+        for workers in concurrency:
+            fake.reset()
+            result = throughput(
+                "e2e.get_many_throttled.workers{}".format(workers),
+                lambda: consume(store.get_many(
+                    Customer, ids, max_workers=workers)),
+                len(ids), **params)
+            result["throttled"] = fake.throttled
+            results.append(result)
+
+    # Every session starts with an expired token, which must be refreshed
+    # once before the first request however many threads are waiting
+    with FakeVisma(records=count, latency=latency, padding=padding) as fake:
+        for workers in concurrency:
+            fake.reset()
+            store = Store(fake.session(
+                expired=True, pool_maxsize=max(concurrency)))
+            result = throughput(
+                "e2e.get_many_expired_token.workers{}".format(workers),
+                lambda: consume(store.get_many(
+                    Customer, ids, max_workers=workers)),
+                len(ids), **params)
+            if fake.unauthorized or fake.refreshes != 1:
+                raise RuntimeError(
+                    "Expected a single refresh, got {} refreshes and {} "
+                    "unauthorized requests".format(
+                        fake.refreshes, fake.unauthorized))
+            result["refreshes"] = fake.refreshes
+            results.append(result)
+
+    return results
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 2000
+    for result in run(count):
+        print("{name:<40} {value:10.1f} {unit}".format(**result))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Measure the cold start cost of importing vismalib, with and without the
+HTTP stack.
+
+    python benchmarks/bench_import.py [repeat]
+
+Each measurement runs a fresh interpreter, and the time of an interpreter
+that imports nothing is subtracted.
+"""
+import os
+import subprocess
+import sys
+import time
+
+CASES = [
+    ("import.models", "import vismalib; vismalib.Customer"),
+    ("import.store", "import vismalib; vismalib.Store"),
+]
+
+
+def timed_run(code, env):
+    start = time.time()
+    subprocess.check_call([sys.executable, "-c", code], env=env)
+    return time.time() - start
+
+
+def run(repeat=10):
+    # The package is imported from the parent directory of the benchmarks
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        [root] + [p for p in [env.get("PYTHONPATH")] if p])
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    # The first run of each case compiles bytecode, which is not measured
+    for _, code in CASES:
+        timed_run(code, env)
+
+    baseline = min(timed_run("pass", env) for _ in range(repeat))
+    return [{
+        "name": name,
+        "value": (min(timed_run(code, env) for _ in range(repeat)) -
+                  baseline) * 1000,
+        "unit": "ms",
+        "better": "lower",
+    } for name, code in CASES]
+
+
+def main(argv):
+    repeat = int(argv[1]) if len(argv) > 1 else 10
+    for result in run(repeat):
+        print("{name:<28} {value:10.1f} {unit}".format(**result))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
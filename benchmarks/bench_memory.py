@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Memory used per customer when holding many customers in memory, as model
+objects and as compact records.
+
+    python benchmarks/bench_memory.py [number of records]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+
+from bench_decode import make_record
+from vismalib.compact import CompactRecords
+from vismalib.model import Customer
+
+
+def measure(name, decode, pages, count):
+    """
+    Decode every page with ``decode``, keeping the result, and return a
+    result with the number of bytes allocated per object.
+
+    Pages are serialized JSON which is parsed while measuring, like
+    responses from the API, so strings shared with the JSON are counted.
+    """
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        objs = []
+        for page in pages:
+            objs.extend(decode(json.loads(page)))
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": name,
+        "value": float(size) / count,
+        "unit": "bytes/object",
+        "better": "lower",
+    }
+
+
+def run(count=20000, page_size=500):
+    pages = [
+        json.dumps([
+            make_record(i)
+            for i in range(start, min(start + page_size, count))])
+        for start in range(0, count, page_size)]
+    decode = Customer.from_json
+
+    return [
+        measure(
+            "memory.model", lambda items: [decode(i) for i in items],
+            pages, count),
+        measure(
+            "memory.compact",
+            CompactRecords(Customer).decode_many, pages, count),
+        measure(
+            "memory.compact_no_intern",
+            CompactRecords(Customer, intern=False).decode_many, pages, count),
+    ]
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 20000
+    for result in run(count):
+        print("{name:<28} {value:10.1f} {unit}".format(**result))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
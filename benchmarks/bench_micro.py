@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Microbenchmarks of per-record work: decoding, encoding, URL building and
+repr of customers.
+
+    python benchmarks/bench_micro.py [number of records]
+"""
+import sys
+import timeit
+
+from datetime import datetime, timedelta
+
+from bench_decode import make_record
+from vismalib.frame import ModelFrame
+from vismalib.model import Customer
+from vismalib.utils import parse_timestamp
+
+
+def measure(name, func, count, repeat=5):
+    """
+    Time ``func``, which performs ``count`` operations, and return a result
+    with the best time per operation in microseconds.
+    """
+
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    return {
+        "name": name,
+        "value": best * 1e6 / count,
+        "unit": "us/op",
+        "better": "lower",
+    }
+
+
+def make_timestamps(count):
+    """
+    Return ``count`` distinct timestamps in Visma's format.
+    """
+
+    start = datetime(2019, 3, 12, 10, 11, 12)
+    return [
+        (start + timedelta(seconds=i, microseconds=i * 7)).strftime(
+            "%Y-%m-%dT%H:%M:%S.%f") + "0"
+        for i in range(count)]
+
+
+def parse_uncached(timestamps):
+    # The cache is cleared first, or every repeat but the first would only
+    # measure cache hits
+    parse_timestamp.cache_clear()
+    return [parse_timestamp(t) for t in timestamps]
+
+
+def run(count=10000, repeat=5):
+    records = [make_record(i) for i in range(count)]
+    customers = [Customer.from_json(record) for record in records]
+    decode = Customer.from_json
+    timestamps = make_timestamps(count)
+    # Many objects share a timestamp, like the date of a bulk import, which
+    # is the case the cache is for
+    shared = [timestamps[i % 100] for i in range(count)]
+
+    cases = [
+        ("micro.decode", lambda: [decode(r) for r in records]),
+        ("micro.decode_lazy", lambda: [decode(r, True) for r in records]),
+        ("micro.decode_frame",
+         lambda: ModelFrame.from_json(Customer, records)),
+        ("micro.encode", lambda: [c.to_json() for c in customers]),
+        ("micro.changed_fields",
+         lambda: [c.changed_fields() for c in customers]),
+        ("micro.repr", lambda: [repr(c) for c in customers]),
+        ("micro.url_get",
+         lambda: [Customer._visma_get(c.id) for c in customers]),
+        ("micro.url_list_page",
+         lambda: [Customer._visma_list_page(i, 100) for i in range(count)]),
+        ("micro.parse_timestamp", lambda: parse_uncached(timestamps)),
+        ("micro.parse_timestamp_cached",
+         lambda: [parse_timestamp(t) for t in shared]),
+    ]
+    return [measure(name, func, count, repeat) for name, func in cases]
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 10000
+    for result in run(count):
+        print("{name:<28} {value:10.3f} {unit}".format(**result))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
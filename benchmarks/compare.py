@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Compare two result files written by ``run.py``.
+
+    python benchmarks/compare.py base.json new.json [--threshold 5]
+
+Changes larger than the threshold, in percent, are marked as improvements
+or regressions. The exit status is 1 if there is any regression.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, "r") as f:
+        return dict(
+            (result["name"], result) for result in json.load(f)["results"])
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument(
+        "--threshold", type=float, default=5.0,
+        help="Percent change to report as improvement or regression")
+    args = parser.parse_args(argv[1:])
+
+    base = load(args.base)
+    new = load(args.new)
+
+    regressions = 0
+    for name in sorted(set(base) | set(new)):
+        if name not in base or name not in new:
+            print("{:<40} {}".format(
+                name, "removed" if name in base else "added"))
+            continue
+
+        old_value = base[name]["value"]
+        new_value = new[name]["value"]
+        change = (new_value - old_value) / old_value * 100
+        if base[name]["better"] == "lower":
+            change = -change
+
+        if change <= -args.threshold:
+            verdict = "REGRESSION"
+            regressions += 1
+        elif change >= args.threshold:
+            verdict = "improvement"
+        else:
+            verdict = ""
+
+        print("{:<40} {:12.3f} {:12.3f} {:>+8.1f}% {}  {}".format(
+            name, old_value, new_value, change, new[name]["unit"], verdict))
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
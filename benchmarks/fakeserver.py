@@ -0,0 +1,302 @@
+"""
+In-process fake of the eAccounting API, used by the end-to-end benchmarks.
+
+    with FakeVisma(records=5000, latency=0.005) as server:
+        session = server.session()
+        ...
+
+Only customers are served. Lists are returned as a plain array, or as a
+paginated envelope when ``$page`` is given, like the real API. Requests
+must carry a token issued by the server, and tokens are refreshed through
+``/connect/token``.
+"""
+import json
+import re
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+
+from bench_decode import make_record
+
+_customer = re.compile(r"^/customers/.*?(\d+)$")
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which with Nagle's
+    # algorithm adds the delayed ACK timeout to every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=()):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def read_json(self):
+        body = self.read_body()
+        return json.loads(body.decode("utf-8")) if body else None
+
+    def handle_request(self, method):
+        fake = self.server.fake
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        if fake.throttle():
+            self.read_body()
+            return self.send_json(
+                429, {"Message": "Too many requests"},
+                [("Retry-After", str(fake.retry_after))])
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/connect/token" and method == "POST":
+            # OAuth token requests are form encoded, not JSON
+            body = self.read_body().decode("utf-8")
+            token = fake.refresh(parse_qs(body))
+            if token is None:
+                return self.send_json(400, {"error": "invalid_grant"})
+            return self.send_json(200, token)
+
+        if not fake.authorized(self.headers.get("Authorization")):
+            self.read_body()
+            return self.send_json(401, {"Message": "Unauthorized"})
+
+        if url.path == "/customers":
+            if method == "GET":
+                if "$page" in query:
+                    return self.send_json(200, fake.page(
+                        int(query["$page"][0]),
+                        int(query.get("$pagesize", ["50"])[0])))
+                return self.send_json(200, fake.all())
+            if method == "POST":
+                body = self.read_json()
+                body["Id"] = make_record(fake.next_id())["Id"]
+                return self.send_json(200, body)
+
+        match = _customer.match(url.path)
+        if match is not None:
+            index = int(match.group(1))
+            if index >= fake.records:
+                return self.send_json(404, {"Message": "Not found"})
+            if method == "GET":
+                return self.send_json(200, fake.record(index))
+            if method == "PUT":
+                return self.send_json(200, self.read_json())
+            if method == "DELETE":
+                return self.send_json(204, b"")
+
+        self.send_json(404, {"Message": "Not found"})
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_PUT(self):
+        self.handle_request("PUT")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+
+class FakeVisma(object):
+    """
+    Fake eAccounting API served from a background thread.
+
+    :param records: Number of customers
+    :param latency: Seconds to wait before responding to each request
+    :param padding: Number of extra characters in the note of every
+                    customer, which increases the size of payloads
+    :param throttle_every: Respond to every n:th request with ``429 Too Many
+                           Requests``, ``0`` to never throttle
+    :param retry_after: Value of ``Retry-After`` header of throttled
+                        responses
+    """
+
+    def __init__(
+            self, records=1000, latency=0.0, padding=0, throttle_every=0,
+            retry_after=0):
+        self.records = records
+        self.latency = latency
+        self.padding = padding
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+
+        self.requests = 0
+        self.throttled = 0
+        self.refreshes = 0
+        self.unauthorized = 0
+        self._lock = threading.Lock()
+        self._tokens = set(["token"])
+        self._refresh_tokens = set(["refresh"])
+        self._ids = records
+        self._bodies = {}
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}/".format(host, port)
+
+    def start(self):
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def session(self, expired=False, **kwargs):
+        """
+        Return a :class:`vismalib.VismaSession` for the server. Keyword
+        arguments are passed on to the session.
+
+        :param expired: Start with a token that has expired, which the
+                        session must refresh before its first request
+        """
+
+        from vismalib import VismaSession
+
+        token = {
+            "access_token": "token",
+            "refresh_token": "refresh",
+            "token_type": "Bearer",
+        }
+        if expired:
+            token["expires_at"] = time.time() - 60
+
+        return VismaSession(
+            "client", "secret", token=token,
+            auto_refresh_url=self.url + "connect/token", base_url=self.url,
+            token_updater=lambda token: None, **kwargs)
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.throttled = 0
+            self.refreshes = 0
+            self.unauthorized = 0
+
+    def throttle(self):
+        # Count the request and return True if it should be throttled
+        with self._lock:
+            self.requests += 1
+            if self.throttle_every and \
+                    self.requests % self.throttle_every == 0:
+                self.throttled += 1
+                return True
+            return False
+
+    def next_id(self):
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    def refresh(self, form):
+        """
+        Return a new token for a refresh token request, or ``None`` if the
+        request is invalid. Tokens issued earlier remain valid.
+        """
+
+        with self._lock:
+            if form.get("grant_type") != ["refresh_token"] or \
+                    form.get("refresh_token", [None])[0] not in \
+                    self._refresh_tokens:
+                return None
+
+            self.refreshes += 1
+            issued = len(self._tokens)
+            token = {
+                "access_token": "token-{}".format(issued),
+                "refresh_token": "refresh-{}".format(issued),
+                "token_type": "Bearer",
+                "expires_in": 3600,
+            }
+            self._tokens.add(token["access_token"])
+            self._refresh_tokens.add(token["refresh_token"])
+            return token
+
+    def authorized(self, header):
+        # Count and reject requests without a token issued by the server
+        scheme, _, token = (header or "").partition(" ")
+        with self._lock:
+            if scheme == "Bearer" and token in self._tokens:
+                return True
+            self.unauthorized += 1
+            return False
+
+    def record(self, index):
+        record = make_record(index)
+        if self.padding:
+            record["Note"] = "x" * self.padding
+        return record
+
+    def _body(self, key, make):
+        # Responses are encoded once, which keeps the server from being the
+        # bottleneck of the benchmarks
+        body = self._bodies.get(key)
+        if body is None:
+            body = json.dumps(make()).encode("utf-8")
+            self._bodies[key] = body
+        return body
+
+    def all(self):
+        return self._body("all", lambda: [
+            self.record(i) for i in range(self.records)])
+
+    def page(self, page, page_size):
+        def make():
+            start = (page - 1) * page_size
+            return {
+                "Meta": {
+                    "CurrentPage": page,
+                    "PageSize": page_size,
+                    "TotalNumberOfPages":
+                        (self.records + page_size - 1) // page_size,
+                    "TotalNumberOfResults": self.records,
+                },
+                "Data": [
+                    self.record(i) for i in range(
+                        start, min(start + page_size, self.records))],
+            }
+        return self._body(("page", page, page_size), make)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Run the benchmark suite and write the results to a JSON file, which can be
+compared to the results of another run with ``compare.py``.
+
+    python benchmarks/run.py [-o results.json] [--quick]
+                             [--only micro|e2e|import|memory]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import bench_e2e
+import bench_import
+import bench_memory
+import bench_micro
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            stderr=subprocess.STDOUT).decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument(
+        "-o", "--output", default="benchmark-results.json",
+        help="File to write results to")
+    parser.add_argument(
+        "--quick", action="store_true",
+        help="Use smaller workloads, for a quick sanity check")
+    parser.add_argument(
+        "--only", choices=["micro", "e2e", "import", "memory"],
+        help="Only run one suite")
+    parser.add_argument(
+        "--latency", type=float, default=0.002,
+        help="Latency of fake server in seconds")
+    parser.add_argument(
+        "--padding", type=int, default=0,
+        help="Extra characters per record served by the fake server")
+    args = parser.parse_args(argv[1:])
+
+    results = []
+    if args.only in (None, "micro"):
+        results.extend(bench_micro.run(
+            count=1000 if args.quick else 10000))
+    if args.only in (None, "import"):
+        results.extend(bench_import.run(repeat=3 if args.quick else 10))
+    if args.only in (None, "memory"):
+        results.extend(bench_memory.run(
+            count=2000 if args.quick else 20000))
+    if args.only in (None, "e2e"):
+        results.extend(bench_e2e.run(
+            count=500 if args.quick else 5000, latency=args.latency,
+            padding=args.padding, requests=50 if args.quick else 200))
+
+    for result in results:
+        print("{name:<40} {value:12.3f} {unit}".format(**result))
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "meta": {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "implementation": platform.python_implementation(),
+                "platform": platform.platform(),
+                "quick": args.quick,
+            },
+            "results": results,
+        }, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -23,9 +23,13 @@ if __name__ == "__main__":
         url="https://www.github.com/runfalk/vismalib",
         packages=["vismalib"],
         install_requires=[
+            "futures; python_version < '3'",
             "requests>=2.4.2",
             "requests_oauthlib"
         ],
+        extras_require={
+            "async": ["aiohttp"],
+        },
         classifiers=(
             "Development Status :: 3 - Alpha",
             "Intended Audience :: Developers",
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The fake API server of the benchmarks is used by the tests as well
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks"))
+
+# The fake API server is plain HTTP
+os.environ.setdefault("OAUTHLIB_INSECURE_TRANSPORT", "1")
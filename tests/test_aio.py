@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from bench_decode import make_record
+from fakeserver import FakeVisma
+from vismalib import Customer
+from vismalib.aio import AsyncResponse, AsyncStore, AsyncVismaSession
+
+
+@pytest.fixture
+def fake():
+    with FakeVisma(records=20) as fake:
+        yield fake
+
+
+def session(fake, access_token="token", expires_at=None):
+    token = {
+        "access_token": access_token,
+        "refresh_token": "refresh",
+        "token_type": "Bearer",
+    }
+    if expires_at is not None:
+        token["expires_at"] = expires_at
+    return AsyncVismaSession(
+        "client", "secret", token=token,
+        auto_refresh_url=fake.url + "connect/token", base_url=fake.url,
+        max_concurrency=8)
+
+
+def get_all(fake, client):
+    ids = [make_record(i)["Id"] for i in range(fake.records)]
+
+    async def run():
+        async with client:
+            store = AsyncStore(client)
+            customers = await asyncio.gather(
+                *[store.get(Customer, id) for id in ids])
+            return [c.id for c in customers]
+
+    assert asyncio.run(run()) == ids
+
+
+def test_find(fake):
+    async def run():
+        async with session(fake) as client:
+            return await AsyncStore(client).find(Customer)
+
+    customers = asyncio.run(run())
+    assert [c.id for c in customers] == \
+        [make_record(i)["Id"] for i in range(fake.records)]
+
+
+def test_find_page():
+    class StubClient(object):
+        async def request(self, **kwargs):
+            return AsyncResponse(200, {}, (
+                b'{"Meta": {"TotalNumberOfPages": 1}, '
+                b'"Data": [{"Id": "id-1"}, {"Id": "id-2"}]}'))
+
+    customers = asyncio.run(AsyncStore(StubClient()).find(Customer))
+    assert [c.id for c in customers] == ["id-1", "id-2"]
+
+
+def test_expired_token_refreshed_once(fake):
+    get_all(fake, session(fake, expires_at=time.time() - 60))
+
+    assert fake.refreshes == 1
+    assert fake.unauthorized == 0
+
+
+def test_rejected_token_refreshed_once(fake):
+    # A token the server does not know about is rejected before it expires,
+    # which is retried once with a new token
+    get_all(fake, session(fake, access_token="revoked"))
+
+    assert fake.refreshes == 1
+    assert 0 < fake.unauthorized <= 8
+
+
+def test_rejected_without_refresh_url(fake):
+    async def run():
+        client = session(fake, access_token="revoked")
+        client.auto_refresh_url = None
+        async with client:
+            return await client.request("GET", "customers/id-1")
+
+    assert asyncio.run(run()).status_code == 401
+    assert fake.refreshes == 0
@@ -0,0 +1,228 @@
+import json
+import pytest
+
+from requests.adapters import BaseAdapter
+from requests.models import Response as HttpResponse
+from requests.structures import CaseInsensitiveDict
+
+from vismalib import Customer, VismaSession
+from vismalib.cache import HttpCache, HttpCacheEntry, ObjectCache
+from vismalib.store import Store
+
+
+def make_record(i, **changes):
+    record = {"Id": "id-{}".format(i), "CustomerNumber": str(i)}
+    record.update(changes)
+    return record
+
+
+class Response(object):
+    def __init__(self, data):
+        self.status_code = 200
+        self.headers = {}
+        self.content = b""
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class StubClient(object):
+    def __init__(self):
+        self.urls = []
+
+    def request(self, method, url, **kwargs):
+        self.urls.append(url)
+        return Response(make_record(int(url.rsplit("-", 1)[1])))
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("vismalib.cache.monotonic", lambda: now[0])
+    return now
+
+
+def test_get_copies():
+    cache = ObjectCache()
+    customer = Customer.from_json(make_record(1))
+
+    assert cache.get(Customer, "id-1") is None
+    assert cache.put(Customer, "id-1", customer, make_record(1)) is customer
+
+    first = cache.get(Customer, "id-1")
+    second = cache.get(Customer, "id-1")
+    assert first is not second
+    assert first.number == second.number == "1"
+    assert cache.stats["hits"] == 2
+    assert cache.stats["misses"] == 1
+
+
+def test_identity_map():
+    cache = ObjectCache(identity_map=True)
+    customer = Customer.from_json(make_record(1))
+    cache.put(Customer, "id-1", customer, make_record(1))
+
+    assert cache.get(Customer, "id-1") is customer
+
+    # Fetching the object again updates the cached instance in place
+    fresh = Customer.from_json(make_record(1, CustomerNumber="2"))
+    assert cache.put(
+        Customer, "id-1", fresh, make_record(1, CustomerNumber="2")) \
+        is customer
+    assert customer.number == "2"
+
+
+def test_lru_eviction():
+    cache = ObjectCache(max_size=2)
+    for i in range(3):
+        if i == 2:
+            # Make the first entry the most recently used
+            cache.get(Customer, "id-0")
+        cache.put(Customer, "id-{}".format(i), None, make_record(i))
+
+    assert cache.get(Customer, "id-1") is None
+    assert cache.get(Customer, "id-0") is not None
+    assert cache.get(Customer, "id-2") is not None
+    assert cache.stats["evictions"] == 1
+
+
+def test_ttl(now):
+    cache = ObjectCache(ttl=10, ttls={Customer: 5})
+    cache.put(Customer, "id-1", None, make_record(1))
+
+    now[0] = 4.9
+    assert cache.get(Customer, "id-1") is not None
+    now[0] = 5.0
+    assert cache.get(Customer, "id-1") is None
+    assert cache.stats["expirations"] == 1
+
+
+def test_store_get_cached():
+    client = StubClient()
+    store = Store(client, cache=ObjectCache(identity_map=True))
+
+    customer = store.get(Customer, "id-1")
+    assert store.get(Customer, "id-1") is customer
+    assert client.urls == ["customers/id-1"]
+
+    store.cache.invalidate(Customer, "id-1")
+    assert store.get(Customer, "id-1") is not customer
+    assert len(client.urls) == 2
+
+
+class ETagAdapter(BaseAdapter):
+    """
+    Transport adapter serving customers with an ``ETag`` which changes with
+    their version, and ``304 Not Modified`` when it matches.
+    """
+
+    def __init__(self):
+        super(ETagAdapter, self).__init__()
+        self.versions = {}
+        self.statuses = []
+
+    def send(self, request, **kwargs):
+        id = request.path_url.rsplit("/", 1)[1]
+        version = self.versions.get(id, 1)
+        etag = '"{}"'.format(version)
+
+        response = HttpResponse()
+        response.request = request
+        response.url = request.url
+        if request.headers.get("If-None-Match") == etag:
+            response.status_code = 304
+            response.headers = CaseInsensitiveDict({
+                "ETag": etag, "Date": "v{}".format(len(self.statuses))})
+            response._content = b""
+        else:
+            response.status_code = 200
+            response._content = json.dumps(make_record(
+                int(id.rsplit("-", 1)[1]),
+                CustomerNumber=str(version))).encode("utf-8")
+            response.headers = CaseInsensitiveDict({
+                "ETag": etag, "Content-Type": "application/json",
+                "Content-Length": str(len(response._content)),
+                "Date": "v{}".format(len(self.statuses))})
+        self.statuses.append(response.status_code)
+        return response
+
+
+@pytest.fixture
+def http_session():
+    return VismaSession(
+        "client", "secret", token={"access_token": "token"},
+        base_url="http://visma.invalid/", http_cache=HttpCache(),
+        transport=ETagAdapter())
+
+
+def test_http_cache_revalidate(http_session):
+    store = Store(http_session)
+    adapter = http_session.adapter
+
+    first = http_session.get("customers/id-1")
+    assert not first.from_cache
+    assert store.get(Customer, "id-1").number == "1"
+
+    second = http_session.get("customers/id-1")
+    assert adapter.statuses == [200, 304, 304]
+    assert second.from_cache
+    assert second.status_code == 200
+    assert second.json() is first.json()
+
+    # Headers of the cached response are kept, with the ones of the 304
+    # taking precedence
+    assert second.headers["Content-Type"] == "application/json"
+    assert second.headers["Date"] == "v2"
+    assert "Content-Length" not in second.headers
+    assert http_session.http_cache.stats["not_modified"] == 2
+
+
+def test_http_cache_changed(http_session):
+    adapter = http_session.adapter
+    cache = http_session.http_cache
+
+    http_session.get("customers/id-1")
+    adapter.versions["id-1"] = 2
+
+    # A new version replaces the cached entry
+    response = http_session.get("customers/id-1")
+    assert not response.from_cache
+    assert response.json()["CustomerNumber"] == "2"
+    assert http_session.get("customers/id-1").from_cache
+    assert adapter.statuses == [200, 200, 304]
+    assert len(cache) == 1
+
+    # Entries that can no longer be revalidated are dropped
+    key = cache.key("http://visma.invalid/customers/id-1")
+    adapter.send = lambda request, **kwargs: HttpResponse()
+    assert cache.get(key) is not None
+    http_session.get("customers/id-1")
+    assert cache.get(key) is None
+
+
+def test_http_cache_key():
+    key = HttpCache.key("customers", {"b": [1, 2], "a": {"y": 1, "x": 2}})
+
+    assert key == HttpCache.key(
+        "customers", {"a": {"x": 2, "y": 1}, "b": [1, 2]})
+    assert key != HttpCache.key("customers", {"b": [2, 1], "a": {}})
+    assert hash(key) == hash(HttpCache.key(
+        "customers", {"a": {"x": 2, "y": 1}, "b": [1, 2]}))
+
+
+def test_http_cache_max_bytes():
+    cache = HttpCache(max_bytes=10)
+    cache.put("a", HttpCacheEntry(b"12345"))
+    cache.put("b", HttpCacheEntry(b"12345"))
+    cache.put("c", HttpCacheEntry(b"123"))
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.stats["bytes"] == 8
+    assert cache.stats["evictions"] == 1
+
+    # Bodies larger than the cache are never cached
+    cache.put("b", HttpCacheEntry(b"x" * 11))
+    assert cache.get("b") is None
+    assert cache.stats["bytes"] == 3
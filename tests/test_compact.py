@@ -0,0 +1,73 @@
+import pickle
+
+from vismalib import Customer
+from vismalib.compact import CompactRecords
+
+
+def make_record(i):
+    return {
+        "Id": "id-{}".format(i),
+        "CustomerNumber": str(i),
+        "Name": "Customer {}".format(i),
+        "InvoiceCity": "Stockholm",
+        "InvoiceCountryCode": "SE",
+        "ChangedUtc": "2019-03-12T10:11:12.1234567",
+        "TermsOfPaymentId": "terms-1",
+        "TermsOfPayment": {"Id": "terms-1", "Name": "30 days"},
+    }
+
+
+def test_same_as_model():
+    customer = Customer.from_json(make_record(1))
+    record = CompactRecords(Customer).from_json(make_record(1))
+
+    assert repr(record) == repr(customer)
+    assert record.to_json() == customer.to_json()
+    assert record.name == "Customer 1"
+    assert record.delivery_address is None
+
+
+def test_shared_values():
+    records = CompactRecords(Customer).decode_many(
+        [make_record(i) for i in range(2)])
+
+    assert records[0].address.city is records[1].address.city
+    assert records[0].last_edited is records[1].last_edited
+    assert records[0].terms_of_payment is records[1].terms_of_payment
+
+
+def test_frozen():
+    record = CompactRecords(Customer).from_json(make_record(1))
+
+    try:
+        record.name = "Other"
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("Record was modified")
+    assert record.replace(note="Note").note == "Note"
+    assert record.note is None
+
+
+def test_to_model():
+    records = CompactRecords(Customer).decode_many(
+        [make_record(i) for i in range(2)])
+    customer = records[0].to_model()
+
+    assert not customer.has_changed()
+    customer.name = "Other"
+    customer.terms_of_payment.name = "Other"
+    assert customer.changed_fields() == ["address"]
+
+    # Shared values of other records are left alone
+    assert records[0].name == "Customer 0"
+    assert records[1].terms_of_payment.name == "30 days"
+
+
+def test_pickle():
+    record = CompactRecords(Customer).from_json(make_record(1))
+    loaded = pickle.loads(pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+
+    assert type(loaded) is type(record)
+    assert repr(loaded) == repr(record)
+    assert loaded.to_json() == record.to_json()
@@ -0,0 +1,94 @@
+import pytest
+
+from bench_decode import make_record
+from vismalib import Customer
+from vismalib.frame import ModelFrame
+from vismalib.store import Store
+
+
+class Response(object):
+    status_code = 200
+    headers = {}
+    content = b""
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class StubClient(object):
+    def request(self, **kwargs):
+        return Response([make_record(i) for i in range(5)])
+
+
+def column_value(obj, name):
+    for attr in name.split("."):
+        if obj is None:
+            return None
+        obj = getattr(obj, attr)
+    return obj
+
+
+@pytest.fixture
+def records():
+    records = [make_record(i) for i in range(5)]
+    records[1]["InvoiceCountryCode"] = "NO"
+    records[2]["DeliveryMethodId"] = None
+    records[3]["LastInvoiceDate"] = None
+    return records
+
+
+def test_columns(records):
+    frame = ModelFrame.from_json(Customer, records)
+    customers = [Customer.from_json(r) for r in records]
+
+    assert len(frame) == 5
+    assert "address.city" in frame
+    assert "address" not in frame
+    for name, column in frame.columns.items():
+        assert column == [column_value(c, name) for c in customers], name
+
+
+def test_filter(records):
+    frame = ModelFrame.from_json(Customer, records)
+
+    mask = frame.where("address.country", lambda c: c == "SE")
+    assert mask == [True, False, True, True, True]
+
+    swedish = frame[mask]
+    assert len(swedish) == 4
+    assert swedish["number"] == ["0", "2", "3", "4"]
+    assert list(swedish.columns) == list(frame.columns)
+    assert len(frame) == 5
+
+    with pytest.raises(ValueError):
+        frame.filter([True])
+
+
+def test_store_find():
+    frame = Store(StubClient()).find(Customer, as_frame=True)
+
+    assert isinstance(frame, ModelFrame)
+    assert frame["number"] == [str(i) for i in range(5)]
+
+
+def test_to_numpy(records):
+    numpy = pytest.importorskip("numpy")
+    frame = ModelFrame.from_json(Customer, records)
+
+    assert frame.to_numpy("is_company").dtype == numpy.bool_
+    assert frame.to_numpy("delivery_method.id").dtype == object
+    assert list(frame.to_numpy("number")) == frame["number"]
+
+
+def test_to_pandas(records):
+    pytest.importorskip("pandas")
+    frame = ModelFrame.from_json(Customer, records)
+    df = frame.to_pandas()
+
+    assert list(df.columns) == list(frame.columns)
+    assert len(df) == 5
+    assert list(df[df["address.country"] == "SE"]["number"]) == \
+        ["0", "2", "3", "4"]
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+
+def run(code):
+    # A fresh interpreter, since the tests have imported everything already
+    return subprocess.check_output(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ).decode("ascii").split()
+
+
+def test_lazy_modules_not_imported():
+    assert run(
+        "import sys, vismalib; print('vismalib.store' in sys.modules)"
+    ) == ["False"]
+
+
+def test_lazy_names():
+    assert run(
+        "import vismalib; print(vismalib.Store.__module__)"
+    ) == ["vismalib.store"]
+
+
+def test_lazy_submodules():
+    assert run(
+        "import vismalib; print(vismalib.store.__name__, "
+        "vismalib.retry.__name__, 'mirror' in dir(vismalib))"
+    ) == ["vismalib.store", "vismalib.retry", "True"]
+
+
+def test_unknown_name():
+    assert run(
+        "import vismalib\n"
+        "try:\n"
+        "    vismalib.missing\n"
+        "except AttributeError:\n"
+        "    print('AttributeError')"
+    ) == ["AttributeError"]
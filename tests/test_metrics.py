@@ -0,0 +1,89 @@
+from vismalib import Customer
+from vismalib.metrics import DURATION_BUCKETS, HistogramCollector, timed
+from vismalib.store import Store
+
+
+class Response(object):
+    status_code = 200
+    headers = {}
+    content = b"[]"
+
+    def json(self):
+        return []
+
+
+class StubClient(object):
+    def request(self, **kwargs):
+        return Response()
+
+
+def test_buckets():
+    metrics = HistogramCollector(buckets=[2, 1])
+    for value in (0.5, 1, 1.5, 2, 3):
+        metrics.observe("size", value, method="GET")
+
+    state = metrics.snapshot()[("size", (("method", "GET"),))]
+    # Bounds are inclusive and counts are cumulative
+    assert state["buckets"] == [(1, 2), (2, 4), (float("inf"), 5)]
+    assert state["count"] == 5
+    assert state["sum"] == 8.0
+
+
+def test_default_buckets():
+    metrics = HistogramCollector()
+    metrics.observe("request_seconds", 0.2)
+    metrics.observe("response_bytes", 1000)
+
+    snapshot = metrics.snapshot()
+    assert [b for b, _ in snapshot[("request_seconds", ())]["buckets"]] == \
+        list(DURATION_BUCKETS) + [float("inf")]
+    assert snapshot[("response_bytes", ())]["buckets"][:3] == \
+        [(256, 0), (1024, 1), (4096, 1)]
+
+
+def test_to_prometheus():
+    metrics = HistogramCollector(buckets=[0.1, 1])
+    metrics.observe("request_seconds", 0.05, method="GET", status="200")
+    metrics.observe("request_seconds", 0.5, method="GET", status="200")
+    metrics.observe("request_seconds", 2, method="POST", status="500")
+    metrics.observe("call_seconds", 0.25, type='Quote"d\\')
+
+    assert metrics.to_prometheus() == "\n".join([
+        "# TYPE vismalib_call_seconds histogram",
+        'vismalib_call_seconds_bucket{type="Quote\\"d\\\\",le="0.1"} 0',
+        'vismalib_call_seconds_bucket{type="Quote\\"d\\\\",le="1"} 1',
+        'vismalib_call_seconds_bucket{type="Quote\\"d\\\\",le="+Inf"} 1',
+        'vismalib_call_seconds_sum{type="Quote\\"d\\\\"} 0.25',
+        'vismalib_call_seconds_count{type="Quote\\"d\\\\"} 1',
+        "# TYPE vismalib_request_seconds histogram",
+        'vismalib_request_seconds_bucket{method="GET",status="200",le="0.1"} 1',
+        'vismalib_request_seconds_bucket{method="GET",status="200",le="1"} 2',
+        'vismalib_request_seconds_bucket{method="GET",status="200",le="+Inf"} 2',
+        'vismalib_request_seconds_sum{method="GET",status="200"} 0.55',
+        'vismalib_request_seconds_count{method="GET",status="200"} 2',
+        'vismalib_request_seconds_bucket{method="POST",status="500",le="0.1"} 0',
+        'vismalib_request_seconds_bucket{method="POST",status="500",le="1"} 0',
+        'vismalib_request_seconds_bucket{method="POST",status="500",le="+Inf"} 1',
+        'vismalib_request_seconds_sum{method="POST",status="500"} 2.0',
+        'vismalib_request_seconds_count{method="POST",status="500"} 1',
+    ]) + "\n"
+
+    metrics.clear()
+    metrics.observe("size", 1)
+    assert metrics.to_prometheus(prefix=None).splitlines()[0] == \
+        "# TYPE size histogram"
+
+
+def test_store_metrics():
+    metrics = HistogramCollector()
+    store = Store(StubClient(), metrics=metrics)
+    store.find(Customer)
+
+    labels = (("operation", "find"), ("type", "Customer"))
+    snapshot = metrics.snapshot()
+    for name in ("call_seconds", "json_seconds", "decode_seconds"):
+        assert snapshot[(name, labels)]["count"] == 1
+
+    with timed(None, "ignored"):
+        pass
+    assert len(metrics.snapshot()) == len(snapshot)
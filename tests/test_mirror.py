@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from vismalib import Customer
+from vismalib._compat import utc
+from vismalib.mirror import SqliteMirror
+
+
+def make_record(i, **changes):
+    record = {
+        "Id": "id-{}".format(i),
+        "CustomerNumber": str(i),
+        "Name": "Customer {}".format(i),
+        "InvoiceCity": "Stockholm" if i % 2 else "Lund",
+        "InvoiceCountryCode": "SE",
+        "DeliveryCustomerName": "Delivery {}".format(i),
+        "DeliveryTermId": "terms-1",
+        "ChangedUtc": "2019-03-{:02d}T10:11:12.1234567".format(i + 1),
+    }
+    record.update(changes)
+    return record
+
+
+@pytest.fixture
+def mirror():
+    mirror = SqliteMirror(":memory:", [Customer])
+    mirror.load(Customer, [make_record(i) for i in range(10)])
+    yield mirror
+    mirror.close()
+
+
+def test_find(mirror):
+    customers = mirror.find(Customer, InvoiceCity="Lund")
+
+    assert len(customers) == 5
+    assert all(c.address.city == "Lund" for c in customers)
+    assert mirror.get(Customer, "id-3").number == "3"
+    assert mirror.get(Customer, "missing") is None
+
+
+def test_find_renamed_keys(mirror):
+    # Columns use the model's keys, which differ from the API's for these
+    assert mirror.find(Customer, DeliveryName="Delivery 4")[0].id == "id-4"
+    assert len(mirror.find(Customer, DeliveryTerms="terms-1")) == 10
+
+
+def test_find_timestamp(mirror):
+    customer = mirror.get(Customer, "id-4")
+
+    found = mirror.find(Customer, ChangedUtc=customer.last_edited)
+    assert [c.id for c in found] == ["id-4"]
+    assert mirror.find(
+        Customer, ChangedUtc="2019-03-05T10:11:12.1234567")[0].id == "id-4"
+
+
+def test_find_range(mirror):
+    since = datetime(2019, 3, 8, tzinfo=utc)
+
+    ids = sorted(c.id for c in mirror.find(Customer, ChangedUtc__ge=since))
+    assert ids == ["id-7", "id-8", "id-9"]
+
+    ids = mirror.find(
+        Customer, ChangedUtc__gt=since, ChangedUtc__lt=since + timedelta(1))
+    assert [c.id for c in ids] == ["id-7"]
+
+
+def test_find_null(mirror):
+    mirror.load(Customer, [make_record(10, CustomerNumber=None)])
+
+    assert [c.id for c in mirror.find(Customer, CustomerNumber=None)] == [
+        "id-10"]
+    assert len(mirror.find(Customer, CustomerNumber__ne=None)) == 10
+
+
+def test_find_invalid(mirror):
+    with pytest.raises(ValueError):
+        mirror.find(Customer, Missing=1)
+    with pytest.raises(ValueError):
+        mirror.find(Customer, ChangedUtc__between=1)
+    with pytest.raises(ValueError):
+        mirror.find(Customer, CustomerNumber=object())
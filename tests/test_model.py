@@ -0,0 +1,86 @@
+import pytest
+
+from bench_decode import make_record
+from vismalib import Customer, TermsOfPayment
+
+
+@pytest.fixture
+def record():
+    return make_record(1)
+
+
+def test_lazy_fields(record):
+    customer = Customer.from_json(record, lazy=True)
+    eager = Customer.from_json(record)
+
+    # Nothing is decoded until accessed, which leaves the slots empty
+    with pytest.raises(AttributeError):
+        Customer.number.__get__(customer, Customer)
+
+    assert customer.number == eager.number == "1"
+    assert customer.last_edited == eager.last_edited
+    assert customer.terms_of_payment.name == "30 dagar"
+
+    # Proxies decode the embedded object they proxy to
+    assert customer.name == eager.name == "Customer 1"
+    assert customer.address.city == "Stockholm"
+
+    with pytest.raises(AttributeError):
+        customer.no_such_field
+
+
+def test_lazy_to_json(record):
+    assert Customer.from_json(record, lazy=True).to_json() == \
+        Customer.from_json(record).to_json()
+
+    # Decoding again replaces the values decoded from the previous JSON
+    customer = Customer.from_json(record, lazy=True)
+    assert customer.number == "1"
+    customer.from_json(make_record(2), lazy=True)
+    assert customer.number == "2"
+    assert customer.to_json() == Customer.from_json(make_record(2)).to_json()
+
+
+def test_lazy_changed_fields(record):
+    customer = Customer.from_json(record, lazy=True)
+    assert customer.changed_fields() == []
+
+    # Accessing a field does not change it
+    assert customer.address.city == "Stockholm"
+    assert customer.email is not None
+    assert not customer.has_changed()
+
+    customer.name = "Renamed"
+    customer.number = "2"
+    assert customer.changed_fields() == ["number", "address"]
+
+
+def test_changed_fields(record):
+    customer = Customer.from_json(record)
+    assert not customer.has_changed()
+
+    customer.address.city = "Uppsala"
+    customer.terms_of_payment = TermsOfPayment(id="other")
+    assert customer.changed_fields() == ["address", "terms_of_payment"]
+
+    # Decoding again starts over
+    customer.from_json(record)
+    assert customer.changed_fields() == []
+
+    # New objects are changed in every field
+    assert Customer().changed_fields() == \
+        [field.name for field in Customer.__visma_fields__]
+
+
+def test_untracked(record):
+    customer = Customer.from_json(record, track_changes=False)
+    assert customer.to_json() == Customer.from_json(record).to_json()
+    assert customer.changed_fields() == \
+        [field.name for field in Customer.__visma_fields__]
+
+    # An earlier snapshot is dropped when decoding without one
+    customer = Customer.from_json(record)
+    customer.from_json(record, track_changes=False)
+    assert customer.has_changed()
+    customer.from_json(record)
+    assert not customer.has_changed()
@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from fakeserver import FakeVisma
+from vismalib import Customer, RateLimiter
+from vismalib.ratelimit import parse_retry_after
+from vismalib.store import Store
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("vismalib.ratelimit.monotonic", lambda: now[0])
+    return now
+
+
+def test_acquire_release():
+    limiter = RateLimiter(concurrency=2)
+    acquired = threading.Event()
+
+    limiter.acquire()
+    limiter.acquire()
+    assert limiter.stats["in_flight"] == 2
+
+    def acquire():
+        limiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    assert not acquired.wait(0.1)
+
+    limiter.release()
+    assert acquired.wait(5)
+    thread.join()
+    assert limiter.stats["in_flight"] == 2
+
+
+def test_backoff_and_recovery(now):
+    limiter = RateLimiter(concurrency=8, backoff=2.0)
+
+    limiter.observe(429, {}, 0.1)
+    assert limiter.stats["concurrency"] == 4
+    assert limiter.stats["paused"] == 2.0
+    assert limiter.stats["throttled"] == 1
+
+    # Responses to requests in flight at the same time count once
+    limiter.observe(429, {"Retry-After": "5"}, 0.1)
+    assert limiter.stats["concurrency"] == 4
+    assert limiter.stats["paused"] == 5.0
+
+    now[0] += 1.0
+    limiter.observe(429, {}, 0.1)
+    assert limiter.stats["concurrency"] == 2
+
+    # The limit grows by one for every limit successful responses
+    for _ in range(2):
+        limiter.observe(200, {}, 0.1)
+    assert limiter.stats["concurrency"] == pytest.approx(2.9)
+    for _ in range(20):
+        limiter.observe(200, {}, 0.1)
+    assert limiter.stats["concurrency"] > 6
+
+
+def test_min_concurrency(now):
+    limiter = RateLimiter(concurrency=2, min_concurrency=1)
+    for _ in range(5):
+        now[0] += 1.0
+        limiter.observe(429, {}, 0.1)
+
+    assert limiter.stats["concurrency"] == 1
+
+
+def test_quota_exhausted(now):
+    limiter = RateLimiter()
+    limiter.observe(
+        200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "30"}, 0.1)
+
+    assert limiter.stats["paused"] == 30
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("10") == 10
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("invalid") is None
+
+
+def test_expired_token_single_slot():
+    # The token refresh is made while the request that needed it holds the
+    # only slot of the limiter
+    with FakeVisma(records=5) as fake:
+        session = fake.session(
+            expired=True, rate_limiter=RateLimiter(concurrency=1))
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(Store(session).find(Customer)))
+        thread.daemon = True
+        thread.start()
+        thread.join(10)
+
+        assert not thread.is_alive(), "Request deadlocked"
+        assert len(result[0]) == 5
+        assert fake.refreshes == 1
+        assert session.rate_limiter.stats["in_flight"] == 0
+        session.close()
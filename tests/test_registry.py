@@ -0,0 +1,130 @@
+import pytest
+
+from vismalib import Customer, ReferenceRegistry, TermsOfPayment
+from vismalib.cache import ObjectCache
+from vismalib.mirror import SqliteMirror
+from vismalib.store import Store
+from vismalib.sync import SyncEngine
+
+
+def make_record(i):
+    return {
+        "Id": "id-{}".format(i),
+        "CustomerNumber": str(i),
+        "ChangedUtc": "2019-03-12T10:11:12.1234567",
+        "TermsOfPaymentId": "terms-1",
+        "TermsOfPayment": {"Id": "terms-1", "Name": "30 days"},
+    }
+
+
+TERMS = [{"Id": "terms-1", "Name": "30 days", "NumberOfDays": 30}]
+
+
+class Response(object):
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = b""
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class StubClient(object):
+    terms_status = 200
+
+    def request(self, method, url, params=None, **kwargs):
+        if url.startswith("termsofpayment"):
+            return Response(
+                {"Meta": {"TotalNumberOfPages": 1}, "Data": TERMS},
+                self.terms_status)
+        if url.startswith("customers/"):
+            return Response(make_record(int(url.rsplit("-", 1)[1])))
+        records = [make_record(i) for i in range(3)]
+        if params is not None:
+            return Response(
+                {"Meta": {"TotalNumberOfPages": 1}, "Data": records})
+        return Response(records)
+
+
+@pytest.fixture
+def registry():
+    return ReferenceRegistry()
+
+
+def shared(registry):
+    return registry.resolve(TermsOfPayment, "terms-1")
+
+
+def test_find(registry):
+    store = Store(StubClient(), registry=registry)
+
+    for lazy in (False, True):
+        customers = store.find(Customer, lazy=lazy)
+        assert all(c.terms_of_payment is shared(registry) for c in customers)
+    assert shared(registry).days == 30
+
+
+def test_cache(registry):
+    for identity_map in (False, True):
+        store = Store(
+            StubClient(), cache=ObjectCache(identity_map=identity_map),
+            registry=registry)
+        store.get(Customer, "id-1")
+
+        cached = store.get(Customer, "id-1")
+        assert cached.terms_of_payment is shared(registry)
+
+        # Refreshing the cached object resolves references as well
+        store.cache.put(
+            Customer, "id-1", Customer.from_json(make_record(1)),
+            make_record(1), registry)
+        assert store.get(Customer, "id-1").terms_of_payment is \
+            shared(registry)
+
+
+def test_mirror(registry):
+    mirror = SqliteMirror(":memory:", [Customer])
+    mirror.load(Customer, [make_record(i) for i in range(3)])
+    store = Store(StubClient(), mirror=mirror, registry=registry)
+
+    customers = store.find(Customer)
+    assert len(customers) == 3
+    assert all(c.terms_of_payment is shared(registry) for c in customers)
+
+
+def test_sync(registry):
+    store = Store(StubClient(), registry=registry)
+    merged = []
+    SyncEngine(store, merged.extend).sync(Customer)
+
+    assert merged
+    assert all(c.terms_of_payment is shared(registry) for c in merged)
+
+
+def test_load_fails(monkeypatch, registry):
+    now = [0.0]
+    monkeypatch.setattr("vismalib.registry.monotonic", lambda: now[0])
+
+    client = StubClient()
+    client.terms_status = 500
+    registry.retry_interval = 10
+    store = Store(client, registry=registry)
+
+    # Customers are decoded with terms of payment with only the ID set
+    customers = store.find(Customer)
+    assert len(customers) == 3
+    assert all(c.terms_of_payment is shared(registry) for c in customers)
+    assert shared(registry).id == "terms-1"
+    assert shared(registry).days is None
+
+    # The table is loaded again after the retry interval, which fills in the
+    # instances decoded so far
+    client.terms_status = 200
+    store.find(Customer)
+    assert shared(registry).days is None
+
+    now[0] = 10.0
+    store.find(Customer)
+    assert customers[0].terms_of_payment.days == 30
@@ -0,0 +1,116 @@
+import pytest
+
+from requests.exceptions import ConnectionError
+
+from vismalib import Customer
+from vismalib.retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+from vismalib.store import Store
+
+
+class Response(object):
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = b""
+        self._data = data
+
+    def json(self):
+        return self._data
+
+    def close(self):
+        pass
+
+
+class StubClient(object):
+    """
+    Client which returns or raises the given outcomes in order, repeating
+    the last one.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes[min(self.calls, len(self.outcomes)) - 1]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def test_retry_status():
+    client = StubClient(Response(503), Response(429), Response(200, []))
+    store = Store(client, retry=RetryPolicy(total=3, backoff=0))
+
+    assert store.find(Customer) == []
+    assert client.calls == 3
+    assert store.retry.stats == {"retries": 2, "exhausted": 0}
+
+
+def test_retry_exhausted():
+    client = StubClient(Response(503))
+    store = Store(client, retry=RetryPolicy(total=2, backoff=0))
+
+    with pytest.raises(IOError):
+        store.find(Customer)
+    assert client.calls == 3
+    assert store.retry.stats == {"retries": 2, "exhausted": 1}
+
+
+def test_retry_error_not_idempotent():
+    policy = RetryPolicy()
+
+    assert policy.retry_error("GET", ConnectionError(), 0)
+    assert not policy.retry_error("POST", ConnectionError(), 0)
+    assert not policy.retry_error("GET", ValueError(), 0)
+
+
+def test_retry_after():
+    policy = RetryPolicy(backoff=0, max_backoff=10)
+
+    assert policy.wait(0, "5") == 5
+    assert policy.wait(0, "60") == 10
+
+
+def test_breaker_opens_and_closes(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("vismalib.retry.monotonic", lambda: now[0])
+
+    client = StubClient(ConnectionError(), ConnectionError())
+    store = Store(
+        client, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=10))
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            store.find(Customer)
+    with pytest.raises(CircuitOpenError):
+        store.find(Customer)
+    assert client.calls == 2
+
+    now[0] = 10.0
+    client.outcomes.append(Response(200, []))
+    assert store.find(Customer) == []
+    assert store.breaker.stats["state"] == CircuitBreaker.CLOSED
+
+
+def test_breaker_trial_raises(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("vismalib.retry.monotonic", lambda: now[0])
+
+    client = StubClient(ConnectionError(), ValueError("Token expired"))
+    store = Store(
+        client, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10))
+
+    with pytest.raises(ConnectionError):
+        store.find(Customer)
+
+    # The trial request fails before any response is received, which must
+    # not keep the breaker half open for good
+    now[0] = 10.0
+    with pytest.raises(ValueError):
+        store.find(Customer)
+
+    client.outcomes.append(Response(200, []))
+    assert store.find(Customer) == []
+    assert store.breaker.stats["state"] == CircuitBreaker.CLOSED
@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fakeserver import FakeVisma
+from bench_decode import make_record
+from vismalib import Customer, VismaSession
+from vismalib.store import FileTokenStorage, Store
+
+
+@pytest.fixture
+def fake():
+    with FakeVisma(records=50) as fake:
+        yield fake
+
+
+def test_concurrent_requests_with_token_swaps(fake):
+    session = fake.session(pool_maxsize=4)
+    store = Store(session)
+    ids = [make_record(i)["Id"] for i in range(50)]
+    done = threading.Event()
+    errors = []
+
+    def swap_tokens():
+        # Replace the token over and over while requests are in flight,
+        # both by refreshing and by setting it directly
+        try:
+            while not done.is_set():
+                token = session.refresh_token(
+                    fake.url + "connect/token", auth=session.auth)
+                session.token = dict(token)
+        except Exception as e:
+            errors.append(e)
+
+    def check_pool():
+        while not done.is_set():
+            for stats in session.pool_stats():
+                if not 0 <= stats["in_use"] <= stats["maxsize"] or \
+                        not 0 <= stats["idle"] <= stats["maxsize"]:
+                    errors.append(stats)
+
+    def get(id):
+        return store.get(Customer, id).id
+
+    threads = [
+        threading.Thread(target=swap_tokens),
+        threading.Thread(target=check_pool),
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            result = list(executor.map(get, ids * 10))
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+
+    assert result == ids * 10
+    assert errors == []
+    assert fake.refreshes > 0
+    # Every request carried a complete token issued by the server
+    assert fake.unauthorized == 0
+
+    stats, = session.pool_stats()
+    assert stats["in_use"] == 0
+    assert stats["idle"] <= stats["maxsize"] == 4
+    assert stats["requests"] == len(ids) * 10 + fake.refreshes
+    session.close()
+
+
+def test_expired_token_refreshed_once(fake):
+    session = fake.session(expired=True, pool_maxsize=16)
+    store = Store(session)
+    ids = [make_record(i)["Id"] for i in range(50)]
+
+    results = store.get_many(Customer, ids, max_workers=16)
+
+    assert all(result.ok for result in results)
+    assert fake.refreshes == 1
+    assert fake.unauthorized == 0
+    session.close()
+
+
+def test_refresh_margin_longer_than_lifetime(fake):
+    # The server issues tokens valid for an hour, which a margin of two
+    # hours must not turn into a refresh every second
+    session = fake.session(refresh_margin=7200)
+    try:
+        session.refresh_token(fake.url + "connect/token", auth=session.auth)
+
+        assert 1790 < session._refresh_timer.interval < 1810
+        assert fake.refreshes == 1
+    finally:
+        session.close()
+
+
+def test_negative_refresh_margin(fake):
+    with pytest.raises(ValueError):
+        fake.session(refresh_margin=-1)
+
+
+def test_refresh_margin_concurrent_token_updates(fake):
+    session = fake.session(refresh_margin=60)
+
+    def set_token(i):
+        session.token = {
+            "access_token": "token", "refresh_token": "refresh",
+            "token_type": "Bearer", "expires_at": time.time() + 3600 + i}
+
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(set_token, range(200)))
+
+        # Every replaced timer was cancelled
+        timers = [
+            thread for thread in threading.enumerate()
+            if isinstance(thread, threading.Timer) and
+            thread.function == session._proactive_refresh and
+            not thread.finished.is_set()]
+        assert timers == [session._refresh_timer]
+    finally:
+        session.close()
+    assert session._refresh_timer is None
+
+
+def test_refresh_without_token(fake, tmpdir):
+    storage = FileTokenStorage(str(tmpdir.join("token.json")))
+    session = VismaSession(
+        "client", "secret", auto_refresh_url=fake.url + "connect/token",
+        base_url=fake.url, token_storage=storage)
+
+    token = session.refresh_token(
+        fake.url + "connect/token", refresh_token="refresh",
+        auth=session.auth)
+    assert token["access_token"] == "token-1"
+    assert storage.load()["access_token"] == "token-1"
+    session.close()
+
+
+def test_token_storage_shared(tmpdir):
+    path = str(tmpdir.join("token.json"))
+    first = FileTokenStorage(path)
+    second = FileTokenStorage(path)
+
+    assert second.load() is None
+    assert not second
+    first.save({"access_token": "a"})
+    assert second.load() == {"access_token": "a"}
+
+    # Callers get copies of the token
+    second.load()["access_token"] = "b"
+    assert second.load() == {"access_token": "a"}
+
+
+def test_token_storage_modified(tmpdir):
+    path = str(tmpdir.join("token.json"))
+    storage = FileTokenStorage(path)
+    storage.save({"access_token": "a"})
+    stat = os.stat(path)
+
+    # The file is not read again as long as it looks unmodified
+    with open(path, "w") as f:
+        f.write(json.dumps({"access_token": "b"}))
+    os.utime(path, (stat.st_atime, stat.st_mtime))
+    assert storage.load() == {"access_token": "a"}
+
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert storage.load() == {"access_token": "b"}
+
+
+def test_token_storage_refreshed_once(fake, tmpdir):
+    # Sessions with storages of their own for the same file behave like
+    # sessions in different processes
+    path = str(tmpdir.join("token.json"))
+    sessions = [
+        fake.session(
+            expired=True, token_storage=FileTokenStorage(path),
+            pool_maxsize=8)
+        for _ in range(2)]
+    sessions[0].token_storage.save(sessions[0].token)
+    stores = [Store(session) for session in sessions]
+    ids = [make_record(i)["Id"] for i in range(20)]
+
+    def get(i):
+        return stores[i % 2].get(Customer, ids[i]).id
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        result = list(executor.map(get, range(len(ids))))
+
+    assert result == ids
+    assert fake.refreshes == 1
+    assert fake.unauthorized == 0
+    assert sessions[0].token == sessions[1].token == \
+        FileTokenStorage(path).load()
+    for session in sessions:
+        session.close()
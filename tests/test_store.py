@@ -0,0 +1,174 @@
+import threading
+import time
+
+import pytest
+
+from vismalib import Customer
+from vismalib.store import Store
+
+
+def make_record(i):
+    return {"Id": "id-{}".format(i), "CustomerNumber": str(i)}
+
+
+class Response(object):
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = b""
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class StubClient(object):
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, json=None, **kwargs):
+        self.requests.append((method, url))
+        if method == "PUT" and json["CustomerNumber"] == "fail":
+            return Response(400)
+        if method == "DELETE":
+            return Response(204)
+        return Response(200, json)
+
+
+def test_update_many():
+    client = StubClient()
+    store = Store(client)
+    customers = [Customer.from_json(make_record(i)) for i in range(4)]
+    customers[1].note = "Changed"
+    customers[2].number = "fail"
+
+    results = list(store.update_many(customers, max_workers=2))
+
+    assert [r.key for r in results] == customers
+    assert [r.value for r in results] == [False, True, None, False]
+    assert [r.ok for r in results] == [True, True, False, True]
+    assert isinstance(results[2].error, IOError)
+    assert sorted(client.requests) == [
+        ("PUT", "customers/id-1"), ("PUT", "customers/id-2")]
+
+
+def test_remove_many():
+    client = StubClient()
+    store = Store(client)
+    customers = [Customer.from_json(make_record(i)) for i in range(2)]
+
+    results = list(store.remove_many(customers))
+
+    assert [r.value for r in results] == customers
+    assert all(r.ok for r in results)
+
+
+class PageClient(object):
+    """
+    Client serving ``count`` customers in pages, as envelopes with the total
+    number of pages or as plain lists.
+    """
+
+    def __init__(self, count, envelope=True, delay=0.0):
+        self.count = count
+        self.envelope = envelope
+        self.delay = delay
+        self.pages = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, url, params=None, **kwargs):
+        page, size = params["$page"], params["$pagesize"]
+        with self._lock:
+            self.pages.append(page)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            start = (page - 1) * size
+            items = [
+                make_record(i)
+                for i in range(start, min(start + size, self.count))]
+            if not self.envelope:
+                return Response(200, items)
+            return Response(200, {
+                "Meta": {"TotalNumberOfPages": (self.count + size - 1) // size},
+                "Data": items,
+            })
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.mark.parametrize("prefetch", [0, 1, 3])
+@pytest.mark.parametrize("envelope", [True, False])
+def test_iter_find(prefetch, envelope):
+    client = PageClient(25, envelope, delay=0.01)
+    store = Store(client)
+
+    customers = list(store.iter_find(
+        Customer, page_size=10, prefetch=prefetch))
+
+    assert [c.number for c in customers] == [str(i) for i in range(25)]
+    assert client.max_in_flight <= max(prefetch, 1)
+    if envelope:
+        # The total number of pages is known, so no page past it is fetched
+        assert sorted(client.pages) == [1, 2, 3]
+    else:
+        # Without it only a short page ends the list, and pages requested
+        # speculatively past it are discarded
+        assert sorted(client.pages)[:3] == [1, 2, 3]
+
+
+def test_iter_find_stops_early():
+    client = PageClient(1000, delay=0.01)
+    store = Store(client)
+
+    customers = store.iter_find(Customer, page_size=10, prefetch=2)
+    assert [next(customers).number for _ in range(15)] == \
+        [str(i) for i in range(15)]
+    customers.close()
+    time.sleep(0.05)
+
+    assert len(client.pages) <= 4
+
+
+def test_get_many():
+    class GetClient(object):
+        def __init__(self):
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self._lock = threading.Lock()
+
+        def request(self, method, url, **kwargs):
+            with self._lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                i = int(url.rsplit("-", 1)[1])
+                # Later IDs complete first
+                time.sleep(0.002 * (10 - i))
+                if i == 3:
+                    return Response(404)
+                return Response(200, make_record(i))
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+    client = GetClient()
+    store = Store(client)
+    ids = ["id-{}".format(i) for i in range(10)]
+
+    results = list(store.get_many(Customer, ids, max_workers=4))
+
+    assert [r.key for r in results] == ids
+    assert [r.ok for r in results] == [i != 3 for i in range(10)]
+    assert isinstance(results[3].error, IOError)
+    assert results[3].value is None
+    assert results[5].value.number == "5"
+    assert 1 < client.max_in_flight <= 4
+
+    unordered = list(store.get_many(Customer, ids, ordered=False))
+    assert sorted(r.key for r in unordered) == sorted(ids)
+    assert sum(not r.ok for r in unordered) == 1
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from vismalib import Customer
+from vismalib.store import Store
+from vismalib.streaming import iter_json_items
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+ITEMS = [
+    {"Id": "id-{}".format(i), "Name": u"Kund åäö {}".format(i), "Tags": [i]}
+    for i in range(20)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 4096])
+def test_array(size):
+    data = json.dumps(ITEMS, ensure_ascii=False).encode("utf-8")
+
+    assert list(iter_json_items(chunked(data, size))) == ITEMS
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_envelope(size):
+    data = json.dumps({
+        "Meta": {"TotalNumberOfPages": 1},
+        "Data": ITEMS,
+        "After": None,
+    }).encode("utf-8")
+    meta = {}
+
+    assert list(iter_json_items(chunked(data, size), meta=meta)) == ITEMS
+    assert meta == {"Meta": {"TotalNumberOfPages": 1}, "After": None}
+
+
+def test_empty():
+    assert list(iter_json_items([b"[ ]"])) == []
+    assert list(iter_json_items([b'{"Data": []}'])) == []
+
+
+@pytest.mark.parametrize("data", [b"[1, 2", b"[1 2]", b"[1] 2", b"1"])
+def test_invalid(data):
+    with pytest.raises(ValueError):
+        list(iter_json_items(chunked(data, 1)))
+
+
+class StreamingResponse(object):
+    def __init__(self, data):
+        self.status_code = 200
+        self.headers = {}
+        self.content = data
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter(chunked(self.content, chunk_size))
+
+    def close(self):
+        self.closed = True
+
+
+class StubClient(object):
+    def __init__(self, response):
+        self.response = response
+        self.kwargs = None
+
+    def request(self, **kwargs):
+        self.kwargs = kwargs
+        return self.response
+
+
+def test_stream_find():
+    response = StreamingResponse(json.dumps(ITEMS).encode("utf-8"))
+    client = StubClient(response)
+    store = Store(client)
+
+    customers = list(store.stream_find(Customer, chunk_size=16))
+
+    assert [c.id for c in customers] == [item["Id"] for item in ITEMS]
+    assert client.kwargs["stream"] is True
+    assert response.closed
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+from vismalib import Customer
+from vismalib._compat import utc
+from vismalib.sync import FileCheckpoint, MemoryCheckpoint, SyncEngine
+from vismalib.utils import parse_timestamp
+
+
+def make_record(i, day):
+    return {
+        "Id": "id-{}".format(i),
+        "CustomerNumber": str(i),
+        "ChangedUtc": "2019-03-{:02d}T10:00:00.0000000".format(day),
+    }
+
+
+class StubStore(object):
+    """
+    Store which filters and orders its records like the API does for
+    change queries.
+    """
+
+    registry = None
+
+    def __init__(self, records):
+        self.records = records
+        self.queries = []
+
+    def fetch_page(self, type, page, page_size, query=None):
+        self.queries.append((page, dict(query)))
+        records = sorted(
+            self.records, key=lambda r: parse_timestamp(r["ChangedUtc"]))
+        if "$filter" in query:
+            since = parse_timestamp(query["$filter"].split(" ge ")[1])
+            records = [
+                r for r in records
+                if parse_timestamp(r["ChangedUtc"]) >= since]
+        start = (page - 1) * page_size
+        return records[start:start + page_size], None
+
+
+def test_sync_incremental():
+    store = StubStore([make_record(i, i + 1) for i in range(5)])
+    merged = []
+    engine = SyncEngine(store, merged.extend, page_size=2)
+
+    # Every page starts at the high-water mark, which means the objects at
+    # the mark are delivered again
+    assert engine.sync(Customer) == len(merged)
+    assert sorted(set(c.id for c in merged)) == [
+        "id-{}".format(i) for i in range(5)]
+    assert engine.checkpoint.load(Customer) == datetime(
+        2019, 3, 5, 10, tzinfo=utc)
+
+    # Objects at the high-water mark are delivered again
+    del merged[:]
+    store.records.append(make_record(5, 6))
+    engine.sync(Customer)
+    assert sorted(set(c.id for c in merged)) == ["id-4", "id-5"]
+
+
+def test_sync_shared_timestamp():
+    # A full page with a single timestamp can not move the mark, so the
+    # next page is requested instead
+    store = StubStore([make_record(i, 1) for i in range(5)])
+    merged = []
+    engine = SyncEngine(store, merged.extend, page_size=2)
+
+    assert engine.sync(Customer) == len(merged)
+    assert sorted(set(c.id for c in merged)) == [
+        "id-{}".format(i) for i in range(5)]
+    assert [page for page, _ in store.queries] == [1, 1, 2, 3]
+
+
+def test_file_checkpoint(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    watermark = datetime(2019, 3, 12, 10, 11, 12, 123456, tzinfo=utc)
+
+    assert FileCheckpoint(path).load(Customer) is None
+    FileCheckpoint(path).save(Customer, watermark)
+    assert FileCheckpoint(path).load(Customer) == watermark
+
+
+def test_memory_checkpoint():
+    checkpoint = MemoryCheckpoint()
+    checkpoint.save(Customer, 1)
+
+    assert checkpoint.load(Customer) == 1
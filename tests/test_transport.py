@@ -0,0 +1,61 @@
+import pytest
+
+from fakeserver import FakeVisma
+from vismalib import Customer, VismaSession
+from vismalib.store import Store
+from vismalib.transport import (
+    _RECORD, RecordingAdapter, ReplayAdapter, ReplayMissError)
+
+
+def replay_store(url, path):
+    session = VismaSession(
+        "client", "secret", token={"access_token": "token"}, base_url=url,
+        transport=ReplayAdapter(path))
+    return Store(session)
+
+
+@pytest.fixture
+def archive(tmpdir):
+    path = str(tmpdir.join("api.varc"))
+    with FakeVisma(records=5) as fake:
+        url = fake.url
+        store = Store(fake.session(transport=RecordingAdapter(path)))
+        customers = store.find(Customer)
+        customer = store.get(Customer, customers[1].id)
+        store.client.close()
+    return url, path, customers, customer
+
+
+def test_replay(archive):
+    url, path, customers, customer = archive
+    store = replay_store(url, path)
+
+    assert len(store.client.adapter) == 2
+    assert [c.to_json() for c in store.find(Customer)] == \
+        [c.to_json() for c in customers]
+    assert store.get(Customer, customer.id).to_json() == customer.to_json()
+
+    # Responses are replayed again once every recorded one has been used
+    assert len(store.find(Customer)) == len(customers)
+
+
+def test_replay_miss(archive):
+    url, path, customers, _ = archive
+    store = replay_store(url, path)
+
+    with pytest.raises(ReplayMissError):
+        store.find(Customer, customer_number="1")
+    with pytest.raises(ReplayMissError):
+        store.get(Customer, customers[0].id)
+
+
+def test_replay_incomplete(archive):
+    url, path, customers, customer = archive
+
+    # A crash while recording leaves a partial record, which is ignored
+    with open(path, "ab") as f:
+        f.write(_RECORD.pack(0, 0, 10, 100, 0.0, 0.0) + b"{}")
+
+    store = replay_store(url, path)
+    assert len(store.client.adapter) == 2
+    assert len(store.find(Customer)) == len(customers)
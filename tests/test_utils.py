@@ -0,0 +1,55 @@
+import pytest
+
+from datetime import datetime, timedelta
+
+from vismalib._compat import utc
+from vismalib.utils import format_timestamp, parse_timestamp, parse_timestamps
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2019-03-12T10:11:12", datetime(2019, 3, 12, 10, 11, 12, 0, utc)),
+    ("2019-03-12T10:11:12.5", datetime(2019, 3, 12, 10, 11, 12, 500000, utc)),
+    ("2019-03-12T10:11:12.1234567",
+     datetime(2019, 3, 12, 10, 11, 12, 123456, utc)),
+    ("2019-03-12T10:11:12Z", datetime(2019, 3, 12, 10, 11, 12, 0, utc)),
+    ("2019-03-12T10:11:12.123456Z",
+     datetime(2019, 3, 12, 10, 11, 12, 123456, utc)),
+    ("2019-03-12T10:11:12+01:30", datetime(2019, 3, 12, 8, 41, 12, 0, utc)),
+    ("2019-03-12T10:11:12.1-02:00",
+     datetime(2019, 3, 12, 12, 11, 12, 100000, utc)),
+])
+def test_parse_timestamp(value, expected):
+    timestamp = parse_timestamp(value)
+    assert timestamp == expected
+    assert timestamp.utcoffset() == timedelta(0)
+    assert parse_timestamps([value, None, value]) == [expected, None, expected]
+
+
+@pytest.mark.parametrize("value", [
+    "",
+    "2019-03-12",
+    "2019-03-12T10:11:1",
+    "2019-03-12T10:11:1Z",
+    "2019-03-12T10:11:12.",
+    "2019-03-12T10:11:12.12a",
+    "2019-03-12T10:11:12,123",
+    "2019-03-12 10:11:12 ",
+    "2019-3-12T10:11:12",
+    "2019-03-12X10:11:12",
+    "2019-13-12T10:11:12",
+    "2019-03-12T10:11: 2",
+])
+def test_parse_timestamp_invalid(value):
+    with pytest.raises(ValueError):
+        parse_timestamp(value)
+    with pytest.raises(ValueError):
+        parse_timestamps([value])
+
+
+def test_format_timestamp():
+    timestamp = datetime(2019, 3, 12, 10, 11, 12, 123456, utc)
+
+    assert format_timestamp(timestamp) == "2019-03-12T10:11:12.123456Z"
+    assert format_timestamp(timestamp.replace(tzinfo=None)) == \
+        "2019-03-12T10:11:12.123456Z"
+    assert parse_timestamp(format_timestamp(timestamp)) == timestamp
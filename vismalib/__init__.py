@@ -1,4 +1,62 @@
-from .store import *
+import sys
+
 from .model import *
+from .cache import *
+from .compact import *
+from .frame import *
+from .metrics import *
+from .ratelimit import *
+from .registry import *
+from .sync import *
 
 __version__ = "0.0.1"
+
+# Names of modules that depend on Requests, OAuthlib or SQLite. They are
+# imported on first access, which keeps importing the models fast for
+# processes that never talk to the API.
+_lazy = {
+    "BatchResult": "store",
+    "FileTokenStorage": "store",
+    "Store": "store",
+    "VismaSession": "store",
+    "CircuitBreaker": "retry",
+    "CircuitOpenError": "retry",
+    "RetryPolicy": "retry",
+    "PoolAdapter": "transport",
+    "RecordingAdapter": "transport",
+    "ReplayAdapter": "transport",
+    "ReplayMissError": "transport",
+    "SqliteMirror": "mirror",
+}
+
+__all__ = (
+    model.__all__ + cache.__all__ + compact.__all__ + frame.__all__ +
+    metrics.__all__ + ratelimit.__all__ + registry.__all__ + sync.__all__ +
+    sorted(_lazy))
+
+if sys.version_info < (3, 7):
+    # Module level __getattr__ (PEP 562) is not supported
+    from .store import *
+    from .retry import *
+    from .transport import *
+    from .mirror import *
+else:
+    def __getattr__(name):
+        from importlib import import_module
+
+        # Submodules are set as attributes when imported, like on Python
+        # versions where they are imported eagerly
+        if name in _lazy.values():
+            return import_module("." + name, __name__)
+
+        module = _lazy.get(name)
+        if module is None:
+            raise AttributeError(
+                "module '{}' has no attribute '{}'".format(__name__, name))
+
+        value = getattr(import_module("." + module, __name__), name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_lazy) | set(_lazy.values()))
@@ -1,13 +1,126 @@
+import os
 import sys
 
+from datetime import timedelta, tzinfo
+
 __all__ = [
     "is_python2",
+    "lock_file",
+    "lru_cache",
+    "monotonic",
+    "parse_qsl",
+    "replace",
+    "string_types",
+    "unlock_file",
+    "urlencode",
     "urljoin",
+    "urlsplit",
+    "urlunsplit",
+    "utc",
+    "with_metaclass",
 ]
 
 is_python2 = sys.version_info.major == 2
 
 if is_python2:
-    from urlparse import urljoin
+    from urllib import urlencode
+    from urlparse import parse_qsl, urljoin, urlsplit, urlunsplit
+    string_types = (basestring,)
 else:
-    from urllib.parse import urljoin
+    from urllib.parse import (
+        parse_qsl, urlencode, urljoin, urlsplit, urlunsplit)
+    string_types = (str,)
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+try:
+    from functools import lru_cache
+except ImportError:
+    from functools import wraps
+
+    def lru_cache(maxsize=128):
+        # Python 2 has no lru_cache. The cache is cleared when it is full,
+        # which is close enough for values that are mostly reused soon after
+        # they are first seen
+        def decorator(func):
+            cache = {}
+
+            @wraps(func)
+            def wrapper(arg):
+                try:
+                    return cache[arg]
+                except KeyError:
+                    pass
+                value = func(arg)
+                if len(cache) >= maxsize:
+                    cache.clear()
+                cache[arg] = value
+                return value
+            wrapper.cache_clear = cache.clear
+            return wrapper
+        return decorator
+
+try:
+    from datetime import timezone
+    utc = timezone.utc
+except ImportError:
+    class UTC(tzinfo):
+        def utcoffset(self, dt):
+            return timedelta(0)
+
+        def tzname(self, dt):
+            return "UTC"
+
+        def dst(self, dt):
+            return timedelta(0)
+
+        def __repr__(self):
+            return "utc"
+    utc = UTC()
+
+# os.replace is not available in Python 2, where rename is only atomic on
+# POSIX systems
+replace = getattr(os, "replace", os.rename)
+
+# Exclusive locks on open files, which are released when the file is closed
+try:
+    import fcntl
+
+    def lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+except ImportError:
+    import msvcrt
+
+    def lock_file(f):
+        # LK_LOCK gives up after ten seconds, which is retried until the
+        # lock is acquired to match flock
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except (IOError, OSError):
+                pass
+
+    def unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def with_metaclass(meta, *bases):
+    """
+    Create a base class with a metaclass, in a way that works for both
+    Python 2 and 3. The temporary class is replaced by the real one, which
+    means it does not end up in the MRO.
+    """
+
+    class metaclass(type):
+        def __new__(cls, name, this_bases, attrs):
+            return meta(name, bases, attrs)
+    return type.__new__(metaclass, "temporary_class", (), {})
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+from oauthlib.oauth2 import TokenExpiredError
+
+from ._compat import urljoin
+from .store import unpack_page
+
+__all__ = [
+    "AsyncResponse",
+    "AsyncVismaSession",
+    "AsyncStore",
+]
+
+
+class AsyncResponse(object):
+    """
+    A fully read HTTP response.
+
+    The body is read while the connection is still held, which means the
+    response can be inspected after the connection has been returned to the
+    pool. The interface is the subset of :class:`requests.Response` that
+    :class:`AsyncStore` relies on.
+
+    :param status_code: HTTP status code
+    :param headers: Response headers
+    :param content: Raw response body
+    """
+
+    __slots__ = ("status_code", "headers", "content")
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content.decode("utf-8"))
+
+
+class AsyncVismaSession(object):
+    """
+    An asyncio OAuth2 session for Visma eAccounting API.
+
+    This is the asyncio counterpart of :class:`vismalib.VismaSession`. It
+    requires `aiohttp <https://docs.aiohttp.org/>`_. No more than
+    ``max_concurrency`` requests are in flight at any time, additional
+    requests wait for a free slot.
+
+    Tokens are refreshed before they expire, and when the API rejects one
+    anyway, like after it has been revoked, it is refreshed and the request
+    is retried once. Only one request refreshes at a time, and requests
+    that were waiting for it use its result.
+
+    :param client_id: Client ID as provided by Visma
+    :param client_secret: Client secret as provided by Visma
+    :param token: Token dictionary, must include access_token and token_type.
+    :param auto_refresh_url: Refresh token endpoint URL, must be HTTPS. Supply
+                             this if you wish the client to automatically refresh
+                             your access tokens.
+    :param auto_refresh_kwargs: Extra arguments to pass to the refresh token
+                                endpoint.
+    :param token_updater: Method with one argument, token, to be used to update
+                          your token databse on automatic token refresh.
+    :param base_url: Base URL to use for all HTTP(S) requests unless an absolute
+                     URI is provided.
+    :param max_concurrency: Maximum number of requests in flight.
+    :param session: Optional :class:`aiohttp.ClientSession` to use. A new one
+                    is created on first request if not provided.
+    """
+
+    def __init__(
+            self, client_id=None, client_secret=None, token=None,
+            auto_refresh_url=None, auto_refresh_kwargs=None,
+            token_updater=None, base_url=None, max_concurrency=100,
+            session=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token = token or {}
+        self.auto_refresh_url = auto_refresh_url
+        self.auto_refresh_kwargs = auto_refresh_kwargs or {}
+        self.token_updater = token_updater
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+
+        self._session = session
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._refresh_lock = asyncio.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency))
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _is_expired(self):
+        expires_at = self.token.get("expires_at")
+        return expires_at is not None and float(expires_at) < time.time()
+
+    async def refresh_token(self):
+        """
+        Fetch a new access token using the current refresh token.
+
+        :return: A token dict
+        """
+
+        if not self.auto_refresh_url:
+            raise TokenExpiredError()
+
+        data = dict(self.auto_refresh_kwargs)
+        data["grant_type"] = "refresh_token"
+        data["refresh_token"] = self.token.get("refresh_token")
+
+        async with self.session.post(
+                self.auto_refresh_url, data=data,
+                auth=aiohttp.BasicAuth(self.client_id, self.client_secret),
+                headers={"Accept": "application/json"}) as response:
+            content = await response.read()
+
+        if response.status != 200:
+            raise IOError(
+                "Failed to refresh token: '{content}'".format(content=content))
+
+        token = json.loads(content.decode("utf-8"))
+        if "expires_in" in token:
+            token["expires_at"] = time.time() + int(token["expires_in"])
+        token.setdefault("refresh_token", self.token.get("refresh_token"))
+
+        self.token = token
+        if self.token_updater is not None:
+            self.token_updater(token)
+
+        return token
+
+    async def _ensure_token(self):
+        if not self._is_expired():
+            return
+
+        # Only the first waiter refreshes, the others reuse its result
+        async with self._refresh_lock:
+            if self._is_expired():
+                await self.refresh_token()
+
+    async def request(
+            self, method, url, data=None, headers=None, withhold_token=False,
+            **kwargs):
+
+        if self.base_url is not None:
+            url = urljoin(self.base_url, url)
+
+        headers = dict(headers or {})
+
+        authorize = bool(self.token) and not withhold_token
+        async with self._semaphore:
+            for retry in (False, True):
+                if authorize:
+                    await self._ensure_token()
+                    access_token = self.token["access_token"]
+                    headers["Authorization"] = "Bearer {}".format(
+                        access_token)
+
+                async with self.session.request(
+                        method, url, data=data or None, headers=headers,
+                        **kwargs) as response:
+                    result = AsyncResponse(
+                        response.status, response.headers,
+                        await response.read())
+
+                if retry or not authorize or result.status_code != 401 or \
+                        not self.auto_refresh_url:
+                    return result
+
+                async with self._refresh_lock:
+                    if self.token.get("access_token") == access_token:
+                        await self.refresh_token()
+
+
+class AsyncStore(object):
+    """
+    Connection manager for Visma API connection using asyncio.
+
+    This is the asyncio counterpart of :class:`vismalib.Store` and provides
+    the same methods as coroutines.
+
+    :param client: Client used to handle communication over the API.
+                   This is in most cases an instance of
+                   :class:`AsyncVismaSession`, but the only requirement is
+                   that it manages authentication and provides a coroutine
+                   ``request`` which returns an object with ``status_code``,
+                   ``content`` and ``json()``.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    async def find(self, type, **params):
+        """
+        Return a list of objects of the given ``type`` which matches
+        the filters provided as keyword arguments.
+
+        :param type: Class to list
+        :param  **params: Keyword arguments to pass on to
+                          ``type._visma_list(**params)``.
+        :return: List of type ``type`` instances
+        :rtype: [type]
+        """
+
+        response = await self.client.request(**type._visma_list(**params))
+
+        if response.status_code != 200:
+            raise IOError(
+                "Failed to list {name}: '{content}'".format(
+                    name=type.__name__,
+                    content=response.content))
+
+        items, _ = unpack_page(response.json())
+        return [type.from_json(data) for data in items]
+
+    async def get(self, type, id):
+        """
+        Return the object of ``type`` with ``id``.
+
+        :param type: Class of get
+        :param id: Visma's unique object ID, UUID style string
+        :return: Instance of type ``type``
+        :rtype: ``type``
+        """
+
+        response = await self.client.request(**type._visma_get(id))
+
+        if response.status_code != 200:
+            raise IOError(
+                "Failed to get {name} with ID '{id}': '{content}'".format(
+                    name=type.__name__,
+                    id=id,
+                    content=response.content))
+
+        return type.from_json(response.json())
+
+    async def add(self, obj):
+        """
+        Store the given object in in Visma.
+
+        :param obj: Object to store
+        """
+
+        response = await self.client.request(**obj._visma_add())
+
+        if response.status_code != 200:
+            raise IOError(
+                "Failed to add {name}: '{content}'".format(
+                    name=obj.__class__.__name__,
+                    content=response.content))
+
+        obj.from_json(response.json())
@@ -0,0 +1,320 @@
+import json
+
+from collections import OrderedDict
+from threading import RLock
+
+from ._compat import monotonic
+from .utils import Unset
+
+__all__ = [
+    "HttpCache",
+    "HttpCacheEntry",
+    "ObjectCache",
+]
+
+
+class LRUCache(object):
+    """
+    Thread safe, size bounded mapping which evicts the least recently used
+    entries first.
+
+    :param max_size: Maximum number of entries, ``None`` for unbounded
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key):
+        # Must be called with the lock held
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries[key] = value
+        self.hits += 1
+        return value
+
+    def _store(self, key, value):
+        # Must be called with the lock held
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        while self.max_size is not None and len(self._entries) > self.max_size:
+            self._evict(*self._entries.popitem(last=False))
+            self.evictions += 1
+
+    def _evict(self, key, value):
+        pass
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self):
+        """
+        Counters for sizing the cache.
+
+        :rtype: dict
+        """
+
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ObjectCache(LRUCache):
+    """
+    Read-through cache for model objects, keyed by type and ID.
+
+    By default the JSON an object was decoded from is cached and a new
+    object is decoded on every hit, so callers can modify what they get back
+    without affecting each other. In identity map mode the object itself is
+    cached, which means repeated lookups of the same ID return the same
+    instance. When an object is fetched again it is updated in place.
+
+    :param max_size: Maximum number of objects, ``None`` for unbounded
+    :param ttl: Number of seconds an entry is valid, ``None`` for no expiry
+    :param ttls: Dictionary of per-type TTLs that take precedence over
+                 ``ttl``
+    :param identity_map: Return the same instance for every hit
+    """
+
+    def __init__(self, max_size=1024, ttl=None, ttls=None, identity_map=False):
+        super(ObjectCache, self).__init__(max_size)
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.identity_map = identity_map
+        self.expirations = 0
+
+    def _expires_at(self, type):
+        ttl = self.ttls.get(type, self.ttl)
+        if ttl is None:
+            return None
+        return monotonic() + ttl
+
+    def get(self, type, id, registry=None):
+        """
+        Return the cached object of ``type`` with ``id``.
+
+        :param type: Class of object
+        :param id: Visma's unique object ID
+        :param registry: Optional
+                         :class:`vismalib.registry.ReferenceRegistry` which
+                         references of decoded objects are resolved with
+        :return: Instance of ``type`` or ``None`` if not cached
+        """
+
+        key = (type, id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and \
+                    entry[0] <= monotonic():
+                del self._entries[key]
+                self.expirations += 1
+
+            entry = self._lookup(key)
+            if entry is None:
+                return None
+            value = entry[1]
+
+        if self.identity_map:
+            return value
+        return type.from_json(value, registry=registry)
+
+    def put(self, type, id, obj, json, registry=None):
+        """
+        Add an object to the cache.
+
+        :param type: Class of object
+        :param id: Visma's unique object ID
+        :param obj: Object decoded from ``json``
+        :param json: Deserialized JSON data ``obj`` was decoded from
+        :param registry: Optional
+                         :class:`vismalib.registry.ReferenceRegistry` which
+                         references of updated objects are resolved with
+        :return: The canonical instance for ``id``. In identity map mode this
+                 is the previously cached instance, updated from ``json``,
+                 if there is one.
+        """
+
+        with self._lock:
+            if self.identity_map:
+                entry = self._entries.get((type, id))
+                if entry is not None and entry[1] is not obj:
+                    obj = entry[1].from_json(json, registry=registry)
+            self._store(
+                (type, id),
+                (self._expires_at(type), obj if self.identity_map else json))
+        return obj
+
+    def invalidate(self, type, id):
+        """
+        Remove the object of ``type`` with ``id`` from the cache.
+        """
+
+        super(ObjectCache, self).invalidate((type, id))
+
+    @property
+    def stats(self):
+        stats = super(ObjectCache, self).stats
+        stats["expirations"] = self.expirations
+        return stats
+
+
+class HttpCacheEntry(object):
+    """
+    Cached body of a response along with the validators needed to revalidate
+    it.
+
+    The JSON is decoded at most once per entry. It is shared between every
+    response served from the entry and must therefore not be modified.
+
+    :param content: Raw response body
+    :param etag: Value of the ``ETag`` header
+    :param last_modified: Value of the ``Last-Modified`` header
+    :param headers: Headers of the response, which responses served from
+                    the entry get as well
+    """
+
+    __slots__ = ("content", "etag", "last_modified", "headers", "_json")
+
+    def __init__(self, content, etag=None, last_modified=None, headers=None):
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.headers = dict(headers or {})
+        self._json = Unset
+
+    @property
+    def size(self):
+        return len(self.content)
+
+    def validators(self):
+        """
+        Return the conditional request headers for revalidating this entry.
+
+        :rtype: dict
+        """
+
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def json(self):
+        if self._json is Unset:
+            self._json = json.loads(self.content.decode("utf-8"))
+        return self._json
+
+
+class HttpCache(LRUCache):
+    """
+    In-memory cache of GET responses which carry an ``ETag`` or
+    ``Last-Modified`` header.
+
+    Entries are revalidated with a conditional request every time they are
+    used. When the server responds with ``304 Not Modified`` the cached body,
+    and the JSON already decoded from it, is used instead. An entry is
+    replaced when the server responds with a new body, and dropped when the
+    response can no longer be revalidated.
+
+    :param max_size: Maximum number of responses, ``None`` for unbounded
+    :param max_bytes: Maximum total size of cached bodies, ``None`` for
+                      unbounded
+    """
+
+    def __init__(self, max_size=256, max_bytes=64 * 1024 * 1024):
+        super(HttpCache, self).__init__(max_size)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def key(url, params=None, data=None):
+        """
+        Return the cache key for a GET request.
+        """
+
+        # JSON with sorted keys is hashable and canonical, also for nested
+        # and list values
+        return (
+            url,
+            json.dumps(params or {}, sort_keys=True, default=str),
+            json.dumps(data or {}, sort_keys=True, default=str))
+
+    def _evict(self, key, entry):
+        self.bytes -= entry.size
+
+    def get(self, key):
+        """
+        Return the entry for ``key`` or ``None`` if there is none.
+
+        :rtype: HttpCacheEntry
+        """
+
+        with self._lock:
+            return self._lookup(key)
+
+    def put(self, key, entry):
+        """
+        Add an entry to the cache, evicting the least recently used entries
+        if the cache has grown too large.
+        """
+
+        if self.max_bytes is not None and entry.size > self.max_bytes:
+            self.invalidate(key)
+            return
+
+        with self._lock:
+            self.invalidate(key)
+            self.bytes += entry.size
+            self._store(key, entry)
+            while self.max_bytes is not None and self.bytes > self.max_bytes:
+                self._evict(*self._entries.popitem(last=False))
+                self.evictions += 1
+
+    def mark_not_modified(self):
+        """
+        Count a response that was served from the cache after a successful
+        revalidation.
+        """
+
+        with self._lock:
+            self.not_modified += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._evict(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    @property
+    def stats(self):
+        stats = super(HttpCache, self).stats
+        stats["bytes"] = self.bytes
+        stats["not_modified"] = self.not_modified
+        return stats
@@ -0,0 +1,322 @@
+from copy import copy
+from datetime import date, datetime
+from operator import itemgetter
+from threading import RLock
+
+from ._compat import string_types
+from .fields import Embedded, Reference
+from .utils import AttrProxy
+
+__all__ = [
+    "CompactRecord",
+    "CompactRecords",
+    "compact_type",
+]
+
+# Types of values that are shared between records when interning is enabled
+_interned_types = frozenset(string_types + (date, datetime))
+
+_types = {}
+_types_lock = RLock()
+
+
+class CompactRecord(tuple):
+    """
+    Base class of compact, read-only records. Every attribute of the model
+    is an item of the tuple, which makes a record a single object with one
+    pointer per attribute, instead of a model object with its slots and
+    its own embedded objects.
+
+    Records have the same attributes, ``repr`` and :meth:`to_json` as the
+    model, but can not be modified. Use :meth:`replace` to create a modified
+    copy, or :meth:`to_model` to get a model object to update through the
+    API.
+    """
+
+    __slots__ = ()
+
+    #: Model class of record
+    _visma_model = None
+    #: Attribute names in the order of the tuple
+    _visma_names = ()
+    #: Attribute names in the order of the model's repr
+    _visma_repr_names = ()
+    #: Tuple of ``(name, compact type)`` of embedded objects
+    _visma_embedded = ()
+    #: Names of referenced objects
+    _visma_references = ()
+
+    def __new__(cls, values):
+        return tuple.__new__(cls, values)
+
+    def __reduce__(self):
+        # Record classes are created at runtime, so they are pickled by the
+        # model class they are created from
+        return _restore, (self._visma_model, self._visma_names, tuple(self))
+
+    def __repr__(self):
+        return "{}({})".format(
+            self._visma_model.__name__,
+            ", ".join(
+                "{}={!r}".format(attr, getattr(self, attr))
+                for attr in self._visma_repr_names
+                if getattr(self, attr) is not None))
+
+    def replace(self, **changes):
+        """
+        Return a copy of the record with the given attributes replaced.
+        """
+
+        values = list(self)
+        for name, value in changes.items():
+            try:
+                values[self._visma_names.index(name)] = value
+            except ValueError:
+                raise AttributeError(
+                    "'{}' object has no attribute '{}'".format(
+                        self.__class__.__name__, name))
+        return self.__class__(values)
+
+    def to_model(self):
+        """
+        Return a new, modifiable model object with the values of the record.
+        The object is considered unchanged, see
+        :meth:`vismalib.model.VismaModel.changed_fields`.
+
+        Referenced objects, like terms of payment, are copies, since the
+        record's are shared with other records.
+        """
+
+        model = self._visma_model
+        obj = model.__new__(model)
+        for name, value in zip(self._visma_names, self):
+            setattr(obj, name, value)
+        for name, _ in self._visma_embedded:
+            value = getattr(obj, name)
+            if value is not None:
+                setattr(obj, name, value.to_model())
+        for name in self._visma_references:
+            value = getattr(obj, name)
+            if value is not None:
+                setattr(obj, name, copy(value))
+
+        snapshots = getattr(model, "_visma_snapshots", None)
+        if snapshots:
+            obj._visma_snapshot = tuple(
+                take(getattr(obj, name)) for name, take in snapshots)
+        return obj
+
+    def to_json(self):
+        """
+        Convert record to a dict that is ready to be serialized to JSON.
+
+        :return: Visma formatted dictionary
+        :rtype: dict
+        """
+
+        encode = getattr(self._visma_model, "_visma_encode", None)
+        if encode is None:
+            raise NotImplementedError(
+                "to_json is not implemented for {}".format(
+                    self._visma_model.__name__))
+
+        return encode(self)
+
+
+def _any_value(self):
+    # Truth value of records of models that are empty when they only
+    # contain None, like addresses
+    for value in self:
+        if value is not None:
+            return True
+    return False
+
+
+def _restore(model, names, values):
+    return compact_type(model, names)(values)
+
+
+def compact_type(model, names=None):
+    """
+    Return the :class:`CompactRecord` subclass of ``model``, which is
+    created the first time it is needed.
+
+    :param model: Model class
+    :param names: Attribute names of models without ``__visma_fields__``,
+                  like :class:`vismalib.model.Address`
+    :rtype: type
+    """
+
+    with _types_lock:
+        cls = _types.get(model)
+        if cls is not None:
+            return cls
+
+        fields = getattr(model, "__visma_fields__", ())
+        if names is None:
+            names = [field.name for field in fields]
+        names = tuple(names)
+        embedded = [
+            field for field in fields if isinstance(field, Embedded)]
+
+        attrs = {
+            "__slots__": (),
+            "__doc__": "Compact record of :class:`{}.{}`.".format(
+                model.__module__, model.__name__),
+            "_visma_model": model,
+            "_visma_names": names,
+            "_visma_repr_names": tuple(
+                name for name in getattr(model, "__slots__", names)
+                if name in names),
+            "__visma_key__": getattr(model, "__visma_key__", None),
+            "_visma_references": tuple(
+                field.name for field in fields
+                if isinstance(field, Reference)),
+        }
+        if getattr(model, "__bool__", None) is not None:
+            attrs["__bool__"] = attrs["__nonzero__"] = _any_value
+        for i, name in enumerate(names):
+            attrs[name] = property(
+                itemgetter(i), doc="Alias for item {}".format(i))
+
+        # Proxies, like the name of a customer, work the same way as on the
+        # model, except that setting them fails
+        for base in reversed(model.__mro__):
+            for name, value in vars(base).items():
+                if isinstance(value, AttrProxy):
+                    attrs[name] = value
+
+        attrs["_visma_embedded"] = tuple(
+            (field.name, compact_type(
+                field.model, [attr for attr, _ in field.keys]))
+            for field in embedded)
+
+        cls = type("Compact" + model.__name__, (CompactRecord,), attrs)
+        _types[model] = cls
+        return cls
+
+
+class CompactRecords(object):
+    """
+    Converter of model objects, or JSON, to compact records, for holding a
+    large number of objects in memory.
+
+    Values which are equal, like cities, country codes and timestamps, are
+    shared between all records created by the same converter. Embedded
+    objects which only contain ``None``, like the delivery address of most
+    customers, are the same shared object, and referenced objects with the
+    same ID, like terms of payment, are shared as well.
+
+        compact = CompactRecords(Customer)
+        index = {}
+        for page in store.iter_pages(Customer):
+            for record in compact.decode_many(page):
+                index[record.id] = record
+
+    The shared values are held by the converter until it is garbage
+    collected, so a converter should not outlive the records it creates by
+    much. The records themselves do not refer to the converter.
+
+    :param type: Model class of records
+    :param intern: Share equal values between records. Values of the fields
+                   named in ``unique``, and the model's key, are never
+                   shared since no two records have the same value.
+    :param unique: Names of fields whose values are unique per record
+    """
+
+    def __init__(self, type, intern=True, unique=()):
+        self.type = type
+        self.record_type = compact_type(type)
+        self.intern = intern
+        self.unique = frozenset(unique) | frozenset(
+            [getattr(type, "__visma_key__", None)])
+
+        self._values = {}
+        self._references = {}
+        self._empty = {}
+
+        fields = getattr(type, "__visma_fields__", ())
+        self._convert = tuple(
+            self._converter(field) for field in fields)
+
+    def _converter(self, field):
+        if isinstance(field, Embedded):
+            cls = dict(self.record_type._visma_embedded)[field.name]
+            self._empty[field.name] = cls([None] * len(cls._visma_names))
+            return self._embedded(field, cls)
+        if isinstance(field, Reference):
+            return self._reference
+        if not self.intern or field.name in self.unique:
+            return None
+        return self._value
+
+    def _value(self, value):
+        if value.__class__ not in _interned_types:
+            return value
+        # setdefault is atomic, which makes interning thread safe
+        return self._values.setdefault(value, value)
+
+    def _embedded(self, field, cls):
+        empty = self._empty[field.name]
+        names = cls._visma_names
+        value = self._value if self.intern else None
+
+        def convert(obj):
+            values = [getattr(obj, name) for name in names]
+            if value is not None:
+                values = [value(v) for v in values]
+            for v in values:
+                if v is not None:
+                    return cls(values)
+            return empty
+        return convert
+
+    def _reference(self, obj):
+        key = (obj.__class__, getattr(obj, "id", None))
+        if key[1] is None:
+            return obj
+        return self._references.setdefault(key, obj)
+
+    def from_model(self, obj):
+        """
+        Return a compact record with the values of the model object ``obj``.
+        """
+
+        values = []
+        append = values.append
+        for name, convert in zip(self.record_type._visma_names, self._convert):
+            value = getattr(obj, name)
+            if convert is not None and value is not None:
+                value = convert(value)
+            append(value)
+        return self.record_type(values)
+
+    def from_json(self, json, registry=None):
+        """
+        Return a compact record decoded from deserialized JSON data. The
+        data is decoded by the model first, see
+        :meth:`vismalib.model.VismaModel.from_json`.
+        """
+
+        return self.from_model(self.type.from_json(
+            json, registry=registry, track_changes=False))
+
+    def decode_many(self, records, registry=None):
+        """
+        Return a list of compact records decoded from a list of deserialized
+        JSON objects, like a page of :meth:`vismalib.Store.iter_pages`.
+        """
+
+        decode = self.type.from_json
+        convert = self.from_model
+        return [
+            convert(decode(json, registry=registry, track_changes=False))
+            for json in records]
+
+    def clear(self):
+        """
+        Stop sharing values with records created so far.
+        """
+
+        self._values.clear()
+        self._references.clear()
@@ -0,0 +1,361 @@
+from .utils import format_timestamp, parse_timestamp, parse_timestamps
+
+__all__ = [
+    "Embedded",
+    "Field",
+    "Reference",
+    "Timestamp",
+]
+
+
+class _Namespace(object):
+    """
+    Global namespace of generated code. Objects the code depends on, like
+    converters and model classes, are given unique names.
+    """
+
+    def __init__(self):
+        self.globals = {}
+
+    def add(self, obj):
+        name = "_g{}".format(len(self.globals))
+        self.globals[name] = obj
+        return name
+
+
+class Field(object):
+    """
+    Mapping between a model attribute and a key in Visma's JSON format.
+
+    :param name: Attribute name
+    :param key: JSON key
+    :param decode: Callable used to convert JSON values that are not
+                   ``None``
+    :param encode: Callable used to convert attribute values that are not
+                   ``None``
+    :param empty_as_none: Decode empty values, like ``""``, as ``None``
+    :param default: Value to use when the JSON value is ``None``
+    :param encode_key: JSON key to encode to, if it differs from ``key``
+    """
+
+    def __init__(
+            self, name, key, decode=None, encode=None, empty_as_none=False,
+            default=None, encode_key=None):
+        self.name = name
+        self.key = key
+        self.decode = decode
+        self.encode = encode
+        self.empty_as_none = empty_as_none
+        self.default = default
+        self.encode_key = key if encode_key is None else encode_key
+
+    def __repr__(self):
+        return "{}({!r}, {!r})".format(
+            self.__class__.__name__, self.name, self.key)
+
+    #: Optional callable that converts a list of JSON values at once. Used
+    #: instead of ``decode`` when decoding columns.
+    decode_many = None
+
+    def _decode_source(self, ns, convert=True):
+        # Lines decoding the field into v, using get as json.get and the
+        # optional reference registry in registry
+        lines = ["v = get({!r})".format(self.key)]
+        if self.empty_as_none:
+            lines.append("v = v or None")
+        if self.default is not None:
+            lines.append("if v is None: v = {}".format(ns.add(self.default)))
+        if convert and self.decode is not None:
+            lines.append(
+                "if v is not None: v = {}(v)".format(ns.add(self.decode)))
+        return lines
+
+    def _column_source(self, ns):
+        # Tuples of column name, lines decoding the column value into v and
+        # an optional callable converting the whole column afterwards
+        if self.decode_many is not None:
+            return [(
+                self.name,
+                self._decode_source(ns, convert=False),
+                ns.add(self.decode_many))]
+        return [(self.name, self._decode_source(ns), None)]
+
+    def _snapshot_source(self, var):
+        # Expression of an immutable value which is equal for two values of
+        # the field if they encode to the same JSON
+        return var
+
+    def _encode_source(self, ns, var):
+        # Lines preparing the encoded items, and the (key, expression) items
+        # themselves. var is a local variable name reserved for this field
+        if self.encode is None:
+            return [], [(self.encode_key, "self.{}".format(self.name))]
+
+        return ["{} = self.{}".format(var, self.name)], [(
+            self.encode_key,
+            "None if {var} is None else {encode}({var})".format(
+                var=var, encode=ns.add(self.encode)))]
+
+
+class Timestamp(Field):
+    """
+    Mapping of a timestamp in Visma's format to a timezone aware
+    ``datetime``.
+
+    :param name: Attribute name
+    :param key: JSON key
+    :param encode_key: JSON key to encode to, if it differs from ``key``
+    """
+
+    decode_many = staticmethod(parse_timestamps)
+
+    def __init__(self, name, key, encode_key=None):
+        super(Timestamp, self).__init__(
+            name, key, decode=parse_timestamp, encode=format_timestamp,
+            encode_key=encode_key)
+
+
+class Embedded(Field):
+    """
+    Mapping of a model object whose attributes are stored as keys of the
+    parent object in Visma's JSON format, like the address fields of a
+    customer.
+
+    :param name: Attribute name
+    :param model: Class of embedded object
+    :param keys: Sequence of ``(attribute, key)`` pairs for the embedded
+                 object
+    :param optional: Decode an embedded object which is empty as ``None``
+    :param encode_keys: Dictionary of attribute names to JSON keys to encode
+                        to, for keys that differ from ``keys``
+    """
+
+    def __init__(self, name, model, keys, optional=False, encode_keys=None):
+        self.name = name
+        self.model = model
+        self.keys = tuple(keys)
+        self.optional = optional
+        self.encode_keys = tuple(
+            (attr, (encode_keys or {}).get(attr, key))
+            for attr, key in self.keys)
+
+    def __repr__(self):
+        return "{}({!r}, {})".format(
+            self.__class__.__name__, self.name, self.model.__name__)
+
+    def _empty(self):
+        obj = self.model.__new__(self.model)
+        for attr, _ in self.keys:
+            setattr(obj, attr, None)
+        return obj
+
+    def _decode_source(self, ns):
+        model = ns.add(self.model)
+        lines = ["v = {model}.__new__({model})".format(model=model)]
+        lines.extend(
+            "v.{} = get({!r})".format(attr, key) for attr, key in self.keys)
+        if self.optional:
+            lines.append("if not v: v = None")
+        return lines
+
+    def _column_source(self, ns):
+        return [(
+            "{}.{}".format(self.name, attr),
+            ["v = get({!r})".format(key)],
+            None) for attr, key in self.keys]
+
+    def _snapshot_source(self, var):
+        return "None if {var} is None else ({attrs},)".format(
+            var=var, attrs=", ".join(
+                "{}.{}".format(var, attr) for attr, _ in self.keys))
+
+    def _encode_source(self, ns, var):
+        lines = [
+            "{} = self.{}".format(var, self.name),
+            "if {} is None: {} = {}".format(var, var, ns.add(self._empty())),
+        ]
+        return lines, [
+            (key, "{}.{}".format(var, attr)) for attr, key in self.encode_keys]
+
+
+class Reference(Field):
+    """
+    Mapping of a related model object which is referenced by ID in Visma's
+    JSON format.
+
+    When decoding with a :class:`vismalib.registry.ReferenceRegistry`, the
+    referenced object is the registry's shared instance with the ID
+    instead.
+
+    :param name: Attribute name
+    :param model: Class of referenced object
+    :param key: JSON key of the ID
+    :param source: JSON key of an object to decode the referenced object
+                   from, if the API includes it. Otherwise only the ID of
+                   the referenced object is set.
+    :param encode_key: JSON key to encode the ID to, if it differs from
+                       ``key``
+    """
+
+    def __init__(self, name, model, key, source=None, encode_key=None):
+        self.name = name
+        self.model = model
+        self.key = key
+        self.source = source
+        self.encode_key = key if encode_key is None else encode_key
+
+    def __repr__(self):
+        return "{}({!r}, {})".format(
+            self.__class__.__name__, self.name, self.model.__name__)
+
+    def _decode_source(self, ns):
+        model = ns.add(self.model)
+        lines = [
+            "v = get({!r})".format(self.key),
+            "if not v: v = None",
+            "elif registry is not None: v = registry.resolve({}, v)".format(
+                model),
+        ]
+        if self.source is None:
+            lines.append("else: v = {}(id=v)".format(model))
+        else:
+            lines.append(
+                "else: v = {}.from_json(get({!r}) or {{'Id': v}})".format(
+                    model, self.source))
+        return lines
+
+    def _column_source(self, ns):
+        return [(
+            "{}.id".format(self.name),
+            ["v = get({!r}) or None".format(self.key)],
+            None)]
+
+    def _snapshot_source(self, var):
+        return "None if {var} is None else {var}.id".format(var=var)
+
+    def _encode_source(self, ns, var):
+        return ["{} = self.{}".format(var, self.name)], [
+            (self.encode_key, "None if {var} is None else {var}.id".format(
+                var=var))]
+
+
+def compile_codecs(name, fields):
+    """
+    Generate specialized functions for decoding and encoding objects with
+    the given fields.
+
+    The decoder takes an object, deserialized JSON data, an optional
+    :class:`vismalib.registry.ReferenceRegistry` and whether to track
+    changes. It sets every field on the object, and when tracking changes,
+    ``_visma_snapshot`` to a tuple with a snapshot of every field. The encoder takes an object and returns a
+    dictionary ready to be serialized to JSON. There is also a decoder per
+    field, which takes deserialized JSON data and an optional registry and
+    returns the value of that field only.
+
+    A snapshot of a field value is an immutable value which is equal to the
+    snapshot of another value if they encode to the same JSON. Changes to a
+    field, including changes to the attributes of an embedded object, are
+    detected by comparing snapshots.
+
+    :param name: Name of class the fields belong to, used in tracebacks
+    :param fields: Sequence of :class:`Field`
+    :return: Tuple of ``(decode, encode, field_decoders, snapshots)``, where
+             ``field_decoders`` is a dictionary of field names to functions
+             and ``snapshots`` is a list of ``(name, function)`` pairs in
+             the order of ``fields``, where each function takes a value of
+             the field and returns its snapshot
+    """
+
+    ns = _Namespace()
+
+    decode = [
+        "def decode(self, json, registry=None, track=True):",
+        "    get = json.get",
+    ]
+    for i, field in enumerate(fields):
+        decode.extend("    " + line for line in field._decode_source(ns))
+        decode.append("    self.{} = v{} = v".format(field.name, i))
+    decode.append("    if track:")
+    decode.append("        self._visma_snapshot = ({})".format(
+        "".join(
+            "{}, ".format(field._snapshot_source("v{}".format(i)))
+            for i, field in enumerate(fields))))
+
+    encode = ["def encode(self):"]
+    items = []
+    for i, field in enumerate(fields):
+        lines, field_items = field._encode_source(ns, "v{}".format(i))
+        encode.extend("    " + line for line in lines)
+        items.extend(field_items)
+    encode.append("    return {")
+    encode.extend("        {!r}: {},".format(key, expr) for key, expr in items)
+    encode.append("    }")
+
+    field_decoders = []
+    for i, field in enumerate(fields):
+        field_decoders.extend([
+            "",
+            "def decode_{}(json, registry=None):".format(i),
+            "    get = json.get",
+        ])
+        field_decoders.extend(
+            "    " + line for line in field._decode_source(ns))
+        field_decoders.append("    return v")
+
+    snapshots = []
+    for i, field in enumerate(fields):
+        snapshots.extend([
+            "",
+            "def snapshot_{}(v):".format(i),
+            "    return {}".format(field._snapshot_source("v")),
+        ])
+
+    source = "\n".join(
+        decode + [""] + encode + field_decoders + snapshots) + "\n"
+    exec(compile(source, "<{} codecs>".format(name), "exec"), ns.globals)
+    return ns.globals["decode"], ns.globals["encode"], dict(
+        (field.name, ns.globals["decode_{}".format(i)])
+        for i, field in enumerate(fields)), [
+        (field.name, ns.globals["snapshot_{}".format(i)])
+        for i, field in enumerate(fields)]
+
+
+def compile_column_decoder(name, fields):
+    """
+    Generate a function which decodes a list of deserialized JSON objects
+    into columns, without creating any model objects.
+
+    Embedded objects get one column per attribute, named like
+    ``address.city``, and references get a column of IDs, named like
+    ``delivery_method.id``.
+
+    :param name: Name of class the fields belong to, used in tracebacks
+    :param fields: Sequence of :class:`Field`
+    :return: Function taking a list of deserialized JSON objects and
+             returning a dictionary of column names to lists of values
+    """
+
+    ns = _Namespace()
+    columns = [
+        column for field in fields for column in field._column_source(ns)]
+
+    source = ["def decode_columns(records):"]
+    for i, _ in enumerate(columns):
+        source.append("    c{i} = []; a{i} = c{i}.append".format(i=i))
+    source.extend(["    for json in records:", "        get = json.get"])
+    for i, (_, lines, _) in enumerate(columns):
+        source.extend("        " + line for line in lines)
+        source.append("        a{}(v)".format(i))
+    for i, (_, _, convert) in enumerate(columns):
+        if convert is not None:
+            source.append("    c{i} = {convert}(c{i})".format(
+                i=i, convert=convert))
+    source.append("    return [")
+    source.extend(
+        "        ({!r}, c{}),".format(column, i)
+        for i, (column, _, _) in enumerate(columns))
+    source.append("    ]")
+
+    source = "\n".join(source) + "\n"
+    exec(compile(source, "<{} columns>".format(name), "exec"), ns.globals)
+    return ns.globals["decode_columns"]
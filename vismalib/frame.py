@@ -0,0 +1,140 @@
+from collections import OrderedDict
+from itertools import compress
+
+from ._compat import string_types
+
+__all__ = [
+    "ModelFrame",
+]
+
+
+class ModelFrame(object):
+    """
+    Columnar container for many objects of one model type, such as every
+    customer of a company.
+
+    Columns are decoded straight from the API's JSON using the model's
+    ``__visma_fields__``, without creating a model object per row. Each
+    field is a column named after its attribute. Embedded objects get one
+    column per attribute, like ``address.city``, and references get a column
+    of IDs, like ``delivery_method.id``.
+
+        frame = store.find(Customer, as_frame=True)
+        swedish = frame[[c == "SE" for c in frame["address.country"]]]
+        emails = swedish["email"]
+
+    Columns are plain Python lists of the decoded values, which keeps NumPy
+    and pandas optional. Decoding a frame is a few times faster than
+    decoding model objects, since no object is created per row, but the
+    JSON is still parsed into Python objects first. Handing a column to
+    NumPy or pandas therefore copies it once, and filtering copies the
+    selected rows.
+
+    :param type: Model class of rows
+    :param columns: Dictionary of column names to lists of equal length
+    """
+
+    def __init__(self, type, columns):
+        self.type = type
+        self.columns = OrderedDict(columns)
+
+    @classmethod
+    def from_json(cls, type, records):
+        """
+        Decode deserialized JSON objects of ``type`` into a new frame.
+
+        :param type: Model class of records
+        :param records: List of deserialized JSON objects from an API call
+        :return: New frame
+        :rtype: ModelFrame
+        """
+
+        if type._visma_decode_columns is None:
+            raise NotImplementedError(
+                "Columnar decoding is not implemented for {}".format(
+                    type.__name__))
+
+        return cls(type, type._visma_decode_columns(records))
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __repr__(self):
+        return "{}({}, rows={}, columns={})".format(
+            self.__class__.__name__, self.type.__name__, len(self),
+            len(self.columns))
+
+    def __getitem__(self, key):
+        """
+        Return the column with the name ``key``, or a new frame with the
+        rows where ``key`` is true when ``key`` is a sequence of booleans.
+        """
+
+        if isinstance(key, string_types):
+            return self.columns[key]
+        return self.filter(key)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def filter(self, mask):
+        """
+        Return a new frame with the rows where ``mask`` is true.
+
+        :param mask: Sequence of booleans, one per row
+        :rtype: ModelFrame
+        """
+
+        mask = list(mask)
+        if len(mask) != len(self):
+            raise ValueError(
+                "Mask has {} items, expected {}".format(len(mask), len(self)))
+
+        return self.__class__(self.type, [
+            (name, list(compress(column, mask)))
+            for name, column in self.columns.items()])
+
+    def where(self, name, predicate):
+        """
+        Return a boolean mask of the rows where ``predicate`` is true for the
+        value of column ``name``.
+
+        :param name: Column name
+        :param predicate: Callable taking a value and returning a boolean
+        :rtype: [bool]
+        """
+
+        return [bool(predicate(value)) for value in self.columns[name]]
+
+    def to_numpy(self, name):
+        """
+        Return the column ``name`` as a NumPy array. Requires NumPy.
+
+        Columns of numbers and booleans get a native dtype if they contain no
+        ``None``; other columns are arrays of Python objects.
+
+        :param name: Column name
+        :rtype: numpy.ndarray
+        """
+
+        import numpy
+
+        column = self.columns[name]
+        if any(value is None for value in column):
+            return numpy.array(column, dtype=object)
+        return numpy.array(column)
+
+    def to_pandas(self):
+        """
+        Return the frame as a :class:`pandas.DataFrame`. Requires pandas.
+
+        Every column is copied into the data frame once.
+
+        :rtype: pandas.DataFrame
+        """
+
+        import pandas
+
+        return pandas.DataFrame(self.columns, columns=list(self.columns))
@@ -0,0 +1,236 @@
+import threading
+
+from bisect import bisect_left
+
+from ._compat import monotonic
+
+__all__ = [
+    "HistogramCollector",
+    "Metrics",
+]
+
+#: Default buckets of durations in seconds
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0)
+
+#: Default buckets of sizes in bytes
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(9))
+
+
+class Metrics(object):
+    """
+    Interface of metrics collectors given to :class:`vismalib.Store` and
+    :class:`vismalib.VismaSession`. Subclass it and override :meth:`observe`
+    to forward measurements somewhere else, like a StatsD client.
+
+    The following measurements are made:
+
+    ``request_seconds``
+        Latency of an HTTP request, labeled with ``method`` and ``status``
+    ``request_bytes``, ``response_bytes``
+        Size of HTTP request and response bodies, labeled with ``method``
+    ``rate_limit_wait_seconds``
+        Time spent waiting for the session's rate limiter
+    ``json_seconds``
+        Time spent parsing JSON responses, labeled with ``type`` and
+        ``operation``
+    ``decode_seconds``
+        Time spent in ``from_json``, labeled with ``type`` and ``operation``
+    ``call_seconds``
+        Time of an API call made by a store operation, like ``find``,
+        including retries. Labeled with ``type`` and ``operation``.
+
+    Operations that yield objects as they are decoded, like
+    :meth:`vismalib.Store.iter_find`, only record ``call_seconds`` and
+    ``json_seconds``, since their decoding is interleaved with the caller.
+    """
+
+    def observe(self, name, value, **labels):
+        """
+        Record one measurement.
+
+        :param name: Name of measurement
+        :param value: Measured value
+        :param **labels: Labels of measurement as strings
+        """
+
+        pass
+
+
+class _Timer(object):
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe(
+            self.name, monotonic() - self.start, **self.labels)
+
+
+class _NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_null_timer = _NullTimer()
+
+
+def timed(metrics, name, **labels):
+    """
+    Return a context manager which records the time spent inside it as
+    ``name``, or does nothing if ``metrics`` is ``None``.
+    """
+
+    if metrics is None:
+        return _null_timer
+    return _Timer(metrics, name, labels)
+
+
+class _Histogram(object):
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace(
+        "\"", "\\\"")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{{{}}}".format(",".join(
+        "{}=\"{}\"".format(name, _escape(value)) for name, value in labels))
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class HistogramCollector(Metrics):
+    """
+    Collects measurements in histograms in memory, one per name and set of
+    labels. Safe to share between threads.
+
+        metrics = HistogramCollector()
+        store = Store(VismaSession(..., metrics=metrics), metrics=metrics)
+        ...
+        print(metrics.to_prometheus())
+
+    :param buckets: Upper bounds of buckets to use for every measurement.
+                    Defaults to :data:`SIZE_BUCKETS` for measurements whose
+                    name ends with ``_bytes`` and :data:`DURATION_BUCKETS`
+                    for the rest.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = None if buckets is None else tuple(sorted(buckets))
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def _buckets(self, name):
+        if self.buckets is not None:
+            return self.buckets
+        if name.endswith("_bytes"):
+            return SIZE_BUCKETS
+        return DURATION_BUCKETS
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = _Histogram(self._buckets(name))
+                self._histograms[key] = histogram
+            histogram.observe(value)
+
+    def snapshot(self):
+        """
+        Return the current state of every histogram.
+
+        :return: Dictionary of ``(name, labels)`` tuples, where ``labels`` is
+                 a sorted tuple of ``(label, value)`` pairs, to dictionaries
+                 with ``count``, ``sum`` and ``buckets``. Buckets are a list
+                 of ``(upper bound, cumulative count)`` pairs.
+        :rtype: dict
+        """
+
+        with self._lock:
+            result = {}
+            for key, histogram in self._histograms.items():
+                cumulative = 0
+                buckets = []
+                for bound, count in zip(
+                        histogram.buckets + (float("inf"),),
+                        histogram.counts):
+                    cumulative += count
+                    buckets.append((bound, cumulative))
+                result[key] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": buckets,
+                }
+            return result
+
+    def clear(self):
+        """
+        Remove every histogram.
+        """
+
+        with self._lock:
+            self._histograms.clear()
+
+    def to_prometheus(self, prefix="vismalib"):
+        """
+        Return every histogram in the Prometheus text exposition format.
+
+        :param prefix: Prefix of metric names
+        :rtype: str
+        """
+
+        by_name = {}
+        for (name, labels), state in self.snapshot().items():
+            by_name.setdefault(name, []).append((labels, state))
+
+        lines = []
+        for name in sorted(by_name):
+            metric = "{}_{}".format(prefix, name) if prefix else name
+            lines.append("# TYPE {} histogram".format(metric))
+            for labels, state in sorted(by_name[name], key=lambda x: x[0]):
+                for bound, count in state["buckets"]:
+                    lines.append("{}_bucket{} {}".format(
+                        metric,
+                        _format_labels(labels + (("le", _format_number(
+                            bound)),)),
+                        count))
+                lines.append("{}_sum{} {}".format(
+                    metric, _format_labels(labels),
+                    _format_number(state["sum"])))
+                lines.append("{}_count{} {}".format(
+                    metric, _format_labels(labels), state["count"]))
+        return "\n".join(lines) + "\n"
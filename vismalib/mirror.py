@@ -0,0 +1,263 @@
+import json
+import sqlite3
+import threading
+
+from datetime import date, datetime
+from numbers import Number
+
+from ._compat import string_types
+from .fields import Timestamp
+from .utils import format_timestamp, parse_timestamp
+
+__all__ = [
+    "SqliteMirror",
+]
+
+# Comparison operators of query filters, like ChangedUtc__ge=since
+_operators = {
+    "eq": "=",
+    "ne": "!=",
+    "gt": ">",
+    "ge": ">=",
+    "lt": "<",
+    "le": "<=",
+}
+
+
+def _column_value(value):
+    # Timestamps are stored in a single format, in UTC, which makes them
+    # sort in chronological order
+    if isinstance(value, datetime):
+        return format_timestamp(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if value is None or isinstance(value, (Number,) + string_types):
+        return value
+    raise ValueError(
+        "Can not store value of type {} in a column".format(
+            value.__class__.__name__))
+
+
+class SqliteMirror(object):
+    """
+    Local replica of model objects in SQLite, for answering queries without
+    calling the API.
+
+    Every model type gets its own table, named after ``__visma_path__``.
+    There is one column per key of the model's ``to_json()`` output, which
+    is what queries filter on, and one holding the JSON the object was
+    decoded from. Columns listed in the model's ``__visma_indexes__`` are
+    indexed. Timestamps are stored in UTC in the format of
+    :func:`vismalib.utils.format_timestamp`, which sorts chronologically.
+
+    The mirror can be shared between threads.
+
+    :param path: Path of database file, or ``":memory:"``
+    :param types: Model classes to mirror
+    """
+
+    #: Column holding the JSON objects are decoded from
+    json_column = "_json"
+
+    #: Column holding the unique object ID
+    id_column = "Id"
+
+    def __init__(self, path, types=()):
+        self.path = path
+        self._columns = {}
+        self._timestamps = {}
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+
+        for type in types:
+            self.register(type)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _table(self, type):
+        if type.__visma_path__ is None:
+            raise ValueError(
+                "__visma_path__ is not defined for {}".format(type.__name__))
+        return type.__visma_path__
+
+    def register(self, type):
+        """
+        Create the table and indexes for ``type`` unless they already exist.
+
+        :param type: Model class to mirror
+        """
+
+        table = self._table(type)
+        columns = [
+            key for key in type().to_json() if key != self.id_column]
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS \"{table}\" ("
+                "\"{id}\" TEXT PRIMARY KEY, {columns}, \"{json}\" TEXT)".format(
+                    table=table,
+                    id=self.id_column,
+                    json=self.json_column,
+                    columns=", ".join(
+                        "\"{}\"".format(column) for column in columns)))
+
+            for column in type.__visma_indexes__:
+                self._connection.execute(
+                    "CREATE INDEX IF NOT EXISTS \"{table}_{column}\" "
+                    "ON \"{table}\" (\"{column}\")".format(
+                        table=table, column=column))
+
+        self._columns[type] = [self.id_column] + columns
+        self._timestamps[type] = frozenset(
+            field.encode_key for field in type.__visma_fields__
+            if isinstance(field, Timestamp))
+
+    def has(self, type):
+        """
+        Return ``True`` if ``type`` is mirrored.
+        """
+
+        return type in self._columns
+
+    def load(self, type, records):
+        """
+        Insert or replace objects in the mirror in a single transaction.
+
+        :param type: Model class of records
+        :param records: Iterable of deserialized JSON objects as returned by
+                        the API
+        :return: Number of records loaded
+        :raise ValueError: If a column value can not be stored
+        """
+
+        columns = self._columns[type] + [self.json_column]
+        rows = []
+        for record in records:
+            # The API's keys differ from the model's for some fields, so
+            # columns are filled from the encoded object
+            data = type.from_json(record, track_changes=False).to_json()
+            rows.append(
+                [_column_value(data.get(column)) for column in columns[:-1]] +
+                [json.dumps(record)])
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO \"{table}\" ({columns}) "
+                "VALUES ({values})".format(
+                    table=self._table(type),
+                    columns=", ".join(
+                        "\"{}\"".format(column) for column in columns),
+                    values=", ".join("?" for _ in columns)),
+                rows)
+
+        return len(rows)
+
+    def fill(self, store, type, page_size=1000, prefetch=2):
+        """
+        Load every object of ``type`` from the API into the mirror. Each page
+        is loaded in its own transaction.
+
+        :param store: :class:`vismalib.Store` to list objects from
+        :param type: Model class to load
+        :param page_size: Number of objects to request per page
+        :param prefetch: Number of pages to fetch in the background
+        :return: Number of objects loaded
+        """
+
+        if not self.has(type):
+            self.register(type)
+
+        return sum(
+            self.load(type, page)
+            for page in store.iter_pages(type, page_size, prefetch))
+
+    def remove(self, type, ids):
+        """
+        Remove the objects of ``type`` with the given IDs from the mirror.
+        """
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM \"{table}\" WHERE \"{id}\" = ?".format(
+                    table=self._table(type), id=self.id_column),
+                [(id,) for id in ids])
+
+    def find(self, type, **params):
+        """
+        Return a list of mirrored objects of ``type`` whose columns match
+        the given keyword arguments.
+
+        Columns are compared for equality, unless the name is followed by
+        one of the operators ``__eq``, ``__ne``, ``__gt``, ``__ge``, ``__lt``
+        and ``__le``. Timestamps may be given as ``datetime`` or strings.
+
+            mirror.find(Customer, ChangedUtc__ge=since, InvoiceCity="Lund")
+
+        :param type: Model class to query
+        :param **params: Column names, as in Visma's JSON format, and the
+                         values to compare with.
+        :return: List of type ``type`` instances
+        :raise ValueError: If a column or operator does not exist
+        """
+
+        decode = type.from_json
+        return [decode(data) for data in self.find_json(type, **params)]
+
+    def find_json(self, type, **params):
+        """
+        Return the JSON of the mirrored objects of ``type`` whose columns
+        match the given keyword arguments. This is the undecoded version of
+        :meth:`find`.
+
+        :return: List of deserialized JSON objects
+        """
+
+        columns = self._columns[type]
+        timestamps = self._timestamps[type]
+        conditions = []
+        values = []
+        for name, value in params.items():
+            column, _, operator = name.partition("__")
+            if column not in columns:
+                raise ValueError(
+                    "{} has no column '{}'".format(type.__name__, column))
+            if operator not in _operators:
+                if operator:
+                    raise ValueError(
+                        "Unknown operator '{}'".format(operator))
+                operator = "eq"
+
+            if value is None and operator in ("eq", "ne"):
+                # Comparing with NULL is never true in SQL
+                conditions.append("\"{}\" IS {}NULL".format(
+                    column, "NOT " if operator == "ne" else ""))
+                continue
+
+            if column in timestamps and isinstance(value, string_types):
+                value = parse_timestamp(value)
+            conditions.append(
+                "\"{}\" {} ?".format(column, _operators[operator]))
+            values.append(_column_value(value))
+
+        query = "SELECT \"{json}\" FROM \"{table}\"".format(
+            json=self.json_column, table=self._table(type))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        with self._lock:
+            rows = self._connection.execute(query, values).fetchall()
+
+        return [json.loads(row[0]) for row in rows]
+
+    def get(self, type, id):
+        """
+        Return the mirrored object of ``type`` with ``id``, or ``None`` if it
+        is not in the mirror.
+        """
+
+        objs = self.find(type, **{self.id_column: id})
+        return objs[0] if objs else None
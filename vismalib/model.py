@@ -1,6 +1,8 @@
-from datetime import date, datetime
-
-from .utils import combomethod, getattrdeep, AttrProxy
+from ._compat import with_metaclass
+from .fields import (
+    Embedded, Field, Reference, Timestamp, compile_codecs,
+    compile_column_decoder)
+from .utils import combomethod, format_timestamp, AttrProxy
 
 __all__ = [
     "DeliveryTerms",
@@ -42,32 +44,205 @@ class ModelReprMixin(object):
                 for attr in self.__slots__ if getattr(self, attr) is not None))
 
 
-class VismaModel(object):
-    __slots__ = ()
+class VismaModelMeta(type):
+    """
+    Metaclass of :class:`VismaModel`. Compiles a decoder and an encoder for
+    every class that declares ``__visma_fields__``.
+    """
+
+    def __init__(cls, name, bases, attrs):
+        super(VismaModelMeta, cls).__init__(name, bases, attrs)
+
+        if "__visma_fields__" not in attrs:
+            return
+
+        decode, encode, field_decoders, snapshots = compile_codecs(
+            name, cls.__visma_fields__)
+        cls._visma_decode = staticmethod(decode)
+        cls._visma_encode = staticmethod(encode)
+        cls._visma_field_decoders = field_decoders
+        cls._visma_snapshots = snapshots
+        cls._visma_references = tuple(
+            field.name for field in cls.__visma_fields__
+            if isinstance(field, Reference))
+        cls._visma_decode_columns = staticmethod(
+            compile_column_decoder(name, cls.__visma_fields__))
+
+        # Instances can skip __init__ when decoding sets every attribute
+        names = set(field.name for field in cls.__visma_fields__)
+        cls._visma_complete = all(
+            slot in names for slot in attrs.get("__slots__", ()))
+
+
+class VismaModel(with_metaclass(VismaModelMeta, object)):
+    """
+    Base class of objects that are available through the API.
+
+    Subclasses declare how they map to Visma's JSON format using
+    ``__visma_fields__``, a sequence of :class:`vismalib.fields.Field`.
+    Specialized :meth:`from_json` and :meth:`to_json` implementations are
+    generated from the fields when the class is created.
+
+    Objects decoded lazily keep a reference to the JSON they were created
+    from, and decode each field the first time it is accessed.
+
+    Changes made since an object was decoded are reported by
+    :meth:`changed_fields`. This requires a snapshot of every field, which
+    is about a third of the memory of a decoded customer. Objects which are
+    only read can be decoded without it, see :meth:`from_json`.
+    """
+
+    __slots__ = ("_visma_raw", "_visma_snapshot")
 
     __visma_path__ = None
     __visma_key__ = None
     __visma_methods__ = frozenset()
     __visma_version__ = "v1"
+    __visma_changed_key__ = None
+    __visma_changed_attr__ = None
+    __visma_indexes__ = ()
+    __visma_fields__ = ()
+
+    _visma_decode = None
+    _visma_encode = None
+    _visma_field_decoders = {}
+    _visma_snapshots = []
+    _visma_references = ()
+    _visma_decode_columns = None
+    _visma_complete = False
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not set, which for lazily
+        # decoded objects include the fields that have not been accessed yet
+        decode = self._visma_field_decoders.get(name)
+        if decode is not None:
+            try:
+                raw = self._visma_raw
+            except AttributeError:
+                raw = None
+
+            if raw is not None:
+                value = decode(raw)
+                setattr(self, name, value)
+                return value
+
+        raise AttributeError("'{}' object has no attribute '{}'".format(
+            self.__class__.__name__, name))
 
     @classmethod
     def has_support(cls, method):
         return method in cls.__visma_methods__
 
     @combomethod
-    def from_json(cls, self, json):
+    def from_json(cls, self, json, lazy=False, registry=None,
+                  track_changes=True):
         """
-        Create a new object from a JSON response.
+        Create a new object from a JSON response. If called on an object
+        the object is updated instead.
 
         :param json: Deserialized JSON data from an API call
+        :param lazy: Decode fields on first access instead of immediately.
+                     ``json`` must not be modified while it is in use.
+        :param registry: Optional
+                         :class:`vismalib.registry.ReferenceRegistry` which
+                         referenced objects are resolved with. References
+                         are resolved immediately even if ``lazy`` is
+                         ``True``.
+        :param track_changes: Keep a snapshot of the decoded values for
+                              :meth:`changed_fields`. Objects decoded
+                              without it are considered modified in every
+                              field. Lazily decoded objects compare with
+                              their JSON instead and never need one.
         :return: New object
-        :rtype: Customer
+        :rtype: VismaModel
         """
 
-        raise NotImplementedError(
-            "from_json is not implemented for {}".format(cls.__name__))
+        if cls._visma_decode is None:
+            raise NotImplementedError(
+                "from_json is not implemented for {}".format(cls.__name__))
+
+        # Create a fresh instance if we are calling this as a classmethod,
+        # otherwise work on self
+        if self is None:
+            self = cls.__new__(cls) if cls._visma_complete else cls()
+            fresh = cls._visma_complete
+        else:
+            fresh = False
+
+        if not lazy:
+            cls._visma_decode(self, json, registry, track_changes)
+            if not track_changes and not fresh:
+                try:
+                    del self._visma_snapshot
+                except AttributeError:
+                    pass
+            return self
+
+        # Previously decoded fields must be unset to be decoded again
+        if not fresh:
+            for name in cls._visma_field_decoders:
+                try:
+                    delattr(self, name)
+                except AttributeError:
+                    pass
+
+        self._visma_raw = json
+        self._visma_snapshot = None
+
+        if registry is not None:
+            decoders = cls._visma_field_decoders
+            for name in cls._visma_references:
+                setattr(self, name, decoders[name](json, registry))
+
+        return self
 
-    def from_json(self):
+    def changed_fields(self):
+        """
+        Return the names of the fields that have been modified since the
+        object was last decoded by :meth:`from_json`. Modifications of
+        embedded objects, like the address of a customer, are included.
+
+        Objects that have not been decoded from JSON, like new objects, are
+        considered modified in every field.
+
+        :return: List of field names in declaration order
+        :rtype: [str]
+        """
+
+        cls = self.__class__
+        try:
+            snapshot = self._visma_snapshot
+        except AttributeError:
+            return [name for name, _ in cls._visma_snapshots]
+
+        if snapshot is not None:
+            return [
+                name for (name, take), old in zip(
+                    cls._visma_snapshots, snapshot)
+                if take(getattr(self, name)) != old]
+
+        # Lazily decoded fields are unchanged unless they have been accessed,
+        # in which case they are compared to a fresh decode of the JSON
+        raw = self._visma_raw
+        changed = []
+        for name, take in cls._visma_snapshots:
+            try:
+                value = getattr(cls, name).__get__(self, cls)
+            except AttributeError:
+                continue
+            if take(value) != take(cls._visma_field_decoders[name](raw)):
+                changed.append(name)
+        return changed
+
+    def has_changed(self):
+        """
+        Return ``True`` if any field has been modified since the object was
+        last decoded. See :meth:`changed_fields`.
+        """
+
+        return bool(self.changed_fields())
+
+    def to_json(self):
         """
         Convert object to a dict that is ready to be serialized to JSON.
 
@@ -75,8 +250,12 @@ class VismaModel(object):
         :rtype: dict
         """
 
-        raise NotImplementedError(
-            "to_json is not implemented for {}".format(self.__class__.__name__))
+        if self._visma_encode is None:
+            raise NotImplementedError(
+                "to_json is not implemented for {}".format(
+                    self.__class__.__name__))
+
+        return self._visma_encode(self)
 
     @classmethod
     def _visma_get_path(cls, *args):
@@ -99,6 +278,29 @@ class VismaModel(object):
             "data": kwargs,
         }
 
+    @classmethod
+    def _visma_list_page(cls, page, page_size, query=None, **kwargs):
+        request = cls._visma_list(**kwargs)
+        request["params"] = dict(query or {})
+        request["params"].update({
+            "$page": page,
+            "$pagesize": page_size,
+        })
+        return request
+
+    @classmethod
+    def _visma_changed_query(cls, since=None):
+        if cls.__visma_changed_key__ is None:
+            raise ValueError(
+                "__visma_changed_key__ is not defined for {}".format(
+                    cls.__name__))
+
+        query = {"$orderby": cls.__visma_changed_key__}
+        if since is not None:
+            query["$filter"] = "{} ge {}".format(
+                cls.__visma_changed_key__, format_timestamp(since))
+        return query
+
     @classmethod
     def _visma_get(cls, id):
         if not cls.has_support("get"):
@@ -152,37 +354,41 @@ class VismaModel(object):
             raise NotImplementedError(
                 "Removing {} is not supported".format(self.__class__.__name__))
 
+        if self.__visma_key__ is None:
+            raise ValueError(
+                "__visma_key__ is not defined for {}".format(
+                    self.__class__.__name__))
+
         return {
             "method": "DELETE",
             "url": self._visma_get_path(getattr(self, self.__visma_key__)),
         }
 
-class DeliveryBase(ModelReprMixin):
+
+class DeliveryBase(ModelReprMixin, VismaModel):
+    __visma_key__ = "id"
+    __visma_methods__ = frozenset(["list", "get"])
+
     __slots__ = ("id", "code", "name")
 
+    __visma_fields__ = (
+        Field("id", "Id"),
+        Field("code", "Code"),
+        Field("name", "Name"),
+    )
+
     def __init__(self, id=None, code=None, name=None):
         self.id = id
         self.code = code
         self.name = name
 
-    @combomethod
-    def from_json(cls, self, json):
-        if self is None:
-            self = cls()
-
-        self.id = json.get("Id")
-        self.code = json.get("Code")
-        self.name = json.get("Name")
-
-        return self
-
 
 class DeliveryTerms(DeliveryBase):
-    pass
+    __visma_path__ = "deliveryterms"
 
 
 class DeliveryMethod(DeliveryBase):
-    pass
+    __visma_path__ = "deliverymethods"
 
 
 class Address(ModelReprMixin):
@@ -233,7 +439,11 @@ class Address(ModelReprMixin):
     __nonzero__ = __bool__
 
 
-class TermsOfPayment(ModelReprMixin):
+class TermsOfPayment(ModelReprMixin, VismaModel):
+    __visma_path__ = "termsofpayment"
+    __visma_key__ = "id"
+    __visma_methods__ = frozenset(["list", "get"])
+
     __slots__ = (
         "id",
         "name",
@@ -243,6 +453,15 @@ class TermsOfPayment(ModelReprMixin):
         "type_text",
     )
 
+    __visma_fields__ = (
+        Field("id", "Id"),
+        Field("name", "Name"),
+        Field("english_name", "NameEnglish"),
+        Field("days", "NumberOfDays"),
+        Field("type_id", "TermsOfPaymentId"),
+        Field("type_text", "TermsOfPaymentTypeText"),
+    )
+
     def __init__(
             self, id=None, name=None, english_name=None, days=None, type_id=None,
             type_text=None):
@@ -253,20 +472,6 @@ class TermsOfPayment(ModelReprMixin):
         self.type_id = type_id
         self.type_text = type_text
 
-    @combomethod
-    def from_json(cls, self, json):
-        if self is None:
-            self = cls()
-
-        self.id = json.get("Id")
-        self.name = json.get("Name")
-        self.english_name = json.get("NameEnglish")
-        self.days = json.get("NumberOfDays")
-        self.type_id = json.get("TermsOfPaymentId")
-        self.type_text = json.get("TermsOfPaymentTypeText")
-
-        return self
-
 
 class Customer(ModelReprMixin, VismaModel):
     """
@@ -301,7 +506,16 @@ class Customer(ModelReprMixin, VismaModel):
     """
 
     __visma_path__ = "customers"
-    __visma_methods__ = frozenset(["get", "add", "update"])
+    __visma_key__ = "id"
+    __visma_changed_key__ = "ChangedUtc"
+    __visma_changed_attr__ = "last_edited"
+    __visma_indexes__ = (
+        "CustomerNumber",
+        "EmailAddress",
+        "VatNumber",
+        "ChangedUtc",
+    )
+    __visma_methods__ = frozenset(["list", "get", "add", "update", "remove"])
 
     __slots__ = (
         "id",
@@ -334,6 +548,60 @@ class Customer(ModelReprMixin, VismaModel):
         "reverse_charge_on_construction_services",
     )
 
+    __visma_fields__ = (
+        Field("id", "Id"),
+        Field("number", "CustomerNumber"),
+        Field("nin", "CorporateIdentityNumber", empty_as_none=True),
+        Field("is_company", "IsPrivatePerson", default=True),
+        Field("vat_number", "VatNumber", empty_as_none=True),
+        Field("currency", "CurrencyCode"),
+        Field("gln", "GLN", empty_as_none=True),
+        Field("email", "EmailAddress", empty_as_none=True),
+        Field("phone", "Phone", empty_as_none=True),
+        Field("mobile_phone", "MobilePhone", empty_as_none=True),
+        Field("url", "WwwAddress", empty_as_none=True),
+        Field("note", "Note", empty_as_none=True),
+
+        Field("contact_name", "ContactPersonName", empty_as_none=True),
+        Field("contact_email", "ContactPersonEmail", empty_as_none=True),
+        Field("contact_phone", "ContactPersonPhone", empty_as_none=True),
+        Field(
+            "contact_mobile_phone", "ContactPersonMobile", empty_as_none=True),
+
+        Embedded("address", Address, [
+            ("name", "Name"),
+            ("address", "InvoiceAddress1"),
+            ("secondary_address", "InvoiceAddress2"),
+            ("postal_code", "InvoicePostalCode"),
+            ("city", "InvoiceCity"),
+            ("country", "InvoiceCountryCode"),
+        ]),
+        Embedded("delivery_address", Address, [
+            ("name", "DeliveryCustomerName"),
+            ("address", "DeliveryAddress1"),
+            ("secondary_address", "DeliveryAddress2"),
+            ("postal_code", "DeliveryPostalCode"),
+            ("city", "DeliveryCity"),
+            ("country", "DeliveryCountryCode"),
+        ], optional=True, encode_keys={"name": "DeliveryName"}),
+        Reference("delivery_method", DeliveryMethod, "DeliveryMethodId"),
+        Reference(
+            "delivery_terms", DeliveryTerms, "DeliveryTermId",
+            encode_key="DeliveryTerms"),
+        Reference(
+            "terms_of_payment", TermsOfPayment, "TermsOfPaymentId",
+            source="TermsOfPayment"),
+
+        Field(
+            "webshop_customer_number", "WebshopCustomerNumber",
+            empty_as_none=True),
+        Timestamp("last_invoice_date", "LastInvoiceDate"),
+        Timestamp("last_edited", "ChangedUtc"),
+        Field(
+            "reverse_charge_on_construction_services",
+            "ReverseChargeOnConstructionServices"),
+    )
+
     #: Convenience property for accessing customer name
     name = AttrProxy("address.name")
 
@@ -377,136 +645,3 @@ class Customer(ModelReprMixin, VismaModel):
 
         if name is not None:
             self.name = name
-
-    def to_json(self):
-        """
-        Convert Customer to a dict that is ready to be serialized to JSON.
-
-        :return: Visma formatted dictionary
-        :rtype: dict
-        """
-
-        delivery_address = self.delivery_address or Address()
-
-        return {
-            "Id": self.id,
-            "CustomerNumber": self.number,
-            "CorporateIdentityNumber": self.nin,
-            "IsPrivatePerson": self.is_company,
-            "VatNumber": self.vat_number,
-            "CurrencyCode": self.currency,
-            "GLN": self.gln,
-            "EmailAddress": self.email,
-            "Phone": self.phone,
-            "MobilePhone": self.mobile_phone,
-            "WwwAddress": self.url,
-            "Note": self.note,
-            "ContactPersonName": self.contact_name,
-            "ContactPersonEmail": self.contact_email,
-            "ContactPersonMobile": self.contact_mobile_phone,
-            "ContactPersonPhone": self.contact_phone,
-            "Name": self.address.name,
-            "InvoiceAddress1": self.address.address,
-            "InvoiceAddress2": self.address.secondary_address,
-            "InvoicePostalCode": self.address.postal_code,
-            "InvoiceCity": self.address.city,
-            "InvoiceCountryCode": self.address.country,
-            "DeliveryName": delivery_address.name,
-            "DeliveryAddress1": delivery_address.address,
-            "DeliveryAddress2": delivery_address.secondary_address,
-            "DeliveryPostalCode": delivery_address.postal_code,
-            "DeliveryCity": delivery_address.city,
-            "DeliveryCountryCode": delivery_address.country,
-            "DeliveryMethodId": getattrdeep(self, ["delivery_method", "id"], None),
-            "DeliveryTerms": getattrdeep(self, ["delivery_terms", "id"], None),
-            "TermsOfPaymentId": getattrdeep(self, ["terms_of_payment", "id"], None),
-            "WebshopCustomerNumber": self.webshop_customer_number,
-            "LastInvoiceDate": str(self.last_invoice_date),
-            "ChangedUtc": str(self.last_edited),
-            "ReverseChargeOnConstructionServices": self.reverse_charge_on_construction_services,
-        }
-
-    @combomethod
-    def from_json(cls, self, json):
-        """
-        Create a new Customer object from a JSON response.
-
-        :param json: Deserialized JSON data from an API call
-        :return: New customer object
-        :rtype: Customer
-        """
-
-        # Create a fresh instance if we are calling this as a classmethod,
-        # otherwise work on self
-        if self is None:
-            self = cls()
-
-        # Create a new delivery address
-        delivery_address = Address(
-            name=json.get("DeliveryCustomerName"),
-            address=json.get("DeliveryAddress1"),
-            secondary_address=json.get("DeliveryAddress2"),
-            postal_code=json.get("DeliveryPostalCode"),
-            city=json.get("DeliveryCity"),
-            country=json.get("DeliveryCountryCode"))
-
-        delivery_method = None
-        if json.get("DeliveryMethodId"):
-            delivery_method = DeliveryMethod(id=json.get("DeliveryMethodId"))
-
-        delivery_terms = None
-        if json.get("DeliveryTermId"):
-            delivery_terms = DeliveryTerms(id=json.get("DeliveryTermId"))
-
-        terms_of_payment = None
-        if json.get("TermsOfPaymentId"):
-            if self.terms_of_payment is None:
-                self.terms_of_payment = TermsOfPayment()
-            self.terms_of_payment.from_json(json.get("TermsOfPayment"))
-
-        last_invoice_date = None
-        if json.get("LastInvoiceDate") is not None:
-            # Last character needs to be removed since Python dates only support
-            # 6 decimal precision, while the dated provided by visma has 7
-            last_invoice_date = datetime.strptime(
-                json.get("LastInvoiceDate")[:-1], "%Y-%m-%dT%H:%M:%S.%f")
-
-        last_edited = None
-        if json.get("ChangedUtc") is not None:
-            # Last character needs to be removed since Python dates only support
-            # 6 decimal precision, while the dated provided by visma has 7
-            last_edited = datetime.strptime(
-                json.get("ChangedUtc")[:-1], "%Y-%m-%dT%H:%M:%S.%f")
-
-        self.id = json.get("Id")
-        self.number = json.get("CustomerNumber")
-        self.nin = json.get("CorporateIdentityNumber") or None
-        self.is_company = coalesce(json.get("IsPrivatePerson"), True)
-        self.vat_number = json.get("VatNumber") or None
-        self.currency = json.get("CurrencyCode")
-        self.gln = json.get("GLN") or None
-        self.email = json.get("EmailAddress") or None
-        self.phone = json.get("Phone") or None
-        self.mobile_phone = json.get("MobilePhone") or None
-        self.url = json.get("WwwAddress") or None
-        self.note = json.get("Note") or None
-        self.contact_name = json.get("ContactPersonName") or None
-        self.contact_email = json.get("ContactPersonEmail") or None
-        self.contact_mobile_phone = json.get("ContactPersonMobile") or None
-        self.contact_phone = json.get("ContactPersonPhone") or None
-        self.address.name = json.get("Name")
-        self.address.address = json.get("InvoiceAddress1")
-        self.address.secondary_address = json.get("InvoiceAddress2")
-        self.address.postal_code = json.get("InvoicePostalCode")
-        self.address.city = json.get("InvoiceCity")
-        self.address.country = json.get("InvoiceCountryCode")
-        self.delivery_address = delivery_address or None
-        self.delivery_method = delivery_method
-        self.delivery_terms = delivery_terms
-        self.terms_of_payment = terms_of_payment
-        self.webshop_customer_number = json.get("WebshopCustomerNumber") or None
-        self.last_invoice_date = last_invoice_date
-        self.last_edited = last_edited
-        self.reverse_charge_on_construction_services = json.get("ReverseChargeOnConstructionServices")
-
-        return self
@@ -0,0 +1,206 @@
+import threading
+import time
+
+from ._compat import monotonic
+
+__all__ = [
+    "RateLimiter",
+]
+
+
+def parse_retry_after(value):
+    """
+    Return the number of seconds to wait according to a ``Retry-After``
+    header, which is either a number of seconds or an HTTP date.
+
+    :param value: Header value or ``None``
+    :return: Number of seconds or ``None`` if not given or invalid
+    """
+
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    # Imported here since it is slow to import and dates are rarely used
+    from email.utils import mktime_tz, parsedate_tz
+
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0.0, mktime_tz(date) - time.time())
+
+
+def _header_number(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return None
+
+
+class RateLimiter(object):
+    """
+    Client side rate limiter to share between every thread using a session.
+
+    Requests are limited in two ways. A token bucket bounds the number of
+    requests per second, and a concurrency limit bounds the number of
+    requests in flight. The concurrency limit adapts to the server using
+    additive increase, multiplicative decrease (AIMD). It grows slowly while
+    requests succeed, and is cut when the server responds with
+    ``429 Too Many Requests`` or when responses are slower than
+    ``latency_target``.
+
+    A ``429`` also pauses all requests for the duration given by its
+    ``Retry-After`` header. So does a response saying that the quota is used
+    up (``X-RateLimit-Remaining: 0``), until the quota is reset.
+
+    :param rate: Maximum requests per second, ``None`` for unlimited
+    :param burst: Number of requests that may be made at once after being
+                  idle. Defaults to ``rate``.
+    :param concurrency: Initial limit of requests in flight
+    :param min_concurrency: Lower bound of the concurrency limit
+    :param max_concurrency: Upper bound of the concurrency limit
+    :param latency_target: Responses slower than this number of seconds
+                           decrease the concurrency limit, ``None`` to
+                           ignore latency.
+    :param increase: Amount the concurrency limit grows by for every
+                     ``limit`` successful requests
+    :param decrease: Factor the concurrency limit is multiplied with on
+                     congestion
+    :param backoff: Seconds to pause on ``429`` without ``Retry-After``
+    """
+
+    def __init__(
+            self, rate=None, burst=None, concurrency=4, min_concurrency=1,
+            max_concurrency=64, latency_target=None, increase=1.0,
+            decrease=0.5, backoff=1.0):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate or 1.0)
+        self.limit = float(concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.increase = increase
+        self.decrease = decrease
+        self.backoff = backoff
+
+        self.in_flight = 0
+        self.throttled = 0
+        self.paused_until = 0.0
+
+        self._tokens = self.burst
+        self._updated = monotonic()
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Block until a request may be made. Every call must be followed by a
+        call to :meth:`release`.
+        """
+
+        with self._condition:
+            while True:
+                now = monotonic()
+                if self.paused_until > now:
+                    self._condition.wait(self.paused_until - now)
+                    continue
+
+                if self.in_flight >= max(1, int(self.limit)):
+                    self._condition.wait()
+                    continue
+
+                if self.rate is not None:
+                    self._tokens = min(
+                        self.burst,
+                        self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens < 1:
+                        self._condition.wait((1 - self._tokens) / self.rate)
+                        continue
+                    self._tokens -= 1
+
+                self.in_flight += 1
+                return
+
+    def release(self):
+        """
+        Mark a request made after :meth:`acquire` as finished.
+        """
+
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _pause(self, now, seconds):
+        self.paused_until = max(self.paused_until, now + seconds)
+
+    def _congestion(self, now):
+        # Responses to requests that were in flight at the same time tend to
+        # report congestion together, which should only count once
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_concurrency, self.limit * self.decrease)
+
+    def observe(self, status_code, headers, latency):
+        """
+        Adjust the limits after a response.
+
+        :param status_code: HTTP status code of response
+        :param headers: Response headers
+        :param latency: Seconds it took to get the response
+        """
+
+        with self._condition:
+            now = monotonic()
+            if status_code == 429:
+                self.throttled += 1
+                retry_after = parse_retry_after(headers.get("Retry-After"))
+                self._pause(
+                    now, self.backoff if retry_after is None else retry_after)
+                self._congestion(now)
+            else:
+                remaining = _header_number(
+                    headers, "X-RateLimit-Remaining", "RateLimit-Remaining")
+                reset = _header_number(
+                    headers, "X-RateLimit-Reset", "RateLimit-Reset")
+                if remaining is not None and remaining <= 0 and reset:
+                    # Reset is either an epoch timestamp or a number of
+                    # seconds, depending on the convention used
+                    if reset > 1e9:
+                        reset -= time.time()
+                    self._pause(now, max(0.0, reset))
+
+                if self.latency_target is not None and \
+                        latency > self.latency_target:
+                    self._congestion(now)
+                elif status_code < 500:
+                    self.limit = min(
+                        self.max_concurrency,
+                        self.limit + self.increase / self.limit)
+
+            self._condition.notify_all()
+
+    @property
+    def stats(self):
+        """
+        Current state of the limiter.
+
+        :rtype: dict
+        """
+
+        with self._condition:
+            return {
+                "concurrency": self.limit,
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+                "paused": max(0.0, self.paused_until - monotonic()),
+            }
@@ -0,0 +1,181 @@
+import logging
+import threading
+
+from ._compat import monotonic
+from .model import DeliveryMethod, DeliveryTerms, TermsOfPayment
+
+__all__ = [
+    "ReferenceRegistry",
+]
+
+log = logging.getLogger(__name__)
+
+
+class ReferenceRegistry(object):
+    """
+    Shared instances of reference data, like terms of payment, which many
+    objects refer to by ID.
+
+    Each type is a lookup table which is loaded in full from the API the
+    first time it is needed, and loaded again when it is older than
+    ``ttl``. Objects decoded with the registry, see
+    :meth:`vismalib.model.VismaModel.from_json`, refer to the registry's
+    instances instead of getting instances of their own with only the ID
+    set. A company has only a handful of terms of payment, which means a
+    list of thousands of customers shares a handful of fully populated
+    objects.
+
+    Refreshes update the shared instances in place, so objects decoded
+    earlier see the new values as well. The instances must therefore be
+    treated as read-only.
+
+    A table is loaded by the first thread that needs it, without holding
+    any lock, while other threads get instances with only the ID set. These
+    are filled in when the table has been loaded. The same goes for tables
+    that fail to load, which are retried after ``retry_interval``. A lookup
+    table that can not be read thereby never makes decoding fail.
+
+        store = Store(session, registry=ReferenceRegistry())
+        customers = store.find(Customer)
+        customers[0].terms_of_payment.name
+
+    :param store: :class:`vismalib.Store` to load tables with. Set by the
+                  store when the registry is given to it. Without a store
+                  the tables only contain what is added with :meth:`load`.
+    :param types: Model classes to keep tables of. IDs of other types are
+                  still resolved to shared instances, but with only the ID
+                  set.
+    :param ttl: Number of seconds before a table is loaded again, ``None``
+                to never load it again
+    :param retry_interval: Number of seconds to wait before trying again
+                           when loading a table fails
+    """
+
+    def __init__(
+            self, store=None,
+            types=(TermsOfPayment, DeliveryMethod, DeliveryTerms), ttl=3600,
+            retry_interval=60):
+        self.store = store
+        self.types = frozenset(types)
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+
+        self._tables = {}
+        self._expires = {}
+        self._loading = set()
+        self._lock = threading.RLock()
+
+    def _expired(self, type):
+        expires = self._expires.get(type)
+        return expires is not None and expires <= monotonic()
+
+    def table(self, type):
+        """
+        Return the table of ``type``, which is loaded first if needed.
+
+        :return: Dictionary of IDs to shared instances
+        :rtype: dict
+        """
+
+        table = self._tables.get(type)
+        if table is None or self._expired(type):
+            table = self._refresh(type)
+        return table
+
+    def _refresh(self, type):
+        with self._lock:
+            table = self._tables.get(type)
+            if table is not None and not self._expired(type):
+                # Refreshed by another thread while waiting for the lock
+                return table
+
+            if self.store is None or type not in self.types:
+                table = self._tables.setdefault(type, {})
+                self._expires[type] = None
+                return table
+
+            if table is None:
+                # Instances with only the ID set are used until loaded
+                table = self._tables[type] = {}
+            if type in self._loading:
+                return table
+            self._loading.add(type)
+
+        try:
+            records = [
+                data for page in self.store.iter_pages(type, prefetch=0)
+                for data in page]
+        except Exception:
+            # Keep using the stale table, or instances with only the ID set,
+            # until the API recovers
+            log.warning(
+                "Failed to load %s, retrying in %s seconds", type.__name__,
+                self.retry_interval, exc_info=True)
+            with self._lock:
+                self._loading.discard(type)
+                self._expires[type] = monotonic() + self.retry_interval
+            return table
+
+        with self._lock:
+            self._loading.discard(type)
+            return self.load(type, records)
+
+    def load(self, type, records):
+        """
+        Replace the contents of the table of ``type`` with the given records.
+        Instances already in the table are updated in place.
+
+        :param type: Model class of records
+        :param records: Iterable of deserialized JSON objects
+        :return: The table
+        :rtype: dict
+        """
+
+        with self._lock:
+            old = self._tables.get(type, {})
+            table = {}
+            for data in records:
+                obj = old.get(data.get("Id"))
+                if obj is None:
+                    obj = type.from_json(data, track_changes=False)
+                else:
+                    obj.from_json(data, track_changes=False)
+                table[obj.id] = obj
+
+            self._tables[type] = table
+            self._expires[type] = None if self.ttl is None else \
+                monotonic() + self.ttl
+            return table
+
+    def resolve(self, type, id):
+        """
+        Return the shared instance of ``type`` with ``id``. IDs missing from
+        the table get a shared instance with only the ID set, until the
+        table is loaded again.
+
+        :param type: Model class
+        :param id: Visma's unique object ID
+        """
+
+        table = self._tables.get(type)
+        if table is None or self._expired(type):
+            table = self._refresh(type)
+
+        obj = table.get(id)
+        if obj is None:
+            with self._lock:
+                obj = table.get(id)
+                if obj is None:
+                    obj = type(id=id)
+                    table[id] = obj
+        return obj
+
+    def invalidate(self, type=None):
+        """
+        Load the table of ``type``, or of every type, again on next use.
+        """
+
+        with self._lock:
+            for key in [type] if type is not None else list(self._tables):
+                if key in self._tables:
+                    self._expires[key] = monotonic()
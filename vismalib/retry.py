@@ -0,0 +1,247 @@
+import random
+import threading
+
+from requests.exceptions import ConnectTimeout, ConnectionError, Timeout
+
+from ._compat import monotonic
+from .ratelimit import parse_retry_after
+
+__all__ = [
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "RetryPolicy",
+]
+
+
+class CircuitOpenError(IOError):
+    """
+    Raised instead of making a request while a :class:`CircuitBreaker` is
+    open.
+    """
+
+
+class RetryPolicy(object):
+    """
+    Decides which failed requests to retry, and how long to wait before
+    doing so.
+
+    Only idempotent methods are retried, since a request that fails with a
+    server error or a lost connection may still have been carried out. The
+    exception is a connection attempt that timed out, which never reached
+    the server and is retried for every method.
+
+    The wait grows exponentially with each attempt, and is picked at random
+    between zero and that bound ("full jitter"). This keeps many clients
+    that failed at the same time from retrying at the same time as well. A
+    ``Retry-After`` header is honoured if it asks for a longer wait.
+
+    :param total: Maximum number of retries of a request
+    :param backoff: Bound of the first wait in seconds, doubled on every
+                    attempt
+    :param max_backoff: Upper bound of any wait in seconds
+    :param statuses: HTTP status codes to retry
+    :param methods: HTTP methods to retry
+    """
+
+    def __init__(
+            self, total=3, backoff=0.5, max_backoff=30.0,
+            statuses=frozenset([429, 500, 502, 503, 504]),
+            methods=frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])):
+        self.total = total
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(method.upper() for method in methods)
+
+        self.retries = 0
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def _allow(self, attempt):
+        with self._lock:
+            if attempt >= self.total:
+                self.exhausted += 1
+                return False
+            self.retries += 1
+            return True
+
+    def retry_status(self, method, status_code, attempt):
+        """
+        Return ``True`` if a response with ``status_code`` should be retried.
+
+        :param method: HTTP method of request
+        :param status_code: HTTP status code of response
+        :param attempt: Number of retries made so far
+        """
+
+        if status_code not in self.statuses or \
+                method.upper() not in self.methods:
+            return False
+        return self._allow(attempt)
+
+    def retry_error(self, method, error, attempt):
+        """
+        Return ``True`` if a request that raised ``error`` should be retried.
+
+        :param method: HTTP method of request
+        :param error: Exception raised by request
+        :param attempt: Number of retries made so far
+        """
+
+        if isinstance(error, ConnectTimeout):
+            pass
+        elif not isinstance(error, (ConnectionError, Timeout)) or \
+                method.upper() not in self.methods:
+            return False
+        return self._allow(attempt)
+
+    def wait(self, attempt, retry_after=None):
+        """
+        Return the number of seconds to wait before the next attempt.
+
+        :param attempt: Number of retries made so far
+        :param retry_after: Value of the ``Retry-After`` header, if any
+        """
+
+        bound = min(self.max_backoff, self.backoff * 2 ** attempt)
+        wait = random.uniform(0, bound)
+
+        retry_after = parse_retry_after(retry_after)
+        if retry_after is not None:
+            wait = max(wait, min(retry_after, self.max_backoff))
+        return wait
+
+    @property
+    def stats(self):
+        """
+        Number of retries made and number of requests that failed after
+        running out of retries.
+
+        :rtype: dict
+        """
+
+        with self._lock:
+            return {"retries": self.retries, "exhausted": self.exhausted}
+
+
+class CircuitBreaker(object):
+    """
+    Fails requests fast while the API is down, instead of letting each of
+    them wait for a timeout.
+
+    The breaker opens after ``failure_threshold`` consecutive failures, and
+    every request then raises :class:`CircuitOpenError` without being sent.
+    After ``reset_timeout`` seconds a single trial request is let through
+    (the breaker is half open). If it succeeds the breaker closes again,
+    otherwise it stays open for another ``reset_timeout``.
+
+    Connection errors and server errors (5xx) count as failures. Other
+    responses, including ``429 Too Many Requests``, mean the API is up.
+
+    :param failure_threshold: Consecutive failures that open the breaker
+    :param reset_timeout: Seconds to wait before a trial request
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before(self):
+        """
+        Call before making a request.
+
+        :raise CircuitOpenError: If the request must not be made
+        """
+
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+
+            if self.state == self.OPEN and \
+                    monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial = False
+
+            if self.state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+
+            self.rejected += 1
+            raise CircuitOpenError(
+                "Circuit breaker is open after {} consecutive failures".format(
+                    self.failures))
+
+    def success(self):
+        """
+        Call after a request succeeded.
+        """
+
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+            self._trial = False
+
+    def failure(self):
+        """
+        Call after a request failed.
+        """
+
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and
+                    self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened += 1
+                self._opened_at = monotonic()
+            self._trial = False
+
+    def release(self):
+        """
+        Call after a request ended without a response or a connection error,
+        like when preparing it raised an exception. The outcome says nothing
+        about the API, so the state is kept, but a trial request may be made
+        again.
+        """
+
+        with self._lock:
+            self._trial = False
+
+    def record(self, status_code):
+        """
+        Call with the status code of a response to a request.
+        """
+
+        if status_code >= 500:
+            self.failure()
+        else:
+            self.success()
+
+    @property
+    def stats(self):
+        """
+        Current state, number of consecutive failures, number of times the
+        breaker has opened and number of requests rejected while open.
+
+        :rtype: dict
+        """
+
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
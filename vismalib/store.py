@@ -1,35 +1,226 @@
 import json
+import os
+import threading
+import time
 
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests import Response
 from requests.auth import HTTPBasicAuth
+from requests.exceptions import RequestException
+from requests.structures import CaseInsensitiveDict
+from oauthlib.oauth2 import WebApplicationClient
 from requests_oauthlib import OAuth2Session
 
-from ._compat import urljoin
-from .model import Customer
+from ._compat import monotonic, urljoin
+from .cache import HttpCacheEntry
+from .frame import ModelFrame
+from .metrics import timed
+from .streaming import iter_json_items
+from .transport import PoolAdapter
+from .utils import FileLock, atomic_write
 
 __all__ = [
+    "BatchResult",
     "FileTokenStorage",
     "VismaSession",
     "Store",
 ]
 
+def unpack_page(data):
+    """
+    Split a decoded list response into its items and the total number of
+    pages.
+
+    Paginated responses are wrapped in an envelope with ``Meta`` and ``Data``
+    keys, while older endpoints return a plain list. The number of pages is
+    ``None`` when the response does not say.
+
+    :param data: Deserialized JSON data from a list call
+    :return: Tuple of ``(items, total_pages)``
+    """
+
+    if isinstance(data, dict):
+        meta = data.get("Meta") or {}
+        return data.get("Data") or [], meta.get("TotalNumberOfPages")
+    return data, None
+
+
+class BatchResult(object):
+    """
+    Outcome of a single item of a batch operation.
+
+    :param key: Input item of the operation, such as an ID
+    :param value: Return value of the operation, ``None`` if it failed
+    :param error: Exception raised by the operation, ``None`` if successful
+    """
+
+    __slots__ = ("key", "value", "error")
+
+    def __init__(self, key, value=None, error=None):
+        self.key = key
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return "BatchResult({!r}, value={!r})".format(self.key, self.value)
+        return "BatchResult({!r}, error={!r})".format(self.key, self.error)
+
+
+def run_batch(func, items, max_workers, ordered=True):
+    """
+    Call ``func`` for every item on a thread pool and yield a
+    :class:`BatchResult` per item. Exceptions are captured in the result
+    instead of aborting the batch.
+
+    Items are consumed lazily, so no more than a few items per worker are
+    queued at any time.
+
+    :param func: Callable taking one item
+    :param items: Iterable of items
+    :param max_workers: Number of threads to use
+    :param ordered: Yield results in input order if ``True``, otherwise
+                    yield them as they complete.
+    :return: Generator of :class:`BatchResult`
+    """
+
+    def call(item):
+        try:
+            return BatchResult(item, func(item))
+        except Exception as e:
+            return BatchResult(item, error=e)
+
+    window = max_workers * 2
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque() if ordered else set()
+    try:
+        for item in items:
+            future = executor.submit(call, item)
+            if ordered:
+                pending.append(future)
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            else:
+                pending.add(future)
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+
+        while pending:
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+# Headers describing how a body was transferred, which are not kept for
+# cached bodies since they are stored decoded
+_TRANSFER_HEADERS = frozenset([
+    "content-encoding", "content-length", "transfer-encoding"])
+
+
+class CachedResponse(Response):
+    """
+    A response whose body is served from a :class:`vismalib.cache.HttpCache`.
+    ``json()`` returns the JSON decoded when the entry was first used, and
+    must not be modified.
+
+    :param response: Response received from the server, either a fresh
+                     ``200 OK`` or a ``304 Not Modified``
+    :param entry: Cache entry holding the body
+    """
+
+    def __init__(self, response, entry):
+        self.__dict__.update(response.__dict__)
+        self.entry = entry
+        self.from_cache = response.status_code == 304
+        self.status_code = 200
+        if self.from_cache:
+            # A 304 only carries the headers that may have changed since
+            # the entry was cached
+            headers = CaseInsensitiveDict(entry.headers)
+            headers.update(
+                (name, value) for name, value in response.headers.items()
+                if name.lower() not in _TRANSFER_HEADERS)
+            self.headers = headers
+            self.reason = "OK"
+        self._content = entry.content
+        self._content_consumed = True
+
+    def json(self, **kwargs):
+        return self.entry.json()
+
+
 class FileTokenStorage(object):
-    # TODO: The current approach is possibly not thread safe unless there is a
-    #       separate token storage, with its own file, per thread.
+    """
+    Keeps an OAuth2 token in a JSON file, which may be shared by many
+    threads and processes.
+
+    The token is kept in memory and the file is only read again when it has
+    been modified, which is detected by its modification time, size and
+    inode. Saves replace the file atomically while holding :attr:`lock`,
+    an exclusive lock between both threads and processes. Readers therefore
+    never see a partially written token.
+
+    :param path: Path of token file. The lock file is the same path with a
+                 ``.lock`` suffix.
+    """
+
     def __init__(self, path):
         self.path = path
+        self.lock = FileLock(path + ".lock")
+        self._state_lock = threading.Lock()
+        self._stat = None
+        self._token = None
 
-    def load(self):
+    def _file_stat(self):
         try:
-            with open(self.path, "r") as f:
-                return json.loads(f.read())
-        except IOError as e:
+            stat = os.stat(self.path)
+        except OSError as e:
             if e.errno == 2:
                 return None
             raise e
+        return stat.st_mtime, stat.st_size, stat.st_ino
+
+    def load(self):
+        stat = self._file_stat()
+        with self._state_lock:
+            if stat != self._stat:
+                token = None
+                if stat is not None:
+                    try:
+                        with open(self.path, "r") as f:
+                            token = json.loads(f.read())
+                    except IOError as e:
+                        if e.errno != 2:
+                            raise e
+                        stat = None
+                self._stat = stat
+                self._token = token
+
+            if self._token is None:
+                return None
+            return dict(self._token)
 
     def save(self, token):
-        with open(self.path, "w") as f:
-            f.write(json.dumps(token))
+        with self.lock:
+            atomic_write(self.path, json.dumps(token))
+            stat = self._file_stat()
+            with self._state_lock:
+                self._stat = stat
+                self._token = dict(token)
 
     def __bool__(self):
         return self.load() is not None
@@ -37,6 +228,31 @@ class FileTokenStorage(object):
     __nonzero__ = __bool__
 
 
+class _LockedClient(WebApplicationClient):
+    """
+    OAuth2 client whose token attributes are only read and written while
+    holding ``lock``, which keeps a thread from sending a half updated
+    token while another thread refreshes it.
+    """
+
+    def __init__(self, client_id, **kwargs):
+        self.lock = threading.RLock()
+        super(_LockedClient, self).__init__(client_id, **kwargs)
+
+    def add_token(self, *args, **kwargs):
+        with self.lock:
+            return super(_LockedClient, self).add_token(*args, **kwargs)
+
+    def populate_token_attributes(self, response):
+        with self.lock:
+            super(_LockedClient, self).populate_token_attributes(response)
+
+    def parse_request_body_response(self, *args, **kwargs):
+        with self.lock:
+            return super(_LockedClient, self).parse_request_body_response(
+                *args, **kwargs)
+
+
 class VismaSession(OAuth2Session):
     """
     A OAuth2 session for Visma eAccounting API.
@@ -68,19 +284,226 @@ class VismaSession(OAuth2Session):
                           in its token argument.
     :param base_url: Base URL to use for all HTTP(S) requests unless an absolute
                      URI is provided.
+    :param http_cache: Optional :class:`vismalib.cache.HttpCache` used to
+                       revalidate GET requests instead of downloading
+                       unchanged responses again.
+    :param rate_limiter: Optional :class:`vismalib.ratelimit.RateLimiter`
+                         which every request waits for. Share it between
+                         sessions using the same API quota.
+    :param pool_connections: Number of hosts to keep connection pools for
+    :param pool_maxsize: Maximum number of connections to keep per host.
+                         Should be at least the number of threads sharing
+                         the session.
+    :param pool_block: Wait for a free connection instead of opening one
+                       beyond ``pool_maxsize``
+    :param timeout: Default timeout in seconds for requests that do not
+                    specify one, or a ``(connect, read)`` tuple
+    :param keepalive: Seconds a pooled connection is idle before TCP
+                      keep-alive probes are sent, ``None`` to disable
+    :param token_storage: Optional :class:`FileTokenStorage`, or any object
+                          with the same interface, shared with other
+                          sessions and processes using the same
+                          credentials. The token is loaded from it if
+                          ``token`` is not given, and refreshed tokens are
+                          saved to it.
+    :param refresh_margin: Refresh the token in the background this many
+                           seconds before it expires, so that no request
+                           has to wait for a refresh. ``None`` disables
+                           proactive refresh. Requires
+                           ``auto_refresh_url``. At most half of the
+                           token's lifetime is used, since a longer margin
+                           would refresh the token over and over.
+    :param metrics: Optional :class:`vismalib.metrics.Metrics` which records
+                    the latency, status and size of every request.
+    :param transport: Optional transport adapter to send requests through,
+                      like :class:`vismalib.transport.RecordingAdapter` or
+                      :class:`vismalib.transport.ReplayAdapter`. The pool
+                      parameters only apply to the default
+                      :class:`vismalib.transport.PoolAdapter`.
+
+    Token refreshes are coalesced. Only one thread refreshes at a time, and
+    threads that were waiting for it use its result instead of refreshing
+    again. With a ``token_storage`` the same goes for every process sharing
+    it, since refreshes are made while holding its lock and a token already
+    refreshed by another process is picked up from it.
+
+    A session is safe to share between threads. Token state is only updated
+    while holding a lock, which means every request carries either the old
+    or the new token in full.
     """
 
     def __init__(
             self, client_id=None, client_secret=None, auto_refresh_url=None,
             auto_refresh_kwargs=None, scope=None, redirect_uri=None, token=None,
-            state=None, token_updater=None, base_url=None):
+            state=None, token_updater=None, base_url=None, http_cache=None,
+            rate_limiter=None, pool_connections=10, pool_maxsize=10,
+            pool_block=False, timeout=None, keepalive=60, token_storage=None,
+            refresh_margin=None, metrics=None, transport=None):
         self.base_url = base_url
+        self.http_cache = http_cache
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self.timeout = timeout
         self.client_secret = client_secret
         self.auth = HTTPBasicAuth(client_id, client_secret)
+        self.token_storage = token_storage
+        self.refresh_margin = refresh_margin
+        if refresh_margin is not None and refresh_margin < 0:
+            raise ValueError("refresh_margin must not be negative")
+        self._refresh_lock = threading.Lock()
+        self._refresh_timer = None
+        self._timer_lock = threading.Lock()
+        self._closed = False
+
+        if token_storage is not None:
+            if token is None:
+                token = token_storage.load()
+            if token_updater is None:
+                # Refreshed tokens are saved to the storage by refresh_token
+                token_updater = lambda token: None
 
         super(VismaSession, self).__init__(
-            client_id, None, auto_refresh_url, auto_refresh_kwargs, scope,
-            redirect_uri, token, state, token_updater)
+            client_id, _LockedClient(client_id, token=token),
+            auto_refresh_url, auto_refresh_kwargs, scope, redirect_uri, token,
+            state, token_updater)
+
+        self.adapter = transport
+        if transport is None:
+            self.adapter = PoolAdapter(
+                pool_connections, pool_maxsize, pool_block,
+                keepalive=keepalive)
+        self.mount("https://", self.adapter)
+        self.mount("http://", self.adapter)
+        self._schedule_refresh()
+
+    @property
+    def token(self):
+        return getattr(self._client, "token", None)
+
+    @token.setter
+    def token(self, value):
+        with self._client.lock:
+            self._client.token = value
+            self._client.populate_token_attributes(value)
+        self._schedule_refresh()
+
+    def _margin(self, token):
+        # Margin of the given token, which leaves at least half of its
+        # lifetime before the next proactive refresh
+        margin = self.refresh_margin or 0
+        lifetime = (token or {}).get("expires_in")
+        if lifetime is not None:
+            margin = min(margin, float(lifetime) / 2)
+        return margin
+
+    def _expires_within(self, token, seconds):
+        expires_at = (token or {}).get("expires_at")
+        return expires_at is not None and expires_at - time.time() <= seconds
+
+    def _schedule_refresh(self):
+        # Called whenever the token changes, which may happen in __init__
+        # before the attributes below have been set
+        if getattr(self, "auto_refresh_url", None) is None or \
+                self.refresh_margin is None:
+            return
+
+        # Tokens may be set by several threads at once, and each timer must
+        # be cancelled before it is replaced
+        with self._timer_lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+
+            token = self.token or {}
+            expires_at = token.get("expires_at")
+            if expires_at is None or self._closed:
+                return
+
+            delay = max(1.0, expires_at - self._margin(token) - time.time())
+            timer = threading.Timer(delay, self._proactive_refresh)
+            timer.daemon = True
+            self._refresh_timer = timer
+            timer.start()
+
+    def _proactive_refresh(self):
+        try:
+            token = self.refresh_token(
+                self.auto_refresh_url, auth=self.auth,
+                **(self.auto_refresh_kwargs or {}))
+            if self.token_updater:
+                self.token_updater(token)
+        except Exception:
+            # The token is refreshed on expiry by the next request instead
+            pass
+
+    def _sync_token(self):
+        # Pick up a token refreshed by another session or process. A token
+        # refreshed by this session is set before it is saved, and must not
+        # be replaced by the older one in storage in the meantime.
+        stored = self.token_storage.load()
+        if stored is None:
+            return
+        with self._client.lock:
+            current = self.token or {}
+            if stored.get("access_token") == current.get("access_token"):
+                return
+            if current.get("expires_at") is not None and \
+                    stored.get("expires_at") is not None and \
+                    stored["expires_at"] < current["expires_at"]:
+                return
+            self.token = stored
+
+    def refresh_token(self, token_url, refresh_token=None, **kwargs):
+        """
+        Fetch a new access token using a refresh token, unless another
+        thread or process has already done so while waiting for the lock.
+        See :meth:`requests_oauthlib.OAuth2Session.refresh_token` for
+        arguments.
+
+        :return: New token dictionary
+        """
+
+        stale = (self.token or {}).get("access_token")
+        with self._refresh_lock:
+            if (self.token or {}).get("access_token") != stale:
+                return self.token
+
+            if self.token_storage is None:
+                return super(VismaSession, self).refresh_token(
+                    token_url, refresh_token, **kwargs)
+
+            with self.token_storage.lock:
+                # The refresh token may have been used and replaced by
+                # another process, in which case only its new token is valid
+                self._sync_token()
+                current = self.token or {}
+                if current.get("access_token") != stale and \
+                        not self._expires_within(
+                            current, self._margin(current)):
+                    return current
+
+                token = super(VismaSession, self).refresh_token(
+                    token_url, refresh_token, **kwargs)
+                self.token_storage.save(token)
+                return token
+
+    def close(self):
+        with self._timer_lock:
+            self._closed = True
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+        super(VismaSession, self).close()
+
+    def pool_stats(self):
+        """
+        Return the utilization of the connection pool of every host. See
+        :meth:`vismalib.transport.PoolAdapter.pool_stats`.
+
+        :rtype: [dict]
+        """
+
+        return getattr(self.adapter, "pool_stats", list)()
 
     def request(
             self, method, url, data=None, headers=None, withhold_token=False,
@@ -95,10 +518,107 @@ class VismaSession(OAuth2Session):
         if client_secret is None:
             client_secret = self.client_secret
 
-        return super(VismaSession, self).request(
+        if self.timeout is not None:
+            kwargs.setdefault("timeout", self.timeout)
+
+        if self.token_storage is not None and not withhold_token:
+            self._sync_token()
+
+        cache_key = None
+        entry = None
+        if self.http_cache is not None and method.upper() == "GET" \
+                and not kwargs.get("stream"):
+            cache_key = self.http_cache.key(url, kwargs.get("params"), data)
+            entry = self.http_cache.get(cache_key)
+            if entry is not None:
+                headers = dict(headers or {}, **entry.validators())
+
+        response = self._send(
             method, url, data, headers, withhold_token, client_id,
             client_secret, **kwargs)
 
+        if cache_key is not None:
+            response = self._cache_response(cache_key, entry, response)
+
+        return response
+
+    def _send(self, method, url, data, headers, withhold_token, *args,
+              **kwargs):
+        send = super(VismaSession, self).request
+        if self.rate_limiter is None and self.metrics is None:
+            return send(
+                method, url, data, headers, withhold_token, *args, **kwargs)
+
+        # Token requests are made while the request that needed a new token
+        # holds its slot, and would wait for it forever if they needed one
+        # of their own
+        limiter = None if withhold_token else self.rate_limiter
+        if limiter is not None:
+            with timed(self.metrics, "rate_limit_wait_seconds"):
+                limiter.acquire()
+
+        start = monotonic()
+        try:
+            response = send(
+                method, url, data, headers, withhold_token, *args, **kwargs)
+        except Exception:
+            if self.metrics is not None:
+                self.metrics.observe(
+                    "request_seconds", monotonic() - start,
+                    method=method.upper(), status="error")
+            raise
+        finally:
+            if limiter is not None:
+                limiter.release()
+        latency = monotonic() - start
+
+        if limiter is not None:
+            limiter.observe(
+                response.status_code, response.headers, latency)
+
+        if self.metrics is not None:
+            self._observe(method.upper(), response, latency, kwargs)
+
+        return response
+
+    def _observe(self, method, response, latency, kwargs):
+        self.metrics.observe(
+            "request_seconds", latency, method=method,
+            status=str(response.status_code))
+
+        body = response.request.body if response.request else None
+        if body:
+            self.metrics.observe("request_bytes", len(body), method=method)
+
+        # The size on the wire is preferred, but streamed responses must not
+        # be read here
+        size = response.headers.get("Content-Length")
+        if size is not None:
+            size = int(size)
+        elif not kwargs.get("stream"):
+            size = len(response.content)
+        if size is not None:
+            self.metrics.observe("response_bytes", size, method=method)
+
+    def _cache_response(self, key, entry, response):
+        if response.status_code == 304 and entry is not None:
+            self.http_cache.mark_not_modified()
+            return CachedResponse(response, entry)
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code != 200 or (
+                etag is None and last_modified is None):
+            self.http_cache.invalidate(key)
+            return response
+
+        entry = HttpCacheEntry(
+            response.content, etag, last_modified, [
+                (name, value) for name, value in response.headers.items()
+                if name.lower() not in _TRANSFER_HEADERS])
+        self.http_cache.put(key, entry)
+        return CachedResponse(response, entry)
+
 
 class Store(object):
     """
@@ -112,31 +632,275 @@ class Store(object):
                    but the only requirement is that it manages authentication
                    and provide a method ``request`` which the same arguments
                    as Requests' ``request`` method.
+    :param cache: Optional :class:`vismalib.cache.ObjectCache` used by
+                  :meth:`get` and kept up to date by writes.
+    :param mirror: Optional :class:`vismalib.mirror.SqliteMirror`. When
+                   given, :meth:`find` queries the mirror instead of the API
+                   for the types it holds.
+    :param retry: Optional :class:`vismalib.retry.RetryPolicy` for requests
+                  that fail with a connection error or a retryable status.
+    :param breaker: Optional :class:`vismalib.retry.CircuitBreaker` which
+                    makes requests fail fast while the API is down.
+    :param metrics: Optional :class:`vismalib.metrics.Metrics` which records
+                    the time of API calls, JSON parsing and decoding per
+                    model type and operation.
+    :param registry: Optional :class:`vismalib.registry.ReferenceRegistry`.
+                     When given, references of decoded objects are shared
+                     instances from the registry, which loads its tables
+                     through this store unless it has a store already.
     """
 
-    def __init__(self, client):
+    def __init__(self, client, cache=None, mirror=None, retry=None,
+                 breaker=None, metrics=None, registry=None):
         self.client = client
+        self.cache = cache
+        self.mirror = mirror
+        self.retry = retry
+        self.breaker = breaker
+        self.metrics = metrics
+        self.registry = registry
+
+        if registry is not None and registry.store is None:
+            registry.store = self
+
+    def _timed(self, name, type, operation):
+        return timed(
+            self.metrics, name, type=type.__name__, operation=operation)
+
+    def _request(self, type, operation, **kwargs):
+        with self._timed("call_seconds", type, operation):
+            return self._call(**kwargs)
+
+    def _json(self, response, type, operation):
+        with self._timed("json_seconds", type, operation):
+            return response.json()
+
+    def _call(self, **kwargs):
+        # Make a request through the client, retrying according to the
+        # retry policy and checking with the circuit breaker first
+        method = kwargs.get("method", "GET")
+        attempt = 0
+        while True:
+            if self.breaker is not None:
+                self.breaker.before()
 
-    def find(self, type, **params):
+            try:
+                response = self.client.request(**kwargs)
+            except RequestException as e:
+                if self.breaker is not None:
+                    self.breaker.failure()
+                if self.retry is None or \
+                        not self.retry.retry_error(method, e, attempt):
+                    raise
+                wait = self.retry.wait(attempt)
+            except BaseException:
+                # Without a response nothing is known about the API, but the
+                # trial request of a half open breaker must be given back
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+            else:
+                if self.breaker is not None:
+                    self.breaker.record(response.status_code)
+                if self.retry is None or not self.retry.retry_status(
+                        method, response.status_code, attempt):
+                    return response
+                wait = self.retry.wait(
+                    attempt, response.headers.get("Retry-After"))
+                response.close()
+
+            attempt += 1
+            time.sleep(wait)
+
+    def find(self, type, lazy=False, as_frame=False, **params):
         """
         Return a list of objects of the given ``type`` which matches
         the filters provided as keyyword arguments.
 
         :param type: Class to list
+        :param lazy: Decode the fields of each object on first access. This
+                     is much faster when only a few fields of every object
+                     are used.
+        :param as_frame: Return a :class:`vismalib.frame.ModelFrame` with
+                         the result in columns instead of a list of objects.
         :param  **params: Keyword arguments to pass on to
                           ``type._visma_list(**params)``.
         :return: List of type ``type`` instances
         :rtype: [type]
         """
-        response = self.client.request(**type._visma_list(**params))
+
+        if self.mirror is not None and self.mirror.has(type):
+            if as_frame:
+                return ModelFrame.from_json(
+                    type, self.mirror.find_json(type, **params))
+
+            decode = type.from_json
+            registry = self.registry
+            return [
+                decode(data, lazy, registry)
+                for data in self.mirror.find_json(type, **params)]
+
+        response = self._request(
+            type, "find", **type._visma_list(**params))
 
         if response.status_code != 200:
             raise IOError(
-                "Failed to list {name}': '{content}'".format(
+                "Failed to list {name}: '{content}'".format(
                     name=type.__name__,
-                    content=request.content))
+                    content=response.content))
+
+        items = self._json(response, type, "find")
+
+        with self._timed("decode_seconds", type, "find"):
+            if as_frame:
+                return ModelFrame.from_json(type, items)
+
+            decode = type.from_json
+            registry = self.registry
+            return [decode(data, lazy, registry) for data in items]
+
+    def iter_find(
+            self, type, page_size=100, prefetch=2, query=None, lazy=False,
+            **params):
+        """
+        Iterate over objects of the given ``type`` which matches the filters
+        provided as keyword arguments, one page at a time.
+
+        Pages are requested in the background while the current page is
+        consumed. At most ``prefetch`` pages are kept in flight, which keeps
+        memory usage bounded regardless of the size of the result.
+
+        :param type: Class to list
+        :param page_size: Number of objects to request per page
+        :param prefetch: Number of pages to fetch ahead of the one being
+                         consumed. ``0`` disables background fetching.
+        :param query: Optional dictionary of query string parameters, like
+                      ``$filter``, to include in every request.
+        :param lazy: Decode the fields of each object on first access
+        :param  **params: Keyword arguments to pass on to
+                          ``type._visma_list(**params)``.
+        :return: Generator of ``type`` instances
+        """
+
+        decode = type.from_json
+        registry = self.registry
+        pages = self.iter_pages(type, page_size, prefetch, query, **params)
+        for page in pages:
+            for data in page:
+                yield decode(data, lazy, registry)
+
+    def stream_find(self, type, lazy=False, chunk_size=64 * 1024, **params):
+        """
+        Iterate over objects of the given ``type`` which matches the filters
+        provided as keyword arguments, decoding each object as soon as it
+        has been downloaded.
+
+        Unlike :meth:`find` the response is never held in memory as a whole.
+        Only the object being decoded and one chunk of the response are.
+
+        :param type: Class to list
+        :param lazy: Decode the fields of each object on first access
+        :param chunk_size: Number of bytes to read from the response at a
+                           time
+        :param  **params: Keyword arguments to pass on to
+                          ``type._visma_list(**params)``.
+        :return: Generator of ``type`` instances
+        """
+
+        response = self._request(
+            type, "stream_find", stream=True, **type._visma_list(**params))
+        try:
+            if response.status_code != 200:
+                raise IOError(
+                    "Failed to list {name}: '{content}'".format(
+                        name=type.__name__,
+                        content=response.content))
 
-        return [type.from_json(data) for data in response.json()]
+            decode = type.from_json
+            registry = self.registry
+            for data in iter_json_items(response.iter_content(chunk_size)):
+                yield decode(data, lazy, registry)
+        finally:
+            response.close()
+
+    def fetch_page(self, type, page, page_size, query=None, **params):
+        """
+        Fetch a single page of a list of ``type``.
+
+        :param type: Class to list
+        :param page: Page number, starting at 1
+        :param page_size: Number of objects per page
+        :param query: Optional dictionary of query string parameters
+        :param  **params: Keyword arguments to pass on to
+                          ``type._visma_list(**params)``.
+        :return: Tuple of a list of deserialized JSON objects and the total
+                 number of pages, or ``None`` if unknown
+        """
+
+        response = self._request(
+            type, "fetch_page",
+            **type._visma_list_page(page, page_size, query, **params))
+
+        if response.status_code != 200:
+            raise IOError(
+                "Failed to list page {page} of {name}: '{content}'".format(
+                    page=page,
+                    name=type.__name__,
+                    content=response.content))
+
+        return unpack_page(self._json(response, type, "fetch_page"))
+
+    def iter_pages(
+            self, type, page_size=100, prefetch=2, query=None, **params):
+        """
+        Iterate over the raw pages of a list of ``type``. This is the
+        undecoded version of :meth:`iter_find`.
+
+        :return: Generator of lists of deserialized JSON objects
+        """
+
+        def fetch(page):
+            return self.fetch_page(type, page, page_size, query, **params)
+
+        def is_last(page, items, total_pages):
+            if total_pages is None:
+                return len(items) < page_size
+            return page >= total_pages
+
+        if prefetch < 1:
+            page = 1
+            while True:
+                items, total_pages = fetch(page)
+                yield items
+                if is_last(page, items, total_pages):
+                    return
+                page += 1
+
+        executor = ThreadPoolExecutor(max_workers=prefetch)
+        pending = deque([(1, executor.submit(fetch, 1))])
+        try:
+            while pending:
+                page, future = pending.popleft()
+                items, total_pages = future.result()
+
+                if is_last(page, items, total_pages):
+                    # Pages requested speculatively past the end are discarded
+                    for _, future in pending:
+                        future.cancel()
+                    pending.clear()
+                else:
+                    next_page = pending[-1][0] + 1 if pending else page + 1
+                    while len(pending) < prefetch and (
+                            total_pages is None or next_page <= total_pages):
+                        pending.append(
+                            (next_page, executor.submit(fetch, next_page)))
+                        next_page += 1
+
+                yield items
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
 
     def get(self, type, id):
         """
@@ -148,16 +912,49 @@ class Store(object):
         :rtype: ``type`` or None
         """
 
-        response = self.client.request(**type._visma_get(id))
+        if self.cache is not None:
+            obj = self.cache.get(type, id, self.registry)
+            if obj is not None:
+                return obj
+
+        response = self._request(type, "get", **type._visma_get(id))
 
         if response.status_code != 200:
             raise IOError(
                 "Failed to get {name} with ID '{id}': '{content}'".format(
                     name=type.__name__,
                     id=id,
-                    content=request.content))
+                    content=response.content))
+
+        data = self._json(response, type, "get")
+        with self._timed("decode_seconds", type, "get"):
+            obj = type.from_json(data, registry=self.registry)
 
-        return type.from_json(response.json())
+        if self.cache is not None:
+            obj = self.cache.put(type, id, obj, data, self.registry)
+
+        return obj
+
+    def get_many(self, type, ids, max_workers=8, ordered=True):
+        """
+        Fetch many objects of ``type`` concurrently.
+
+        Requests are made on a thread pool using the same client, and thereby
+        the same connection pool, as :meth:`get`. A failure to fetch one ID
+        does not affect the others; it is reported through the
+        :attr:`BatchResult.error` of that ID instead.
+
+        :param type: Class of get
+        :param ids: Iterable of Visma's unique object IDs
+        :param max_workers: Maximum number of concurrent requests
+        :param ordered: Yield results in the same order as ``ids`` if
+                        ``True``, otherwise yield them as they complete.
+        :return: Generator of :class:`BatchResult` with the ID as ``key``
+                 and the ``type`` instance as ``value``
+        """
+
+        return run_batch(
+            lambda id: self.get(type, id), ids, max_workers, ordered)
 
     def add(self, obj):
         """
@@ -166,13 +963,134 @@ class Store(object):
         :param obj: Object to store
         """
 
-        response = self.client.request(**obj._visma_add())
+        response = self._request(
+            obj.__class__, "add", **obj._visma_add())
 
         if response.status_code != 200:
             raise IOError(
-                "Failed to add {name} with ID '{id}': '{content}'".format(
+                "Failed to add {name}: '{content}'".format(
                     name=obj.__class__.__name__,
-                    id=id,
-                    content=request.content))
+                    content=response.content))
+
+        data = self._json(response, obj.__class__, "add")
+        with self._timed("decode_seconds", obj.__class__, "add"):
+            obj.from_json(data, registry=self.registry)
+        self._cache_put(obj, data)
+
+    def update(self, obj, force=False):
+        """
+        Save the changes of the given object to Visma. The object is updated
+        in place with the values returned by the API.
+
+        No request is made if no field has changed since the object was
+        decoded, see :meth:`vismalib.model.VismaModel.changed_fields`.
+
+        :param obj: Object to update
+        :param force: Update even if no field has changed
+        :return: ``True`` if the object was updated, ``False`` if skipped
+        :rtype: bool
+        """
+
+        if not force and not obj.has_changed():
+            return False
+
+        response = self._request(
+            obj.__class__, "update", **obj._visma_update())
+
+        if response.status_code != 200:
+            raise IOError(
+                "Failed to update {name} with ID '{id}': '{content}'".format(
+                    name=obj.__class__.__name__,
+                    id=getattr(obj, obj.__visma_key__),
+                    content=response.content))
+
+        data = self._json(response, obj.__class__, "update")
+        with self._timed("decode_seconds", obj.__class__, "update"):
+            obj.from_json(data, registry=self.registry)
+        self._cache_put(obj, data)
+        return True
+
+    def remove(self, obj):
+        """
+        Remove the given object from Visma.
+
+        :param obj: Object to remove
+        """
+
+        response = self._request(
+            obj.__class__, "remove", **obj._visma_remove())
+
+        if response.status_code not in (200, 204):
+            raise IOError(
+                "Failed to remove {name} with ID '{id}': '{content}'".format(
+                    name=obj.__class__.__name__,
+                    id=getattr(obj, obj.__visma_key__),
+                    content=response.content))
+
+        self._cache_invalidate(obj)
+
+    def _write_many(self, write, objs, max_workers, ordered):
+        def call(obj):
+            write(obj)
+            return obj
+        return run_batch(call, objs, max_workers, ordered)
+
+    def add_many(self, objs, max_workers=8, ordered=True):
+        """
+        Add many objects concurrently. Each object is updated in place, like
+        by :meth:`add`.
+
+        A failure to add one object does not affect the others; it is
+        reported through the :attr:`BatchResult.error` of that object
+        instead. Note that adds are never retried by a retry policy, since
+        they are not idempotent.
+
+        :param objs: Iterable of objects to add
+        :param max_workers: Maximum number of concurrent requests
+        :param ordered: Yield results in the same order as ``objs`` if
+                        ``True``, otherwise yield them as they complete.
+        :return: Generator of :class:`BatchResult` with the object as both
+                 ``key`` and ``value``
+        """
+
+        return self._write_many(self.add, objs, max_workers, ordered)
+
+    def update_many(self, objs, max_workers=8, ordered=True):
+        """
+        Update many objects concurrently. See :meth:`add_many`. Objects
+        without changes are skipped, like by :meth:`update`.
+
+        :return: Generator of :class:`BatchResult` with the object as
+                 ``key`` and the return value of :meth:`update` as
+                 ``value``, which is ``False`` for skipped objects
+        """
+
+        return run_batch(self.update, objs, max_workers, ordered)
+
+    def remove_many(self, objs, max_workers=8, ordered=True):
+        """
+        Remove many objects concurrently. See :meth:`add_many`.
+        """
+
+        return self._write_many(self.remove, objs, max_workers, ordered)
+
+    def _cache_put(self, obj, data):
+        if obj.__visma_key__ is None:
+            return
+
+        if self.cache is not None:
+            self.cache.put(
+                obj.__class__, getattr(obj, obj.__visma_key__), obj, data,
+                self.registry)
+
+        if self.mirror is not None and self.mirror.has(obj.__class__):
+            self.mirror.load(obj.__class__, [data])
+
+    def _cache_invalidate(self, obj):
+        id = getattr(obj, obj.__visma_key__)
+
+        if self.cache is not None:
+            self.cache.invalidate(obj.__class__, id)
 
-        obj.from_json(response.json())
+        if self.mirror is not None and self.mirror.has(obj.__class__):
+            self.mirror.remove(obj.__class__, [id])
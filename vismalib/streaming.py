@@ -0,0 +1,146 @@
+import codecs
+import re
+
+from json import JSONDecoder
+
+__all__ = [
+    "iter_json_items",
+]
+
+_whitespace = re.compile(r"[ \t\n\r]*")
+_delimiters = frozenset(",:]} \t\n\r")
+
+
+class _Reader(object):
+    """
+    Buffered JSON tokenizer on top of an iterable of byte chunks. Only as
+    much data as is needed to decode the next value is read.
+    """
+
+    # Consumed data is dropped from the buffer once it grows beyond this
+    compact_size = 64 * 1024
+
+    def __init__(self, chunks, encoding):
+        self.chunks = iter(chunks)
+        self.text = codecs.getincrementaldecoder(encoding)()
+        self.decoder = JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+
+        if self.pos > self.compact_size:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+
+        for chunk in self.chunks:
+            if chunk:
+                self.buffer += self.text.decode(chunk)
+                return True
+
+        self.buffer += self.text.decode(b"", final=True)
+        self.eof = True
+        return True
+
+    def peek(self):
+        # Return the next non-whitespace character without consuming it, or
+        # None at the end of the input
+        while True:
+            self.pos = _whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError("Expected '{}' at position {}, found {!r}".format(
+                char, self.pos, found))
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                # The value is incomplete unless all data has been read
+                if not self.fill():
+                    raise
+                continue
+
+            # A number may continue in the next chunk, which is why a value
+            # is only complete when it is followed by a delimiter
+            if not self.eof and (
+                    end == len(self.buffer) or
+                    self.buffer[end] not in _delimiters):
+                self.fill()
+                continue
+
+            self.pos = end
+            return value
+
+
+def iter_json_items(chunks, key="Data", meta=None, encoding="utf-8"):
+    """
+    Incrementally decode the items of a JSON array as the data arrives.
+
+    The array is either the top level value, or the member ``key`` of a top
+    level object, like the ``Data`` member of Visma's paginated responses.
+    Only about one item is kept in memory at a time.
+
+    :param chunks: Iterable of byte strings, like
+                   :meth:`requests.Response.iter_content`
+    :param key: Member holding the array when the top level value is an
+                object
+    :param meta: Optional dictionary which is updated with the other members
+                 of a top level object as they are decoded
+    :param encoding: Encoding of data
+    :return: Generator of deserialized JSON items
+    :raise ValueError: If the data is not valid JSON of the expected shape
+    """
+
+    reader = _Reader(chunks, encoding)
+
+    if reader.peek() == "{":
+        reader.expect("{")
+        while reader.peek() != "}":
+            name = reader.value()
+            reader.expect(":")
+            if name == key:
+                for item in _iter_array(reader):
+                    yield item
+            else:
+                value = reader.value()
+                if meta is not None:
+                    meta[name] = value
+
+            if reader.peek() == "}":
+                break
+            reader.expect(",")
+        reader.expect("}")
+    else:
+        for item in _iter_array(reader):
+            yield item
+
+    if reader.peek() is not None:
+        raise ValueError(
+            "Unexpected data at position {}".format(reader.pos))
+
+
+def _iter_array(reader):
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.expect("]")
+        return
+
+    while True:
+        yield reader.value()
+        if reader.peek() == "]":
+            reader.expect("]")
+            return
+        reader.expect(",")
@@ -0,0 +1,395 @@
+import hashlib
+import json
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.exceptions import RequestException
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.connection import HTTPConnection
+
+from ._compat import (
+    monotonic, parse_qsl, urlencode, urlsplit, urlunsplit)
+
+__all__ = [
+    "PoolAdapter",
+    "RecordingAdapter",
+    "ReplayAdapter",
+    "ReplayMissError",
+]
+
+
+def keepalive_socket_options(idle, interval=None, count=4):
+    """
+    Return socket options enabling TCP keep-alive, in addition to the
+    default options of urllib3. Options that the platform does not support
+    are left out.
+
+    :param idle: Seconds a connection is idle before the first probe
+    :param interval: Seconds between probes. Defaults to a quarter of
+                     ``idle``.
+    :param count: Number of unanswered probes before the connection is
+                  considered dead
+    """
+
+    if interval is None:
+        interval = max(1, idle // 4)
+
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    for name, value in (
+            ("TCP_KEEPIDLE", idle),
+            ("TCP_KEEPINTVL", interval),
+            ("TCP_KEEPCNT", count)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+class PoolAdapter(HTTPAdapter):
+    """
+    Transport adapter with an explicitly sized connection pool and TCP
+    keep-alive on pooled connections.
+
+    Idle connections in a pool are otherwise silently dropped by firewalls
+    and load balancers, which shows up as connection resets on the next
+    request. Keep-alive probes prevent that.
+
+    The pool is thread safe, which means one adapter, and the session it is
+    mounted on, can be shared by many threads. ``pool_maxsize`` should be at
+    least the number of threads making requests to the same host. Otherwise
+    connections are discarded after use and new ones are opened, or threads
+    wait for a free connection if ``pool_block`` is ``True``.
+
+    :param pool_connections: Number of hosts to keep pools for
+    :param pool_maxsize: Maximum number of connections to keep per host
+    :param pool_block: Wait for a free connection instead of opening one
+                       beyond ``pool_maxsize``
+    :param max_retries: Passed on to
+                        :class:`requests.adapters.HTTPAdapter`
+    :param keepalive: Seconds a connection is idle before keep-alive probes
+                      are sent, ``None`` to disable keep-alive
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + ["keepalive"]
+
+    def __init__(
+            self, pool_connections=10, pool_maxsize=10, pool_block=False,
+            max_retries=0, keepalive=60):
+        self.keepalive = keepalive
+        super(PoolAdapter, self).__init__(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            max_retries=max_retries, pool_block=pool_block)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.keepalive is not None:
+            kwargs["socket_options"] = keepalive_socket_options(
+                self.keepalive)
+        super(PoolAdapter, self).init_poolmanager(*args, **kwargs)
+
+    def pool_stats(self):
+        """
+        Return the utilization of the pool of every host.
+
+        Each item is a dictionary with the ``host``, the ``maxsize`` of its
+        pool, the number of connections ``in_use`` and ``idle`` right now,
+        and the total number of ``connections`` opened and ``requests`` made
+        through the pool.
+
+        :rtype: [dict]
+        """
+
+        pools = self.poolmanager.pools
+        stats = []
+        for key in pools.keys():
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+
+            queue = pool.pool
+            if queue is None:
+                continue
+
+            stats.append({
+                "host": "{}://{}:{}".format(pool.scheme, pool.host, pool.port),
+                "maxsize": queue.maxsize,
+                "in_use": queue.maxsize - queue.qsize(),
+                "idle": sum(
+                    1 for conn in list(queue.queue) if conn is not None),
+                "connections": pool.num_connections,
+                "requests": pool.num_requests,
+            })
+        return stats
+
+
+# An archive is a header followed by records. Each record is a fixed size
+# header, JSON encoded metadata and the response body, which is optionally
+# compressed with zlib. Records are only ever appended. The record header
+# contains a hash of the request key, which lets the archive be indexed
+# without parsing the metadata of every record.
+_MAGIC = b"VISMARC2"
+_RECORD = struct.Struct("<BIIIdd")
+_COMPRESSED = 1
+
+# Python 2 has no arrays of unsigned long long
+try:
+    array("Q")
+    _OFFSET_TYPE = "Q"
+except ValueError:
+    _OFFSET_TYPE = "L"
+
+# The body is stored decoded, which makes these headers invalid on replay
+_SKIPPED_HEADERS = frozenset([
+    "content-encoding", "content-length", "transfer-encoding"])
+
+
+def request_key(method, url, body=None):
+    """
+    Return the key used to match a request to a recorded response. Query
+    parameters are sorted and the body is hashed.
+
+    :param method: HTTP method
+    :param url: Full URL of request
+    :param body: Body of request as bytes or a string, if any
+    :rtype: str
+    """
+
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    key = "{} {}".format(method.upper(), urlunsplit(
+        (parts.scheme, parts.netloc, parts.path, query, "")))
+    if body:
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+        key += " " + hashlib.sha1(body).hexdigest()
+    return key
+
+
+def _key_hash(key):
+    return struct.unpack_from(
+        "<I", hashlib.sha1(key.encode("utf-8")).digest())[0]
+
+
+class ReplayMissError(RequestException):
+    """
+    Raised by :class:`ReplayAdapter` for a request that was never recorded.
+    """
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    Transport adapter that sends requests through another adapter and
+    appends every request and response to an archive, which can be served
+    by :class:`ReplayAdapter` later.
+
+        session = VismaSession(..., transport=RecordingAdapter("api.varc"))
+
+    The archive is append-only, and a record is only complete once it has
+    been flushed. An archive cut short by a crash is therefore still
+    readable up to the last complete record.
+
+    :param path: Path of archive, which is created or appended to
+    :param adapter: Adapter to send requests through. Defaults to a
+                    :class:`PoolAdapter`.
+    :param compress: Compress response bodies with zlib
+    """
+
+    def __init__(self, path, adapter=None, compress=True):
+        super(RecordingAdapter, self).__init__()
+        self.path = path
+        self.adapter = adapter if adapter is not None else PoolAdapter()
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._start = monotonic()
+
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(_MAGIC)
+            self._file.flush()
+
+    def send(self, request, **kwargs):
+        start = monotonic()
+        response = self.adapter.send(request, **kwargs)
+
+        # Reading the content keeps it available to the caller, also for
+        # streamed responses
+        body = response.content
+        self._append(request, response, body, monotonic() - start, start)
+        return response
+
+    def _append(self, request, response, body, elapsed, start):
+        key = request_key(request.method, request.url, request.body)
+        meta = json.dumps({
+            "key": key,
+            "url": request.url,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": [
+                (name, value) for name, value in response.headers.items()
+                if name.lower() not in _SKIPPED_HEADERS],
+        }).encode("utf-8")
+
+        flags = 0
+        if self.compress and body:
+            body = zlib.compress(body)
+            flags |= _COMPRESSED
+
+        with self._lock:
+            self._file.write(_RECORD.pack(
+                flags, _key_hash(key), len(meta), len(body), elapsed,
+                start - self._start))
+            self._file.write(meta)
+            self._file.write(body)
+            self._file.flush()
+
+    def pool_stats(self):
+        return getattr(self.adapter, "pool_stats", list)()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter that answers requests with the responses recorded by
+    :class:`RecordingAdapter`, without any network access.
+
+        session = VismaSession(..., transport=ReplayAdapter("api.varc"))
+
+    The archive is memory mapped. Opening it only reads the fixed size
+    header of every record to build an index, which is two arrays of key
+    hashes and record offsets, and the metadata and body of a record are
+    read from the mapping when it is replayed. Requests are matched on
+    method, URL with sorted query parameters and body. When the same request was recorded several
+    times, its responses are replayed in recorded order, starting over
+    after the last one.
+
+    :param path: Path of archive
+    :param timing: Wait as long as each response originally took before
+                   returning it. Defaults to replaying at full speed.
+    :param speed: Factor to divide recorded response times with when
+                  ``timing`` is enabled
+    """
+
+    def __init__(self, path, timing=False, speed=1.0):
+        super(ReplayAdapter, self).__init__()
+        self.path = path
+        self.timing = timing
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._positions = {}
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(_MAGIC):
+                raise ValueError("'{}' is not an archive".format(path))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:len(_MAGIC)] != _MAGIC:
+            self._map.close()
+            raise ValueError("'{}' is not an archive".format(path))
+
+        self._hashes, self._offsets = self._build_index(size)
+
+    def _build_index(self, size):
+        records = []
+        offset = len(_MAGIC)
+        while offset + _RECORD.size <= size:
+            _, key_hash, meta_size, body_size, _, _ = _RECORD.unpack_from(
+                self._map, offset)
+            end = offset + _RECORD.size + meta_size + body_size
+            if end > size:
+                # Incomplete last record
+                break
+
+            records.append((key_hash, offset))
+            offset = end
+
+        # Sorting on offset as well keeps recorded order within a key
+        records.sort()
+        return (
+            array("I", [key_hash for key_hash, _ in records]),
+            array(_OFFSET_TYPE, [offset for _, offset in records]))
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _read(self, offset):
+        flags, _, meta_size, body_size, elapsed, _ = _RECORD.unpack_from(
+            self._map, offset)
+        offset += _RECORD.size
+        meta = json.loads(
+            self._map[offset:offset + meta_size].decode("utf-8"))
+        offset += meta_size
+        return meta, flags, offset, body_size, elapsed
+
+    def _next(self, key):
+        key_hash = _key_hash(key)
+        start = bisect_left(self._hashes, key_hash)
+        end = start
+        while end < len(self._hashes) and self._hashes[end] == key_hash:
+            end += 1
+
+        # Different keys may have the same hash, which is ruled out by
+        # comparing with the key in the metadata
+        records = [
+            record for record in (
+                self._read(self._offsets[i]) for i in range(start, end))
+            if record[0]["key"] == key]
+        if not records:
+            return None
+        with self._lock:
+            position = self._positions.get(key, 0) % len(records)
+            self._positions[key] = position + 1
+        return records[position]
+
+    def send(self, request, **kwargs):
+        record = self._next(
+            request_key(request.method, request.url, request.body))
+        if record is None:
+            raise ReplayMissError(
+                "No recorded response for {} {}".format(
+                    request.method, request.url),
+                request=request)
+
+        meta, flags, offset, size, elapsed = record
+        body = self._map[offset:offset + size]
+        if flags & _COMPRESSED:
+            body = zlib.decompress(body)
+
+        if self.timing and elapsed > 0:
+            time.sleep(elapsed / self.speed)
+
+        response = Response()
+        response.status_code = meta["status"]
+        response.reason = meta["reason"]
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = timedelta(seconds=elapsed)
+        response._content = body
+        response._content_consumed = True
+        return response
+
+    def pool_stats(self):
+        return []
+
+    def close(self):
+        if not self._map.closed:
+            self._map.close()
@@ -1,8 +1,20 @@
+import os
+import tempfile
+import threading
+
+from datetime import datetime, timedelta
 from functools import wraps
 
+from ._compat import lock_file, lru_cache, replace, unlock_file, utc
+
 __all__ = [
+    "FileLock",
+    "atomic_write",
     "combomethod",
+    "format_timestamp",
     "getattrdeep",
+    "parse_timestamp",
+    "parse_timestamps",
     "AttrProxy",
 ]
 
@@ -88,3 +100,180 @@ class AttrProxy(object):
 
     def __set__(self, obj, value):
         setattr(self._get_target(obj), self.path[-1], value)
+
+
+def atomic_write(path, data):
+    """
+    Replace the contents of the file at ``path`` with ``data`` atomically.
+
+    The data is written and flushed to disk in a temporary file in the same
+    directory, which is then renamed to ``path``. Readers see either the old
+    or the new contents, never a partially written file.
+
+    :param path: Path of file to write
+    :param data: String to write
+    """
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)),
+        prefix=".{}.".format(os.path.basename(path)))
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class FileLock(object):
+    """
+    Reentrant lock which is exclusive between both threads and processes.
+
+    Processes are synchronized with an OS level lock on the file at
+    ``path``, which is created if it does not exist. The lock file is only
+    used for locking and never has any contents.
+
+        with FileLock("token.json.lock"):
+            ...
+
+    :param path: Path of lock file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                f = open(self.path, "a+b")
+                try:
+                    lock_file(f)
+                except BaseException:
+                    f.close()
+                    raise
+            except BaseException:
+                self._lock.release()
+                raise
+            self._file = f
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                unlock_file(self._file)
+            finally:
+                self._file.close()
+                self._file = None
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def _parse_timestamp(value):
+    try:
+        if value[-1] in "Zz":
+            body = value[:-1]
+            offset = 0
+        elif len(value) >= 25 and value[-6] in "+-" and value[-3] == ":":
+            body = value[:-6]
+            offset = int(value[-5:-3]) * 60 + int(value[-2:])
+            if value[-6] == "-":
+                offset = -offset
+        else:
+            # Visma leaves out the offset of timestamps which are in UTC
+            body = value
+            offset = 0
+
+        if len(body) < 19 or body[4] != "-" or body[7] != "-" or \
+                body[10] not in "Tt " or body[13] != ":" or \
+                body[16] != ":" or not (
+                    body[0:4] + body[5:7] + body[8:10] + body[11:13] +
+                    body[14:16] + body[17:19]).isdigit():
+            raise ValueError()
+
+        microsecond = 0
+        if len(body) > 19:
+            fraction = body[20:]
+            if body[19] != "." or not fraction.isdigit():
+                raise ValueError()
+            # Python only supports 6 decimals, while Visma uses 7
+            microsecond = int(fraction[:6].ljust(6, "0"))
+
+        timestamp = datetime(
+            int(body[0:4]), int(body[5:7]), int(body[8:10]),
+            int(body[11:13]), int(body[14:16]), int(body[17:19]),
+            microsecond, utc)
+    except (IndexError, ValueError):
+        raise ValueError("Invalid timestamp '{}'".format(value))
+
+    if offset:
+        timestamp -= timedelta(minutes=offset)
+    return timestamp
+
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(value):
+    """
+    Parse a timestamp in Visma's format, like ``2019-03-12T10:11:12.1234567``,
+    into a timezone aware ``datetime`` in UTC.
+
+    Timestamps without a UTC offset are in UTC. Fractions of a second beyond
+    microsecond precision are truncated. Recently parsed values are cached,
+    since many objects share the same timestamps.
+
+    :param value: Timestamp string
+    :return: Timezone aware ``datetime``
+    :raise ValueError: If ``value`` is not a valid timestamp
+    """
+
+    return _parse_timestamp(value)
+
+
+def parse_timestamps(values):
+    """
+    Parse a sequence of timestamps using :func:`parse_timestamp`. Each
+    distinct value is only parsed once.
+
+    :param values: Iterable of timestamp strings or ``None``
+    :return: List of timezone aware ``datetime`` or ``None``
+    """
+
+    parsed = {None: None}
+    timestamps = []
+    append = timestamps.append
+    for value in values:
+        try:
+            append(parsed[value])
+        except KeyError:
+            parsed[value] = timestamp = _parse_timestamp(value)
+            append(timestamp)
+    return timestamps
+
+
+def format_timestamp(timestamp):
+    """
+    Format a ``datetime`` as an ISO 8601 timestamp in UTC. Naive datetimes
+    are assumed to be in UTC.
+
+    :param timestamp: ``datetime`` to format
+    :return: Timestamp string, like ``2019-03-12T10:11:12.123456Z``
+    """
+
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(utc)
+    return "%04d-%02d-%02dT%02d:%02d:%02d.%06dZ" % (
+        timestamp.year, timestamp.month, timestamp.day, timestamp.hour,
+        timestamp.minute, timestamp.second, timestamp.microsecond)